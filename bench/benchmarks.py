@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+# Name:         benchmarks
+# Purpose:      Times the hot paths of a SpiderFoot tree, so that the figures
+#               given for performance changes can be checked again.
+#
+# Licence:     GPL
+#-------------------------------------------------------------------------------
+#
+# Run from the top of the tree:
+#
+#   python bench/benchmarks.py [-t TREE] [-s SCALE] [name ...]
+#
+# With no names, every benchmark is run. Only interfaces that were there
+# before the changes are used, so the same script can time an earlier
+# version too, by pointing -t at a checkout of it:
+#
+#   git worktree add /tmp/sf-before <commit>
+#   python bench/benchmarks.py -t /tmp/sf-before hostdomain
+#
+# -s scales the number of iterations (e.g. 0.01 for versions where they'd
+# take hours), times being reported for the full count regardless.
+
+import BaseHTTPServer
+import SocketServer
+import gc
+import imp
+import os
+import random
+import re
+import sys
+import threading
+import time
+from optparse import OptionParser
+
+# (name, function, description) of each benchmark, in the order run
+benchmarks = list()
+
+def benchmark(name, descr):
+    def register(func):
+        benchmarks.append((name, func, descr))
+        return func
+    return register
+
+# Stands in for the database, so that logging costs nothing beyond
+# SpiderFoot's own work
+class NullDb:
+    def scanLogEvent(self, *args, **kwargs):
+        return True
+
+    def scanEventStore(self, *args, **kwargs):
+        return True
+
+# A SpiderFoot instance for the tree being timed, logging nowhere
+def newSf(opts=None):
+    if opts == None:
+        opts = dict()
+    opts.setdefault('_debug', False)
+    opts.setdefault('__logging', False)
+    opts.setdefault('_useragent', 'SpiderFoot')
+    opts.setdefault('_fetchtimeout', 5)
+    sf = sflib.SpiderFoot(opts)
+    sf.dbh = NullDb()
+    return sf
+
+# Load one of the tree's modules
+def loadModule(tree, modName):
+    return imp.load_source(modName, os.path.join(tree, 'modules', modName + '.py'))
+
+# Run func() count times (scaled), returning the seconds the full count
+# would take
+def timed(func, count, scale):
+    runs = max(1, int(count * scale))
+    start = time.time()
+    for i in xrange(runs):
+        func()
+    return (time.time() - start) * count / runs
+
+def report(label, value):
+    print "  %-36s %s" % (label + ":", value)
+
+@benchmark("hostdomain", "hostDomain() against the public suffix list")
+def benchHostDomain(tree, scale, opts):
+    sf = newSf()
+    tlds = sf.optValueToData(opts.tlds)
+    hosts = [ 'www.example.com', 'mail.example.co.uk', 'a.b.example.com.au',
+        'example.org', 'host.city.kawasaki.jp' ]
+    state = { 'i': 0 }
+
+    def call():
+        sf.hostDomain(hosts[state['i'] % len(hosts)], tlds)
+        state['i'] += 1
+
+    report("100,000 calls", "%.2fs" % timed(call, 100000, scale))
+
+# A generated site on a local HTTP server: / links to /pages/0.html to
+# /pages/999.html, and each of those to 50 pages of its own, 50,000 in
+# all, on the target, its sub-domains and external sites, with a mix of
+# filtered extensions and paths disallowed by robots.txt. Links on the
+# site are absolute, as the spider resolves relative ones to the default
+# port.
+class SiteHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    exts = [ 'html', 'php', 'png', 'css', 'js', 'pdf', 'txt', '' ]
+
+    def do_GET(self):
+        site = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        m = re.match('/pages/(\d+)\.html$', self.path)
+        if self.path == '/':
+            links = [ site + '/pages/%d.html' % i for i in range(1000) ]
+        elif m != None:
+            links = list()
+            for i in range(int(m.group(1)) * 50, int(m.group(1)) * 50 + 50):
+                link = '/dir%d/page%d.%s' % (i % 300, i, self.exts[i % 8])
+                if i % 11 == 0:
+                    link = 'http://other%d.net' % i + link
+                elif i % 5 == 0:
+                    link = 'http://sub%d.127.0.0.1' % (i % 7) + link
+                else:
+                    link = site + link
+                links.append(link)
+        else:
+            self.send_error(404)
+            return
+
+        page = '<html><body>\n' + '\n'.join([ '<a href="%s">Page</a>' % href \
+            for href in links ]) + '\n</body></html>\n'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+class SiteServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+@benchmark("cleanlinks", "sfp_spider crawl of a local 50,000 link site")
+def benchCleanLinks(tree, scale, opts):
+    server = SiteServer(('127.0.0.1', 0), SiteHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    startUrl = 'http://127.0.0.1:%d/' % server.server_address[1]
+
+    sf = newSf()
+    mod = loadModule(tree, 'sfp_spider').sfp_spider()
+    mod.__name__ = 'sfp_spider'
+    mod.setup(sf, '127.0.0.1', { 'robotsonly': True, 'pause': 0, 'maxpages': 1001,
+        'maxlevels': 2, '_fetchtimeout': 5, '_useragent': 'SpiderFoot' })
+
+    # robots.txt is looked for on the default port, so the rules for the
+    # target and its sub-domains are given up front
+    rules = [ '/dir%d/' % i for i in range(0, 300, 6) ] + [ '/admin', '/cgi-bin/' ]
+    for base in [ 'http://127.0.0.1' ] + [ 'http://sub%d.127.0.0.1' % i for i in range(7) ]:
+        mod.robotsRules[base] = rules
+        if hasattr(mod, 'robotsMatcher'):
+            mod.robotsMatchers[base] = mod.robotsMatcher(rules)
+
+    # Keep the links from the last level, as that is where the 50,000 are
+    # filtered
+    cleanLinks = mod.cleanLinks
+    kept = list()
+    def clean(links):
+        kept.append(cleanLinks(links))
+        return kept[-1]
+    mod.cleanLinks = clean
+
+    root = sflib.SpiderFootEvent("INITIAL_TARGET", "127.0.0.1", "SpiderFoot UI")
+    start = time.time()
+    mod.handleEvent(sflib.SpiderFootEvent("LINKED_URL_INTERNAL", startUrl,
+        "sfp_googlesearch", root))
+    report("crawl, 1,001 pages", "%.2fs (%d links seen, %d kept)" % \
+        (time.time() - start, len(mod.urlEvents), len(kept[-1])))
+
+    server.shutdown()
+    server.server_close()
+
+    # Events for URLs already being spidered are dropped after a lookup
+    events = [ sflib.SpiderFootEvent("LINKED_URL_INTERNAL", url, "sfp_googlesearch",
+        root) for url in mod.urlEvents.keys()[:2000] ]
+    state = { 'i': 0 }
+
+    def call():
+        mod.handleEvent(events[state['i'] % len(events)])
+        state['i'] += 1
+
+    report("2,000 already spidered events", "%.3fs" % timed(call, 2000, scale))
+
+@benchmark("names", "sfp_names dictionary loading and name checks")
+def benchNames(tree, scale, opts):
+    # A page of dictionary words with first names and capitalised words
+    # mixed in, so that there are plenty of candidate names to check
+    random.seed(20)
+    ispell = os.path.join(tree, 'ext', 'ispell')
+    words = open(os.path.join(ispell, 'english.0')).read().split()[:5000]
+    names = open(os.path.join(ispell, 'names.list')).read().split()[:500]
+    page = list()
+    for i in range(300):
+        page.append('<p>%s %s %s. Contact %s %s today</p>' % \
+            (' '.join([ random.choice(words) for j in range(8) ]),
+            random.choice(names).capitalize(), random.choice(words).capitalize(),
+            random.choice(names).capitalize(), random.choice(names).capitalize()))
+    page = '\n'.join(page)
+
+    m = loadModule(tree, 'sfp_names')
+    for label in [ "setup(), first in this process", "setup(), later scans" ]:
+        mod = m.sfp_names()
+        mod.__name__ = 'sfp_names'
+        start = time.time()
+        mod.setup(newSf(), 'example.com', dict())
+        report(label, "%.3fs" % (time.time() - start))
+
+    found = list()
+    mod.notifyListeners = lambda evt: found.append(evt.data)
+    root = sflib.SpiderFootEvent("INITIAL_TARGET", "example.com", "SpiderFoot UI")
+    event = sflib.SpiderFootEvent("TARGET_WEB_CONTENT", page, "sfp_spider", root)
+    start = time.time()
+    mod.handleEvent(event)
+    report("%d byte page" % len(page), "%.3fs (%d names)" % \
+        (time.time() - start, len(found)))
+
+@benchmark("logging", "SpiderFoot logging calls")
+def benchLogging(tree, scale, opts):
+    url = 'http://www.example.com/some/page.html'
+    for debug in [ False, True ]:
+        sf = newSf({ '_debug': debug })
+        state = "on" if debug else "off"
+        report("100,000 sf.info(), debug " + state, "%.3fs" % timed(lambda:
+            sf.info("Fetching: " + url + " [user-agent: SpiderFoot]"), 100000, scale))
+        report("100,000 sf.debug(), debug " + state, "%.3fs" % timed(lambda:
+            sf.debug("Ignoring external site: " + url), 100000, scale))
+
+        # Loggers bound to a component came with the change, so aren't
+        # there to time in earlier versions
+        if not hasattr(sf, 'logger'):
+            continue
+        log = sf.logger('modules.sfp_example')
+        report("100,000 log.debug(fmt), debug " + state, "%.3fs" % timed(lambda:
+            log.debug("Ignoring external site: %s", url), 100000, scale))
+        log = sf.logger('modules.sfp_example', { 'DEBUG': 10 })
+        report("  sampling 1 in 10", "%.3fs" % timed(lambda:
+            log.debug("Ignoring external site: %s", url), 100000, scale))
+
+# Resident memory of this process in bytes, or None where that can't be
+# read from /proc
+def residentMemory():
+    try:
+        pages = int(open('/proc/self/statm').read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+@benchmark("events", "SpiderFootEvent creation, memory and hashing")
+def benchEvents(tree, scale, opts):
+    count = max(1, int(1000000 * scale))
+    types = [ 'INTERNET_NAME', 'IP_ADDRESS', 'LINKED_URL_INTERNAL', 'EMAILADDR' ]
+    root = sflib.SpiderFootEvent("INITIAL_TARGET", "example.com", "SpiderFoot UI")
+    events = [ root ]
+
+    # Each event is the child of an earlier one, with its type built at
+    # run time (as modules' often are) rather than being a literal
+    gc.collect()
+    before = residentMemory()
+    start = time.time()
+    for i in xrange(count):
+        eventType = types[i % 4][:-1] + types[i % 4][-1]
+        events.append(sflib.SpiderFootEvent(eventType, 'host%d.example.com' % i,
+            'sfp_example', events[i / 2]))
+    elapsed = time.time() - start
+    gc.collect()
+    after = residentMemory()
+    report("%d chained events" % count, "%.2fs for 1,000,000" % (elapsed / scale))
+    if before != None:
+        report("memory per event", "%d bytes" % ((after - before) / count))
+
+    hashed = events[1:200001]
+    start = time.time()
+    for i in range(2):
+        for event in hashed:
+            event.getHash()
+    report("%d events, getHash() x2" % len(hashed), "%.2fs" % (time.time() - start))
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [-t TREE] [-s SCALE] [name ...]")
+    parser.add_option("-t", "--tree", default=".",
+        help="SpiderFoot tree to time (default: the current directory)")
+    parser.add_option("-s", "--scale", type="float", default=1.0,
+        help="fraction of the iterations to run (default: 1)")
+    parser.add_option("--tlds", default="@/usr/share/publicsuffix/effective_tld_names.dat",
+        help="public suffix list, as a SpiderFoot option value (@file or URL)")
+    (opts, names) = parser.parse_args()
+
+    tree = os.path.abspath(opts.tree)
+    sys.path.insert(0, os.path.join(tree, 'ext'))
+    sys.path.insert(0, tree)
+    os.chdir(tree)
+    import sflib
+
+    known = [ b[0] for b in benchmarks ]
+    for name in names:
+        if name not in known:
+            parser.error("Unknown benchmark: " + name + " (one of: " + \
+                ", ".join(known) + ")")
+
+    for (name, func, descr) in benchmarks:
+        if len(names) > 0 and name not in names:
+            continue
+        print name + ": " + descr
+        gc.collect()
+        func(tree, opts.scale, opts)
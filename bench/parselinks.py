@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+# Name:         parselinks
+# Purpose:      Checks SpiderFoot.parseLinks() against a corpus of documents
+#               and the links expected from each, and times it on them.
+#
+# Licence:     GPL
+#-------------------------------------------------------------------------------
+#
+# Run from the top of the tree:
+#
+#   python bench/parselinks.py [-t TREE] [-s SECONDS]
+#
+# The corpus is in bench/parselinks/: documents.json lists whole documents
+# (the files alongside it) and fragments.json short generated fragments,
+# each with the page URL, the domain and the {link: {source, original}}
+# parseLinks() is expected to return. Any difference is reported and makes
+# the script exit with 1. The documents are then each parsed repeatedly
+# for SECONDS (default 2) to give the throughput.
+#
+# The expected links are those of parseLinks() before it was rewritten to
+# avoid backtracking, with the domain escaped in its patterns (the one
+# intended change in output). If the output is meant to change, --write
+# replaces them with the output of the tree being run.
+
+import json
+import os
+import sys
+import time
+from optparse import OptionParser
+
+corpusDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parselinks')
+corpusFiles = [ 'documents.json', 'fragments.json' ]
+
+# The data of a corpus entry, from its file or held in the entry itself
+def caseData(case):
+    if case.has_key('file'):
+        return open(os.path.join(corpusDir, case['file']), 'rb').read()
+    return str(case['data'])
+
+# parseLinks() output in the form it's stored in the corpus
+def normalise(links):
+    return json.loads(json.dumps(links))
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [-t TREE] [-s SECONDS] [--write]")
+    parser.add_option("-t", "--tree", default=".",
+        help="SpiderFoot tree to check (default: the current directory)")
+    parser.add_option("-s", "--seconds", type="float", default=2.0,
+        help="seconds to spend timing each document (default: 2)")
+    parser.add_option("--write", action="store_true", default=False,
+        help="store the output of this tree as the expected links")
+    (opts, args) = parser.parse_args()
+
+    tree = os.path.abspath(opts.tree)
+    sys.path.insert(0, os.path.join(tree, 'ext'))
+    sys.path.insert(0, tree)
+    import sflib
+
+    sf = sflib.SpiderFoot({ '_debug': False, '__logging': False })
+    failed = 0
+    for corpusFile in corpusFiles:
+        path = os.path.join(corpusDir, corpusFile)
+        cases = json.load(open(path))
+        for case in cases:
+            links = normalise(sf.parseLinks(case['url'], caseData(case), case['domain']))
+            if opts.write:
+                case['links'] = links
+                continue
+            if links != case['links']:
+                failed += 1
+                print "Mismatch in " + corpusFile + " for " + \
+                    case.get('file', repr(case.get('data'))) + ":"
+                for link in sorted(set(links.keys() + case['links'].keys())):
+                    if links.get(link) != case['links'].get(link):
+                        print "  " + link + ": expected " + \
+                            repr(case['links'].get(link)) + ", got " + repr(links.get(link))
+
+        if opts.write:
+            json.dump(cases, open(path, 'w'), indent=1, sort_keys=True)
+            print "Wrote " + str(len(cases)) + " cases to " + corpusFile
+        else:
+            print corpusFile + ": " + str(len(cases)) + " cases checked"
+
+    if failed > 0:
+        print str(failed) + " cases differ."
+        sys.exit(1)
+
+    for case in json.load(open(os.path.join(corpusDir, 'documents.json'))):
+        data = caseData(case)
+        runs = 0
+        start = time.time()
+        while runs == 0 or time.time() - start < opts.seconds:
+            sf.parseLinks(case['url'], data, case['domain'])
+            runs += 1
+        elapsed = (time.time() - start) / runs
+        print "  %-16s %8.3f MB/s  (%d bytes, %.4fs a parse)" % \
+            (case['file'] + ":", len(data) / 1048576.0 / elapsed, len(data), elapsed)
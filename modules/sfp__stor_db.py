@@ -14,10 +14,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-sfdb = None
-
 class sfp__stor_db(SpiderFootPlugin):
     """Storage:Stores scan results into the back-end SpiderFoot database. You will need this."""
 
@@ -32,17 +28,14 @@ class sfp__stor_db(SpiderFootPlugin):
     }
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-        global sfdb
-
-        sf = sfc
+        self.sf = sfc
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
         # Use the database handle passed to us
         # Should change to get the DBH out of sfc
-        sfdb = userOpts['__sfdb__']
+        self.sfdb = userOpts['__sfdb__']
 
     # What events is this module interested in for input
     # Because this is a storage plugin, we are interested in everything so we
@@ -54,12 +47,12 @@ class sfp__stor_db(SpiderFootPlugin):
     def handleEvent(self, sfEvent):
         if self.opts['maxstorage'] != 0:
             if len(sfEvent.data) > self.opts['maxstorage']:
-                sf.debug("Storing an event: " + sfEvent.eventType)
-                sfdb.scanEventStore(self.opts['__guid__'], sfEvent, self.opts['maxstorage'])
+                self.sf.debug("Storing an event: " + sfEvent.eventType)
+                self.sfdb.scanEventStore(self.opts['__guid__'], sfEvent, self.opts['maxstorage'])
                 return None
         
-        sf.debug("Storing an event: " + sfEvent.eventType)
-        sfdb.scanEventStore(self.opts['__guid__'], sfEvent)
+        self.sf.debug("Storing an event: " + sfEvent.eventType)
+        self.sfdb.scanEventStore(self.opts['__guid__'], sfEvent)
 
 
 # End of sfp__stor_db class
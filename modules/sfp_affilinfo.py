@@ -11,12 +11,8 @@
 
 import re
 import sys
-import socket
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_affilinfo(SpiderFootPlugin):
     """Affiliate Info:Gather information about confirmed affiliates (IP Addresses, Domains)."""
 
@@ -35,9 +31,7 @@ class sfp_affilinfo(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -61,37 +55,40 @@ class sfp_affilinfo(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
         if '://' in eventData:
-            fqdn = sf.urlFQDN(eventData)
+            fqdn = self.sf.urlFQDN(eventData)
         else:
             fqdn = eventData
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
-        domain = sf.hostDomain(fqdn, self.opts['_internettlds'])
-        sf.debug("Domain for " + fqdn + " is " + domain)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        domain = self.sf.hostDomain(fqdn, self.opts['_internettlds'])
+        self.sf.debug("Domain for " + fqdn + " is " + domain)
 
-        sf.debug("Affiliate domain: " + domain)
+        self.sf.debug("Affiliate domain: " + domain)
         evt = SpiderFootEvent("AFFILIATE_DOMAIN", domain, self.__name__, event)
         self.notifyListeners(evt)
 
         # Resolve the IP
         try:
             notif = list()
-            addrs = socket.gethostbyname_ex(fqdn)
+            addrs = self.sf.resolveHost(fqdn)
+            if addrs == None:
+                self.sf.debug("Unable to get an IP for " + fqdn)
+                return None
             for addr in addrs:
                 if type(addr) == list:
                     for a in addr:
-                        if sf.validIP(a):
+                        if self.sf.validIP(a):
                             notif.append(a)
                 else:
-                    if sf.validIP(addr):            
+                    if self.sf.validIP(addr):            
                         notif.append(addr)
             for a in notif:
-                sf.debug("Affiliate IP: " + a)
+                self.sf.debug("Affiliate IP: " + a)
                 evt = SpiderFootEvent("AFFILIATE_IPADDR", a, self.__name__, event)
                 self.notifyListeners(evt)
 
         except BaseException as e:
-            sf.debug("Unable to get an IP for " + fqdn + "(" + str(e) + ")")
+            self.sf.debug("Unable to get an IP for " + fqdn + "(" + str(e) + ")")
             return None
 
 # End of sfp_affilinfo class
@@ -13,13 +13,9 @@
 
 import sys
 import re
-import socket
 import random
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_blacklist(SpiderFootPlugin):
     """Blacklist: Query various blacklist database for open relays, open proxies, vulnerable servers, etc."""
 
@@ -76,9 +72,7 @@ class sfp_blacklist(SpiderFootPlugin):
     }
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.results = dict()
         self.baseDomain = target
 
@@ -106,19 +100,27 @@ class sfp_blacklist(SpiderFootPlugin):
         eventData = event.data
         parentEvent = event
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if self.results.has_key(eventData):
             return None
 
         self.results[eventData] = True
 
+        # Query all the blacklists at once
+        lookups = dict()
         for domain in self.checks:
+            lookup = self.reverseAddr(eventData) + "." + domain
+            self.sf.debug("Checking Blacklist: " + lookup)
+            lookups[lookup] = domain
+
+        for (lookup, addrs) in self.sf.resolveBatch(lookups.keys()):
+            domain = lookups[lookup]
             try:
-                lookup = self.reverseAddr(eventData) + "." + domain
-                sf.debug("Checking Blacklist: " + lookup)
-                addrs = socket.gethostbyname_ex(lookup)
-                sf.debug("Addresses returned: " + str(addrs))
+                if addrs == None:
+                    self.sf.debug("Unable to resolve " + eventData + " / " + lookup)
+                    continue
+                self.sf.debug("Addresses returned: " + str(addrs))
 
                 text = None
                 for addr in addrs:
@@ -129,7 +131,7 @@ class sfp_blacklist(SpiderFootPlugin):
                                 break
                             else:
                                 if str(a) not in self.checks[domain].keys():
-                                    sf.debug("Return code not found in list: " + str(a))
+                                    self.sf.debug("Return code not found in list: " + str(a))
                                     continue
                                 k = str(a)
                                 text = self.checks[domain][k]
@@ -141,7 +143,7 @@ class sfp_blacklist(SpiderFootPlugin):
                             break
                         else:
                             if str(addr) not in self.checks.keys():
-                                sf.debug("Return code not found in list: " + str(addr))
+                                self.sf.debug("Return code not found in list: " + str(addr))
                                 continue
 
                             k = str(addr)
@@ -158,7 +160,7 @@ class sfp_blacklist(SpiderFootPlugin):
                             text, self.__name__, parentEvent)
                         self.notifyListeners(evt)
             except BaseException as e:
-                sf.debug("Unable to resolve " + eventData + " / " + lookup + ": " + str(e))
+                self.sf.debug("Unable to resolve " + eventData + " / " + lookup + ": " + str(e))
  
         return None
 
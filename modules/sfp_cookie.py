@@ -13,9 +13,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_cookie(SpiderFootPlugin):
     """Cookies:Extract Cookies from HTTP headers."""
 
@@ -27,9 +24,7 @@ class sfp_cookie(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -54,14 +49,14 @@ class sfp_cookie(SpiderFootPlugin):
         parentEvent = event.sourceEvent
         eventSource = event.sourceEvent.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
         if self.results.has_key(eventSource):
             return None
         else:
             self.results[eventSource] = True
 
-        if not sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
-            sf.debug("Not collecting cookies from external sites.")
+        if not self.sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
+            self.sf.debug("Not collecting cookies from external sites.")
             return None
 
         if eventData.has_key('set-cookie'):
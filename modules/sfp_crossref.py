@@ -16,9 +16,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_crossref(SpiderFootPlugin):
     """Cross-Reference:Identify whether other domains are associated ('Affiliates') of the target."""
 
@@ -47,9 +44,7 @@ class sfp_crossref(SpiderFootPlugin):
     baseDomain = None
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
         self.fetched = list()
@@ -75,7 +70,7 @@ class sfp_crossref(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         # The SIMILARDOMAIN and CO_HOSTED_SITE events supply domains, 
         # not URLs. Assume HTTP.
@@ -83,28 +78,28 @@ class sfp_crossref(SpiderFootPlugin):
             eventData = 'http://'+ eventData.lower()
 
         # We are only interested in external sites for the crossref
-        if sf.urlBaseUrl(eventData).endswith(self.baseDomain):
-            sf.debug("Ignoring " + eventData + " as not external")
+        if self.sf.urlBaseUrl(eventData).endswith(self.baseDomain):
+            self.sf.debug("Ignoring " + eventData + " as not external")
             return None
 
         # If forcebase is set, we don't bother checking the URL from the event,
         # just it's base URL.
         if self.opts['forcebase']:
-            url = sf.urlBaseUrl(eventData)
+            url = self.sf.urlBaseUrl(eventData)
         else:
             url = eventData
 
         if url in self.fetched:
-            sf.debug("Ignoring " + url + " as already tested")
+            self.sf.debug("Ignoring " + url + " as already tested")
             return
 
-        sf.debug("Testing for affiliation: " + url)
-        res = sf.fetchUrl(url, timeout=self.opts['_fetchtimeout'], 
+        self.sf.debug("Testing for affiliation: " + url)
+        res = self.sf.fetchUrl(url, timeout=self.opts['_fetchtimeout'], 
             useragent=self.opts['_useragent'])
         self.fetched.append(url)
 
         if res['content'] == None:
-            sf.debug("Ignoring " + url + " as no data returned")
+            self.sf.debug("Ignoring " + url + " as no data returned")
             return None
 
         # Search for mentions of our domain in the external site's data
@@ -116,8 +111,8 @@ class sfp_crossref(SpiderFootPlugin):
         # if forcebase was set, as we would've already checked that anyway.
         if not self.opts['forcebase'] and len(matches) > 0 and self.opts['checkbase']:
             # Check the base url to see if there is an affiliation
-            url = sf.urlBaseUrl(eventData)
-            res = sf.fetchUrl(url, timeout=self.opts['_fetchtimeout'], 
+            url = self.sf.urlBaseUrl(eventData)
+            res = self.sf.fetchUrl(url, timeout=self.opts['_fetchtimeout'], 
                 useragent=self.opts['_useragent'])
             if res['content'] != None:
                 matches = re.findall("([\.\'\/\"\ ]" + self.baseDomain + "[\'\/\"\ ])", 
@@ -130,7 +125,7 @@ class sfp_crossref(SpiderFootPlugin):
                 return None
 
             self.results[url] = True
-            sf.info("Found affiliate: " + url)
+            self.sf.info("Found affiliate: " + url)
             evt1 = SpiderFootEvent("AFFILIATE", url, self.__name__, event)
             self.notifyListeners(evt1)
             if self.opts['checkcontent']:
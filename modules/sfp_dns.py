@@ -12,7 +12,6 @@
 # Licence:     GPL
 #-------------------------------------------------------------------------------
 
-import socket
 import sys
 import re
 import random
@@ -20,9 +19,6 @@ import dns
 from netaddr import IPAddress, IPNetwork
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_dns(SpiderFootPlugin):
     """DNS:Performs a number of DNS checks to obtain Sub-domains/Hostnames, IP Addresses and Affiliates."""
 
@@ -35,6 +31,7 @@ class sfp_dns(SpiderFootPlugin):
         'maxnetblock': 24,
         'lookaside': True,
         'lookasidecount': 10,
+        'ptrconcurrency': 100,
         'onlyactive': True,
         "skipcommononwildcard": True,
         "commonsubs":   [ "www", "web", "ns", "mail", "dns", "mx", "gw", "proxy",
@@ -54,6 +51,7 @@ class sfp_dns(SpiderFootPlugin):
         'onlyactive': "Only report sub-domains/hostnames that resolve to an IP.",
         'lookaside': "For each IP discovered, try and reverse look-up IPs 'next to' that IP.",
         'lookasidecount': "If look-aside is enabled, the number of IPs on each 'side' of the IP to look up",
+        'ptrconcurrency': "Number of reverse look-ups to run at the same time when looking up all IPs in a netblock/subnet or look-aside range.",
         "commonsubs":   "Common sub-domains to try. Prefix with an '@' to iterate through a file containing sub-domains to try (one per line), e.g. @C:\subdomains.txt or @/home/bob/subdomains.txt. Or supply a URL to load the list from there."
     }
 
@@ -61,20 +59,19 @@ class sfp_dns(SpiderFootPlugin):
     baseDomain = None
     results = dict()
     subresults = dict()
-    resolveCache = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.results = dict()
         self.subresults = dict()
-        self.resolveCache = dict()
         self.baseDomain = target
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
+        self.sf.contentPatterns.register("sfp_dns",
+            "([a-zA-Z0-9\-\.]+\." + re.escape(self.baseDomain) + ")", re.IGNORECASE)
+
     # What events is this module interested in for input
     def watchedEvents(self):
         arr = ['RAW_DNS_RECORDS', 'SEARCH_ENGINE_WEB_CONTENT', 'RAW_RIR_DATA',
@@ -98,7 +95,7 @@ class sfp_dns(SpiderFootPlugin):
         addrs = None
         parentEvent = event
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if self.subresults.has_key(eventData):
             return None
@@ -109,8 +106,7 @@ class sfp_dns(SpiderFootPlugin):
             "LINKED_URL_INTERNAL", "RAW_RIR_DATA", "RAW_DNS_RECORDS" ]:
             # If we've received a link or some raw data, extract potential sub-domains
             # from the data for resolving later.
-            matches = re.findall("([a-zA-Z0-9\-\.]+\." + self.baseDomain + ")", eventData,
-                re.IGNORECASE)
+            matches = self.sf.contentPatterns.findall(event, "sfp_dns")
 
             if matches != None:
                 for match in matches:
@@ -129,43 +125,47 @@ class sfp_dns(SpiderFootPlugin):
                 return None
 
             if IPNetwork(eventData).prefixlen < self.opts['maxnetblock']:
-                sf.debug("Network size bigger than permitted: " + \
+                self.sf.debug("Network size bigger than permitted: " + \
                     str(IPNetwork(eventData).prefixlen) + " > " + \
                     str(self.opts['maxnetblock']))
                 return None
 
-            sf.debug("Looking up IPs in " + eventData)
+            self.sf.debug("Looking up IPs in " + eventData)
+            sweep = list()
             for ip in IPNetwork(eventData):
-                if self.checkForStop():
-                    return None
                 ipaddr = str(ip)
-
                 if self.results.has_key(ipaddr):
                     continue
                 else:
                     self.results[ipaddr] = True
+                    sweep.append(ipaddr)
 
-                try:
-                    addrs = socket.gethostbyaddr(ipaddr)
-                    sf.debug("Found a reversed hostname from " + ipaddr + \
-                        " (" + str(addrs) + ")")
-                    for addr in addrs:
-                        if type(addr) == list:
-                            for host in addr:
-                                # Don't report on anything on the same subnet if
-                                # if doesn't resolve to something on the target
-                                if not host.endswith(self.baseDomain) and \
-                                    eventName == 'IP_SUBNET':
-                                    continue
-                                self.processHost(host, parentEvent)
-                        else:
-                            if not addr.endswith(self.baseDomain) and \
+            # Many look-ups are outstanding at once, and each host found is
+            # processed as soon as its answer arrives.
+            for (ipaddr, addrs) in self.sf.resolveBatch(sweep, True,
+                self.opts['ptrconcurrency'], self.confirmDomain()):
+                if self.checkForStop():
+                    return None
+
+                if addrs == None:
+                    continue
+
+                self.sf.debug("Found a reversed hostname from " + ipaddr + \
+                    " (" + str(addrs) + ")")
+                for addr in addrs:
+                    if type(addr) == list:
+                        for host in addr:
+                            # Don't report on anything on the same subnet if
+                            # if doesn't resolve to something on the target
+                            if not host.endswith(self.baseDomain) and \
                                 eventName == 'IP_SUBNET':
                                 continue
-                            self.processHost(addr, parentEvent)
-                except Exception as e:
-                    #sf.debug("Exception encountered: " + str(e))
-                    continue
+                            self.processHost(host, parentEvent)
+                    else:
+                        if not addr.endswith(self.baseDomain) and \
+                            eventName == 'IP_SUBNET':
+                            continue
+                        self.processHost(addr, parentEvent)
 
             return None
 
@@ -173,23 +173,22 @@ class sfp_dns(SpiderFootPlugin):
 
         # Don't look up stuff twice
         if self.results.has_key(eventData):
-            sf.debug("Skipping " + eventData + " as already resolved.")
+            self.sf.debug("Skipping " + eventData + " as already resolved.")
             return None
         else:
             self.results[eventData] = True
 
-        try:
-            if eventName != 'IP_ADDRESS':
-                if '://' in eventData:
-                    addrs = self.resolveHost(sf.urlFQDN(eventData))
-                else:
-                    addrs = self.resolveHost(eventData)
-                if addrs == None:
-                    return None
+        if eventName != 'IP_ADDRESS':
+            if '://' in eventData:
+                addrs = self.resolveHost(self.sf.urlFQDN(eventData))
             else:
-                addrs = socket.gethostbyaddr(eventData)
-        except BaseException as e:
-            sf.info("Unable to resolve " + eventData + " (" + str(e) + ")")
+                addrs = self.resolveHost(eventData)
+        else:
+            addrs = self.sf.resolveIP(eventData)
+            if addrs == None:
+                self.sf.info("Unable to resolve " + eventData)
+
+        if addrs == None:
             return None
 
         for addr in addrs:
@@ -204,54 +203,53 @@ class sfp_dns(SpiderFootPlugin):
             ip = IPAddress(eventData)
             minip = IPAddress(int(ip) - self.opts['lookasidecount'])
             maxip = IPAddress(int(ip) + self.opts['lookasidecount'])
-            sf.debug("Lookaside max: " + str(maxip) + ", min: " + str(minip))
-            s = int(minip)
-            c = int(maxip)
-            while s <= c:
+            self.sf.debug("Lookaside max: " + str(maxip) + ", min: " + str(minip))
+            sweep = list()
+            for s in range(int(minip), int(maxip) + 1):
                 sip = str(IPAddress(s))
+                if not self.results.has_key(sip):
+                    sweep.append(sip)
+
+            for (sip, addrs) in self.sf.resolveBatch(sweep, True,
+                self.opts['ptrconcurrency'], self.confirmDomain()):
                 if self.checkForStop():
                     return None
 
-                if self.results.has_key(sip):
-                    s = s + 1
+                if addrs == None:
+                    self.sf.debug("Look-aside lookup failed for " + sip)
                     continue
 
-                try:
-                    addrs = socket.gethostbyaddr(sip)
-                    for addr in addrs:
-                        if type(addr) == list:
-                            for host in addr:
-                                if host.endswith(self.baseDomain):
-                                    self.processHost(host, parentEvent)
-                        else:
-                            if addr.endswith(self.baseDomain):
-                                self.processHost(addr, parentEvent)
-                except BaseException as e:
-                    sf.debug("Look-aside lookup failed: " + str(e))
-                s = s + 1
+                for addr in addrs:
+                    if type(addr) == list:
+                        for host in addr:
+                            if host.endswith(self.baseDomain):
+                                self.processHost(host, parentEvent)
+                    else:
+                        if addr.endswith(self.baseDomain):
+                            self.processHost(addr, parentEvent)
             
         return None
 
-    # Resolve a host
+    # Resolve a host (answers are cached by SpiderFoot for all modules)
     def resolveHost(self, hostname):
-        if self.resolveCache.has_key(hostname):
-            sf.debug("Returning cached result for " + hostname)
-            return self.resolveCache[hostname]
-
-        try:
-            ret = socket.gethostbyname_ex(hostname)
-            self.resolveCache[hostname] = ret
-            return ret
-        except BaseException as e:
-            sf.info("Unable to resolve " + hostname + " (" + str(e) + ")")
-            return None
+        ret = self.sf.resolveHost(hostname)
+        if ret == None:
+            self.sf.info("Unable to resolve " + hostname)
+        return ret
+
+    # Domain whose hostnames processHost() will resolve, if any, so that
+    # sweeps can look them up concurrently ahead of time
+    def confirmDomain(self):
+        if self.opts['onlyactive']:
+            return self.baseDomain
+        return None
 
     def processHost(self, host, parentEvent=None):
-        sf.debug("Found host: " + host)
+        self.sf.debug("Found host: " + host)
         # If the returned hostname is on a different
         # domain to baseDomain, flag it as an affiliate
         if not host.lower().endswith(self.baseDomain):
-            if sf.validIP(host):
+            if self.sf.validIP(host):
                 htype = "IP_ADDRESS"
             else:
                 htype = "AFFILIATE"
@@ -271,7 +269,7 @@ class sfp_dns(SpiderFootPlugin):
         self.notifyListeners(evt)
 
     def start(self):
-        sf.debug("Gathering DNS records..")
+        self.sf.debug("Gathering DNS records..")
         # Process the raw data alone
         recdata = dict()
         recs = {
@@ -292,11 +290,11 @@ class sfp_dns(SpiderFootPlugin):
                 res = dns.query.udp(req, n)
                 for x in res.answer:
                     for rx in recs.keys():
-                        sf.debug("Checking " + str(x) + " + against " + recs[rx][0])
+                        self.sf.debug("Checking " + str(x) + " + against " + recs[rx][0])
                         grps = re.findall(recs[rx][0], str(x), re.IGNORECASE|re.DOTALL)
                         if len(grps) > 0:
                             for m in grps:
-                                sf.debug("Matched: " +  m)
+                                self.sf.debug("Matched: " +  m)
                                 strdata = unicode(m, 'utf-8', errors='replace')
                                 evt = SpiderFootEvent(recs[rx][1], strdata, 
                                     self.__name__)
@@ -311,7 +309,7 @@ class sfp_dns(SpiderFootPlugin):
                                     self.__name__) 
                                 self.notifyListeners(evt)
             except BaseException as e:
-                sf.error("Failed to obtain DNS response: " + str(e), False)
+                self.sf.error("Failed to obtain DNS response: " + str(e), False)
 
         sublist = self.opts['commonsubs']
 
@@ -321,15 +319,15 @@ class sfp_dns(SpiderFootPlugin):
         if self.opts['commonsubs'][0].startswith("http://") or \
             self.opts['commonsubs'][0].startswith("https://") or \
             self.opts['commonsubs'][0].startswith("@"):
-            sublist = sf.optValueToData(self.opts['commonsubs'][0])
+            sublist = self.sf.optValueToData(self.opts['commonsubs'][0])
             
-        sf.debug("Iterating through possible sub-domains [" + str(sublist) + "]")
+        self.sf.debug("Iterating through possible sub-domains [" + str(sublist) + "]")
         count = 0
-        wildcard = sf.checkDnsWildcard(self.baseDomain)
+        wildcard = self.sf.checkDnsWildcard(self.baseDomain)
         # Try resolving common names
         for sub in sublist:
             if wildcard and self.opts['skipcommononwildcard'] and count > 0:
-                sf.debug("Wildcard DNS detected, skipping iterating through remaining hosts.")
+                self.sf.debug("Wildcard DNS detected, skipping iterating through remaining hosts.")
                 return None
                 
             if self.checkForStop():
@@ -342,7 +340,7 @@ class sfp_dns(SpiderFootPlugin):
                 name = self.baseDomain
             # Don't look up stuff twice
             if self.results.has_key(name):
-                sf.debug("Skipping " + name + " as already resolved.")
+                self.sf.debug("Skipping " + name + " as already resolved.")
                 continue
             else:
                 self.results[name] = True
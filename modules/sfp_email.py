@@ -11,12 +11,8 @@
 #-------------------------------------------------------------------------------
 
 import sys
-import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_email(SpiderFootPlugin):
     """E-Mail:Identify e-mail addresses in any obtained data."""
 
@@ -39,15 +35,16 @@ class sfp_email(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
+        self.sf.contentPatterns.register("sfp_email",
+            "([a-zA-Z\.0-9_\-]+@[a-zA-Z\.0-9_\-]+)")
+
     # What events is this module interested in for input
     def watchedEvents(self):
         return ["*"]
@@ -68,22 +65,22 @@ class sfp_email(SpiderFootPlugin):
         if eventName == "EMAILADDR":
             return None
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if type(eventData) not in [ str, unicode ]:
-            sf.debug("Unhandled type to find e-mails: " + str(type(eventData)))
+            self.sf.debug("Unhandled type to find e-mails: " + str(type(eventData)))
             return None
 
-        matches = re.findall("([a-zA-Z\.0-9_\-]+@[a-zA-Z\.0-9_\-]+)", eventData)
+        matches = self.sf.contentPatterns.findall(event, "sfp_email")
         for match in matches:
-            sf.debug("Found possible email: " + match)
+            self.sf.debug("Found possible email: " + match)
 
             if len(match) < 4:
-                sf.debug("Likely invalid address.")
+                self.sf.debug("Likely invalid address.")
                 continue
 
             if self.baseDomain not in match.lower():
-                sf.debug("E-mail (or something) from somewhere else..")
+                self.sf.debug("E-mail (or something) from somewhere else..")
                 continue
 
             self.results[match] = True
@@ -91,16 +88,16 @@ class sfp_email(SpiderFootPlugin):
             # Include e-mail addresses on sub-domains within the domain?
             if not self.opts['includesubdomains']:
                 if not match.lower().endswith('@' + self.baseDomain):
-                    sf.debug("Ignoring e-mail address on a sub-domain: " + match)
+                    self.sf.debug("Ignoring e-mail address on a sub-domain: " + match)
                     continue
 
             # Include external domains as e-mail addresses?
             if not self.opts['includeexternal']:
                 if not match.lower().endswith(self.baseDomain):
-                    sf.debug("Ignoring e-mail address on an external domain" + match)
+                    self.sf.debug("Ignoring e-mail address on an external domain" + match)
                     continue
 
-            sf.info("Found e-mail address: " + match)
+            self.sf.info("Found e-mail address: " + match)
             evt = SpiderFootEvent("EMAILADDR", match, self.__name__, parentEvent)
             self.notifyListeners(evt)
 
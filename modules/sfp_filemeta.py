@@ -19,25 +19,23 @@ import mimetypes
 import metapdf
 import pyPdf
 import openxmllib
-from StringIO import StringIO
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_filemeta(SpiderFootPlugin):
     """File Metadata:Extracts meta data from certain file types."""
 
     # Default options
     opts = {
         'fileexts':     [ "docx", "pptx", 'xlsx', 'pdf' ],
-        'timeout':      300
+        'timeout':      300,
+        'maxsize':      10000000
     }
 
     # Option descriptions
     optdescs = {
         'fileexts': "File extensions of files you want to analyze the meta data of (only PDF, DOCX, XLSX and PPTX are supported.)",
-        'timeout':  "Download timeout for files, in seconds."
+        'timeout':  "Download timeout for files, in seconds.",
+        'maxsize':  "Maximum size of files to analyze, in bytes (0 = unlimited.) Larger files are skipped."
     }
 
     # Target
@@ -45,9 +43,7 @@ class sfp_filemeta(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -70,7 +66,7 @@ class sfp_filemeta(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if eventData in self.results:
             return None
@@ -83,47 +79,64 @@ class sfp_filemeta(SpiderFootPlugin):
 
             if "." + fileExt.lower() in eventData.lower():
                 # Fetch the file, allow much more time given that these files are
-                # typically large.
-                ret = sf.fetchUrl(eventData, timeout=self.opts['timeout'], 
-                    useragent=self.opts['_useragent'], dontMangle=True)
+                # typically large. Large files are spooled to disk rather
+                # than held in memory.
+                ret = self.sf.fetchUrl(eventData, timeout=self.opts['timeout'], 
+                    useragent=self.opts['_useragent'], dontMangle=True,
+                    sizeLimit=self.opts['maxsize'], spool=True)
                 if ret['content'] == None:
-                    sf.error("Unable to fetch file for meta analysis: " + \
+                    self.sf.error("Unable to fetch file for meta analysis: " + \
                         eventData, False)
                     return None
 
-                if len(ret['content']) < 1024:
-                    sf.error("Strange content encountered, size of " + \
-                        len(res['content']), False)
-
-                meta = None
-                # Based on the file extension, handle it
-                if fileExt.lower() == "pdf":
-                    try:
-                        data = StringIO(ret['content'])
-                        meta = str(metapdf.MetaPdfReader().read_metadata(data))
-                        sf.debug("Obtained meta data from " + eventData)
-                    except BaseException as e:
-                        sf.error("Unable to parse meta data from: " + \
-                            eventData + "(" + str(e) + ")", False)
-                        return None
-
-                if fileExt.lower() in [ "pptx", "docx", "xlsx" ]:
-                    try:
-                        mtype = mimetypes.guess_type(eventData)[0]
-                        doc = openxmllib.openXmlDocument(data=ret['content'], mime_type=mtype)
-                        sf.debug("Office type: " + doc.mimeType)
-                        meta = str(doc.allProperties)
-                    except ValueError as e:
-                        sf.error("Unable to parse meta data from: " + \
-                            eventData + "(" + str(e) + ")", False)
-                    except lxml.etree.XMLSyntaxError as e:
-                        sf.error("Unable to parse XML within: " + \
-                            eventData + "(" + str(e) + ")", False)
+                try:
+                    meta = self.fileMeta(eventData, fileExt, ret)
+                finally:
+                    ret['content'].close()
 
                 if meta != None:
                     evt = SpiderFootEvent("RAW_FILE_META_DATA", meta,
                         self.__name__, event)
                     self.notifyListeners(evt)
 
-                
+    # Extract the meta data from a fetched file
+    def fileMeta(self, eventData, fileExt, ret):
+        if ret['truncated']:
+            self.sf.error("File too large for meta analysis: " + \
+                eventData, False)
+            return None
+
+        data = ret['content']
+        data.seek(0, 2)
+        if data.tell() < 1024:
+            self.sf.error("Strange content encountered, size of " + \
+                str(data.tell()), False)
+        data.seek(0)
+
+        meta = None
+        # Based on the file extension, handle it
+        if fileExt.lower() == "pdf":
+            try:
+                meta = str(metapdf.MetaPdfReader().read_metadata(data))
+                self.sf.debug("Obtained meta data from " + eventData)
+            except BaseException as e:
+                self.sf.error("Unable to parse meta data from: " + \
+                    eventData + "(" + str(e) + ")", False)
+                return None
+
+        if fileExt.lower() in [ "pptx", "docx", "xlsx" ]:
+            try:
+                mtype = mimetypes.guess_type(eventData)[0]
+                doc = openxmllib.openXmlDocument(file_=data, mime_type=mtype)
+                self.sf.debug("Office type: " + doc.mimeType)
+                meta = str(doc.allProperties)
+            except ValueError as e:
+                self.sf.error("Unable to parse meta data from: " + \
+                    eventData + "(" + str(e) + ")", False)
+            except lxml.etree.XMLSyntaxError as e:
+                self.sf.error("Unable to parse XML within: " + \
+                    eventData + "(" + str(e) + ")", False)
+
+        return meta
+
 # End of sfp_filemeta class
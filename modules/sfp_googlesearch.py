@@ -15,9 +15,6 @@ import re
 import time
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_googlesearch(SpiderFootPlugin):
     """Google:Some light Google scraping to identify sub-domains and links."""
 
@@ -38,9 +35,7 @@ class sfp_googlesearch(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -59,11 +54,11 @@ class sfp_googlesearch(SpiderFootPlugin):
 
     def start(self):
         # Sites hosted on the domain
-        pages = sf.googleIterate("site:" + self.baseDomain, 
+        pages = self.sf.googleIterate("site:" + self.baseDomain, 
             dict(limit=self.opts['pages'], useragent=self.opts['_useragent'],
             timeout=self.opts['_fetchtimeout']))
         if pages == None:
-            sf.info("No results returned from Google.")
+            self.sf.info("No results returned from Google.")
             return None
 
         for page in pages.keys():
@@ -83,7 +78,7 @@ class sfp_googlesearch(SpiderFootPlugin):
             # We can optionally fetch links to our domain found in the search
             # results. These may not have been identified through spidering.
             if self.opts['fetchlinks']:
-                links = sf.parseLinks(page, pages[page], self.baseDomain)
+                links = self.sf.parseLinks(page, pages[page], self.baseDomain)
                 if len(links) == 0:
                     continue
 
@@ -92,8 +87,8 @@ class sfp_googlesearch(SpiderFootPlugin):
                         continue
                     else:
                         self.results.append(link)
-                    sf.debug("Found a link: " + link)
-                    if sf.urlBaseUrl(link).endswith(self.baseDomain):
+                    self.sf.debug("Found a link: " + link)
+                    if self.sf.urlBaseUrl(link).endswith(self.baseDomain):
                         if self.checkForStop():
                             return None
 
@@ -17,9 +17,6 @@ import time
 import urllib
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_intfiles(SpiderFootPlugin):
     """Interesting Files:Identifies potential files of interest, e.g. office documents."""
 
@@ -44,9 +41,7 @@ class sfp_intfiles(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -69,7 +64,7 @@ class sfp_intfiles(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         for fileExt in self.opts['fileexts']:
             if "." + fileExt.lower() in eventData.lower():
@@ -90,25 +85,25 @@ class sfp_intfiles(SpiderFootPlugin):
         for fileExt in self.opts['fileexts']:
             # Sites hosted on the domain
             if self.opts['searchengine'].lower() == "google":
-                pages = sf.googleIterate("site:" + self.baseDomain + "+" + \
+                pages = self.sf.googleIterate("site:" + self.baseDomain + "+" + \
                     "%2Bext:" + fileExt, dict(limit=self.opts['pages'],
                     useragent=self.opts['_useragent'], 
                     timeout=self.opts['_fetchtimeout']))
 
             if self.opts['searchengine'].lower() == "bing":
-                pages = sf.bingIterate("site:" + self.baseDomain + "+" + \
+                pages = self.sf.bingIterate("site:" + self.baseDomain + "+" + \
                     "%2Bext:" + fileExt, dict(limit=self.opts['pages'],
                     useragent=self.opts['_useragent'], 
                     timeout=self.opts['_fetchtimeout']))
 
             if self.opts['searchengine'].lower() == "yahoo":
-                pages = sf.yahooIterate("site:" + self.baseDomain + "+" + \
+                pages = self.sf.yahooIterate("site:" + self.baseDomain + "+" + \
                     "%2Bext:" + fileExt, dict(limit=self.opts['pages'],
                     useragent=self.opts['_useragent'], 
                     timeout=self.opts['_fetchtimeout']))
 
             if pages == None:
-                sf.info("No results returned from " + self.opts['searchengine'] + \
+                self.sf.info("No results returned from " + self.opts['searchengine'] + \
                     " for " + fileExt + " files.")
                 continue
 
@@ -132,7 +127,7 @@ class sfp_intfiles(SpiderFootPlugin):
                 else:
                     res = pages[page]
 
-                links = sf.parseLinks(page, res, self.baseDomain)
+                links = self.sf.parseLinks(page, res, self.baseDomain)
                 if len(links) == 0:
                     continue
 
@@ -142,9 +137,9 @@ class sfp_intfiles(SpiderFootPlugin):
                     else:
                         self.results.append(link)
 
-                    if sf.urlBaseUrl(link).endswith(self.baseDomain) and \
+                    if self.sf.urlBaseUrl(link).endswith(self.baseDomain) and \
                         "." + fileExt.lower() in link.lower():
-                        sf.info("Found an interesting file: " + link)
+                        self.sf.info("Found an interesting file: " + link)
                         evt = SpiderFootEvent("INTERESTING_FILE", link, self.__name__)
                         self.notifyListeners(evt)
 
@@ -9,14 +9,17 @@
 # Licence:     GPL
 #-------------------------------------------------------------------------------
 
-from netaddr import IPAddress, IPNetwork
 import sys
 import re
-from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
-
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
+import os
+import threading
+import time
+from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent, SpiderFootBlocklist
+
+# For 'list' type sources, 'index' is a regular expression capturing the
+# IP, netblock or hostname from each line of interest (otherwise every
+# line is taken as one), and 'subdomains' means a domain is reported if
+# anything within it is listed.
 malchecks = {
     'abuse.ch Zeus Tracker (Domain)': {
         'id': 'abusezeusdomain',
@@ -101,14 +104,15 @@ malchecks = {
         'type': 'list',
         'checks': ['domain'],
         'url': 'http://www.malwaredomainlist.com/hostslist/hosts.txt',
-        'regex': '.*\s+{0}[\s$]'
+        'index': '\S+\s+(\S+)'
     },
     'PhishTank': {
         'id': 'phishtank',
         'type': 'list',
         'checks': ['domain'],
         'url': 'http://data.phishtank.com/data/online-valid.csv',
-        'regex': '\d+,\w+://(.*\.)?[^a-zA-Z0-9]?{0}.*,http://www.phishtank.com/.*'
+        'index': '\d+,"?\w+://([^/:?,"]+)',
+        'subdomains': True
     },
     'malc0de.com List': {
         'id': 'malc0de',
@@ -133,7 +137,7 @@ malchecks = {
         'type': 'list',
         'checks': [ 'ip', 'netblock' ],
         'url': 'http://www.autoshun.org/files/shunlist.csv',
-        'regex': '{0},.*'
+        'index': '([^,]+),'
     },
     'Internet Storm Center': {
         'id': 'isc',
@@ -148,7 +152,7 @@ malchecks = {
         'type': 'list',
         'checks': [ 'ip', 'netblock' ],
         'url': 'https://reputation.alienvault.com/reputation.generic',
-        'regex': '{0} #.*'
+        'index': '(\S+) #'
     },
     'OpenBL.org Blacklist': {
         'id': 'openbl',
@@ -192,6 +196,15 @@ malchecks = {
     }  
 }
 
+# Indexes of the 'list' type sources, shared between scans so that each
+# list is only loaded once for as long as it's cached:
+# {id => [time built, SpiderFootBlocklist]}
+malindexes = dict()
+# Locks for loading each list, so that one being fetched doesn't hold up
+# checks against the others
+malindexLocks = dict()
+malindexLock = threading.Lock()
+
 class sfp_malcheck(SpiderFootPlugin):
     """Malicious Check:Check if a website, IP or ASN is considered malicious by various sources."""
 
@@ -271,9 +284,7 @@ class sfp_malcheck(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -304,30 +315,30 @@ class sfp_malcheck(SpiderFootPlugin):
         if len(badregex) > 0:
             for rx in badregex:
                 if re.match(rx, content, re.IGNORECASE|re.DOTALL):
-                    sf.debug("Found to be bad")
+                    self.sf.debug("Found to be bad")
                     return True
 
         # Finally, check for good indicators
         if len(goodregex) > 0:
             for rx in goodregex:
                 if re.match(rx, content, re.IGNORECASE|re.DOTALL):
-                    sf.debug("Found to be good")
+                    self.sf.debug("Found to be good")
                     return False
 
         # If nothing was matched, reply None
-        sf.debug("Neither good nor bad, unknown.")
+        self.sf.debug("Neither good nor bad, unknown.")
         return None
 
     # Look up 'query' type sources
     def resourceQuery(self, id, target, targetType):
-        sf.debug("Querying " + id + " for maliciousness of " + target)
+        self.sf.debug("Querying " + id + " for maliciousness of " + target)
         for check in malchecks.keys():
             cid = malchecks[check]['id']
             if id == cid and malchecks[check]['type'] == "query":
                 url = unicode(malchecks[check]['url'])
-                res = sf.fetchUrl(url.format(target), useragent=self.opts['_useragent'])
+                res = self.sf.fetchUrl(url.format(target), useragent=self.opts['_useragent'])
                 if res['content'] == None:
-                    sf.error("Unable to fetch " + url.format(target), False)
+                    self.sf.error("Unable to fetch " + url.format(target), False)
                     return None
                 if self.contentMalicious(res['content'], 
                     malchecks[check]['goodregex'],
@@ -336,83 +347,97 @@ class sfp_malcheck(SpiderFootPlugin):
 
         return None
 
+    # Get the index of a 'list' type source. Indexes are stored alongside
+    # the cache and loaded from there (or fetched and re-built) if not
+    # already loaded or older than the cache period.
+    def listIndex(self, check):
+        cid = malchecks[check]['id']
+        malindexLock.acquire()
+        if not malindexLocks.has_key(cid):
+            malindexLocks[cid] = threading.Lock()
+        lock = malindexLocks[cid]
+        malindexLock.release()
+
+        lock.acquire()
+        try:
+            maxAge = self.opts['aaacacheperiod'] * 3600
+            if malindexes.has_key(cid) and (maxAge == 0 or \
+                malindexes[cid][0] > time.time() - maxAge):
+                return malindexes[cid][1]
+
+            # Another scan may have refreshed it since
+            path = self.sf.cachePath() + "/sfmal_" + cid + ".idx"
+            try:
+                mtime = os.stat(path).st_mtime
+                if maxAge == 0 or mtime > time.time() - maxAge:
+                    index = SpiderFootBlocklist(path=path)
+                    malindexes[cid] = [mtime, index]
+                    return index
+            except BaseException as e:
+                self.sf.debug("No usable stored index for " + check + ": " + str(e))
+
+            url = malchecks[check]['url']
+            # Lists are trusted sources, and a partial one would miss entries
+            data = self.sf.fetchUrl(url, useragent=self.opts['_useragent'],
+                sizeLimit=0)
+            if data['content'] == None:
+                self.sf.error("Unable to fetch " + url, False)
+                return None
+
+            tlds = self.opts['_internettlds']
+            index = SpiderFootBlocklist(data['content'], malchecks[check].get('index'),
+                malchecks[check].get('subdomains', False),
+                domainOf=lambda host: self.sf.hostDomain(host, tlds))
+            self.sf.debug("Indexed " + str(index.size()) + " entries from " + check)
+            try:
+                index.save(path)
+            except BaseException as e:
+                self.sf.error("Unable to store index for " + check + ": " + str(e), False)
+            malindexes[cid] = [time.time(), index]
+            return index
+        finally:
+            lock.release()
+
     # Look up 'list' type resources
     def resourceList(self, id, target, targetType):
-        targetDom = ''
+        targetDom = None
         # Get the base domain if we're supplied a domain
         if targetType == "domain":
-            targetDom = sf.hostDomain(target, self.opts['_internettlds'])
+            targetDom = self.sf.hostDomain(target, self.opts['_internettlds'])
 
         for check in malchecks.keys():
             cid = malchecks[check]['id']
             if id == cid and malchecks[check]['type'] == "list":
-                data = dict()
+                index = self.listIndex(check)
+                if index == None:
+                    return None
                 url = malchecks[check]['url']
-                data['content'] = sf.cacheGet("sfmal_" + cid, self.opts['aaacacheperiod'])
-                if data['content'] == None:
-                    data = sf.fetchUrl(url, useragent=self.opts['_useragent'])
-                    if data['content'] == None:
-                        sf.error("Unable to fetch " + url, False)
-                        return None
-                    else:
-                        sf.cachePut("sfmal_" + cid, data['content'])
 
                 # If we're looking at netblocks
                 if targetType == "netblock":
-                    iplist = list()
-                    # Get the regex, replace {0} with an IP address matcher to 
-                    # build a list of IP.
-                    # Cycle through each IP and check if it's in the netblock.
-                    if malchecks[check].has_key('regex'):
-                        rx = rxTgt = malchecks[check]['regex'].replace("{0}", \
-                            "(\d+\.\d+\.\d+\.\d+)")
-                        sf.debug("New regex for " + check + ": " + rx)
-                        for line in data['content'].split('\n'):
-                            grp = re.findall(rx, line, re.IGNORECASE)
-                            if len(grp) > 0:
-                                #sf.debug("Adding " + grp[0] + " to list.")
-                                iplist.append(grp[0])
-                    else:
-                        iplist = data['content'].split('\n')
-
-                    for ip in iplist:
-                        if len(ip) < 8 or ip.startswith("#"):
-                            continue
-                        ip = ip.strip()
-
-                        try:
-                            if IPAddress(ip) in IPNetwork(target):
-                                sf.debug(ip + " found within netblock/subnet " + \
-                                    target + " in " + check)
-                                return url
-                        except Exception as e:
-                                sf.debug("Error encountered parsing: " + str(e))
-                                continue
-
+                    if index.hasNetblock(target):
+                        self.sf.debug("IP found within netblock/subnet " + \
+                            target + " in " + check)
+                        return url
                     return None
 
                 # If we're looking at hostnames/domains/IPs
-                if not malchecks[check].has_key('regex'):
-                    for line in data['content'].split('\n'):
-                        if line == target or (targetType == "domain" and line == targetDom):
-                            sf.debug(target + "/" + targetDom + " found in " + check + " list.")
-                            return url
+                if targetType == "ip":
+                    found = index.hasAddress(target)
                 else:
-                    # Check for the domain and the hostname
-                    rxDom = unicode(malchecks[check]['regex']).format(targetDom)
-                    rxTgt = unicode(malchecks[check]['regex']).format(target)
-                    for line in data['content'].split('\n'):
-                        if (targetType == "domain" and re.match(rxDom, line, re.IGNORECASE)) or \
-                            re.match(rxTgt, line, re.IGNORECASE):
-                            sf.debug(target + "/" + targetDom + " found in " + check + " list.")
-                            return url
+                    found = index.hasHost(target) or (targetDom != None and \
+                        index.hasHost(targetDom))
+
+                if found:
+                    self.sf.debug(target + "/" + str(targetDom) + " found in " + check + " list.")
+                    return url
         return None
 
     def lookupItem(self, resourceId, itemType, target):
         for check in malchecks.keys():
             cid = malchecks[check]['id']
             if cid == resourceId and itemType in malchecks[check]['checks']:
-                sf.debug("Checking maliciousness of " + target + " (" +  \
+                self.sf.debug("Checking maliciousness of " + target + " (" +  \
                     itemType + ") with: " + cid)
                 if malchecks[check]['type'] == "query":
                     return self.resourceQuery(cid, target, itemType)
@@ -427,10 +452,10 @@ class sfp_malcheck(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if eventData in self.results:
-            sf.debug("Skipping " + eventData + ", already checked.")
+            self.sf.debug("Skipping " + eventData + ", already checked.")
             return None
         else:
             self.results.append(eventData)
@@ -9,12 +9,22 @@
 # Licence:     GPL
 #-------------------------------------------------------------------------------
 
+import cPickle
+import os
 import sys
-import re
+import threading
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
+# Dictionaries of words and of first names, from ext/ispell
+dictFiles = ["english.0", "english.2", "english.4",
+            "british.0", "british.2", "british.4",
+            "american.0", "american.2", "american.4"]
+nameFiles = ["names.list"]
+
+# The dictionaries once loaded, shared by all scans within the process as
+# (signature of the files they were built from, words, first names)
+namedicts = None
+namedictsLock = threading.Lock()
 
 class sfp_names(SpiderFootPlugin):
     """Name Extractor:Attempt to identify human names in fetched content."""
@@ -40,32 +50,85 @@ class sfp_names(SpiderFootPlugin):
     fq = None
 
     def builddict(self, files):
-        wd = dict()
+        wd = set()
 
         for f in files:
-            wdct = open(sf.myPath() + "/ext/ispell/" + f, 'r')
+            wdct = open(self.sf.myPath() + "/ext/ispell/" + f, 'r')
             dlines = wdct.readlines()
+            wdct.close()
 
             for w in dlines:
                 w = w.strip().lower()
-                wd[w.split('/')[0]] = True
-
-        return wd.keys()
+                wd.add(w.split('/')[0])
+
+        return wd
+
+    # Sizes and modification times of the dictionary files, to tell
+    # whether dictionaries built from them are out of date
+    def dictSignature(self):
+        sig = list()
+        for f in dictFiles + nameFiles:
+            st = os.stat(self.sf.myPath() + "/ext/ispell/" + f)
+            sig.append((f, st.st_size, int(st.st_mtime)))
+        return sig
+
+    # Get the dictionary words (less first names) and the first names as
+    # frozensets. They are built once per process, and stored in the cache
+    # directory as newline separated strings, which load several times
+    # faster than parsing the ispell files.
+    def loadDicts(self):
+        global namedicts
+
+        namedictsLock.acquire()
+        try:
+            sig = self.dictSignature()
+            if namedicts != None and namedicts[0] == sig:
+                return namedicts
+
+            path = self.sf.cachePath() + "/sfnames_dicts.pickle"
+            try:
+                fp = open(path, "rb")
+                try:
+                    (storedSig, words, names) = cPickle.load(fp)
+                finally:
+                    fp.close()
+                if storedSig == sig:
+                    namedicts = (sig, frozenset(words.split('\n')),
+                        frozenset(names.split('\n')))
+                    return namedicts
+            except BaseException as e:
+                self.sf.debug("No usable stored dictionaries: " + str(e))
+
+            n = self.builddict(nameFiles)
+            # Take dictionary words out of the names list to keep things clean
+            d = self.builddict(dictFiles) - n
+            namedicts = (sig, frozenset(d), frozenset(n))
+
+            try:
+                # Write to a temporary file first so that other processes
+                # never load a partially written file.
+                tmpFile = path + "." + str(os.getpid())
+                fp = open(tmpFile, "wb")
+                cPickle.dump((sig, '\n'.join(d), '\n'.join(n)), fp,
+                    cPickle.HIGHEST_PROTOCOL)
+                fp.close()
+                if os.path.exists(path):
+                    os.remove(path)
+                os.rename(tmpFile, path)
+            except BaseException as e:
+                self.sf.debug("Unable to store the dictionaries: " + str(e))
+
+            return namedicts
+        finally:
+            namedictsLock.release()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
-        d = self.builddict(["english.0", "english.2", "english.4",
-                        "british.0", "british.2", "british.4",
-                        "american.0", "american.2", "american.4"])
-        self.n = self.builddict(["names.list"])
-        self.fq = [ "north", "south", "east", "west", "santa", "san", "blog", "sao" ]
-        # Take dictionary words out of the names list to keep things clean
-        self.d = list(set(d) - set(self.n))
+        (sig, self.d, self.n) = self.loadDicts()
+        self.fq = frozenset([ "north", "south", "east", "west", "santa", "san", "blog", "sao" ])
 
         # Clear / reset any other class member variables here
         # or you risk them persisting between threads.
@@ -73,6 +136,9 @@ class sfp_names(SpiderFootPlugin):
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
+        self.sf.contentPatterns.register("sfp_names",
+            "([A-Z][a-z]+)\s+.?.?\s?([A-Z][a-zA-Z\'\-]+)")
+
     # What events is this module interested in for input
     # * = be notified about all events.
     def watchedEvents(self):
@@ -88,12 +154,11 @@ class sfp_names(SpiderFootPlugin):
     def handleEvent(self, event):
         eventName = event.eventType
         srcModuleName = event.module
-        eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         # Stage 1: Find things that look (very vaguely) like names
-        m = re.findall("([A-Z][a-z]+)\s+.?.?\s?([A-Z][a-zA-Z\'\-]+)", eventData)
+        m = self.sf.contentPatterns.findall(event, "sfp_names")
         for r in m:
             # Start off each match as 0 points.
             p = 0
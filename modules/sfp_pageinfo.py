@@ -15,9 +15,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 # Indentify pages that use Javascript libs, handle passwords, have forms,
 # permit file uploads and more to come.
 regexps = dict({
@@ -41,15 +38,19 @@ etc.)"""
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
+        for regexpGrp in regexps.keys():
+            for regex in regexps[regexpGrp]:
+                self.sf.contentPatterns.register(("sfp_pageinfo", regex), regex, re.IGNORECASE)
+        self.sf.contentPatterns.register(("sfp_pageinfo", "script"),
+            "<script.*src=[\'\"]?([^\'\">]*)", re.IGNORECASE)
+
     # What events is this module interested in for input
     def watchedEvents(self):
         return ["TARGET_WEB_CONTENT"]
@@ -67,26 +68,25 @@ etc.)"""
         # because the spidering module will always provide events with the
         # event.sourceEvent.data set to the URL of the source.
         if "sfp_spider" not in event.module:
-            sf.debug("Ignoring web content from " + event.module)
+            self.sf.debug("Ignoring web content from " + event.module)
             return None
 
         eventName = event.eventType
         srcModuleName = event.module
-        eventData = event.data
         eventSource = event.sourceEvent.data # will be the URL of the raw data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         # We aren't interested in describing pages that are not hosted on
         # our base domain.
-        if not sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
-            sf.debug("Not gathering page info for external site " + eventSource)
+        if not self.sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
+            self.sf.debug("Not gathering page info for external site " + eventSource)
             return None
 
         if eventSource not in self.results.keys():
             self.results[eventSource] = list()
         else:
-            sf.debug("Already checked this page for a page type, skipping.")
+            self.sf.debug("Already checked this page for a page type, skipping.")
             return None
 
         # Check the configured regexps to determine the page type
@@ -95,25 +95,25 @@ etc.)"""
                 continue
 
             for regex in regexps[regexpGrp]:
-                matches = re.findall(regex, eventData, re.IGNORECASE)
-                if len(matches) > 0 and regexpGrp not in self.results[eventSource]:
-                    sf.info("Matched " + regexpGrp + " in content from " + eventSource)
+                if self.sf.contentPatterns.search(event, ("sfp_pageinfo", regex)):
+                    self.sf.info("Matched " + regexpGrp + " in content from " + eventSource)
                     self.results[eventSource].append(regexpGrp)
                     evt = SpiderFootEvent(regexpGrp, eventSource, self.__name__, event.sourceEvent)
                     self.notifyListeners(evt)
+                    break
 
         # If no regexps were matched, consider this a static page
         if len(self.results[eventSource]) == 0:
-            sf.info("Treating " + eventSource + " as URL_STATIC")
+            self.sf.info("Treating " + eventSource + " as URL_STATIC")
             evt = SpiderFootEvent("URL_STATIC", eventSource, self.__name__, event.sourceEvent)
             self.notifyListeners(evt)
 
         # Check for externally referenced Javascript pages
-        matches = re.findall("<script.*src=[\'\"]?([^\'\">]*)", eventData, re.IGNORECASE)
+        matches = self.sf.contentPatterns.findall(event, ("sfp_pageinfo", "script"))
         if len(matches) > 0:
             for match in matches:
-                if '://' in match and not sf.urlBaseUrl(match).endswith(self.baseDomain):
-                    sf.debug("Externally hosted Javascript found at: " + match)
+                if '://' in match and not self.sf.urlBaseUrl(match).endswith(self.baseDomain):
+                    self.sf.debug("Externally hosted Javascript found at: " + match)
                     evt = SpiderFootEvent("PROVIDER_JAVASCRIPT", match, self.__name__, event.sourceEvent)
                     self.notifyListeners(evt)
 
@@ -16,9 +16,6 @@ import re
 import time
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_pastebin(SpiderFootPlugin):
     """PasteBin:PasteBin scraping (via Google) to identify related content."""
 
@@ -37,9 +34,7 @@ class sfp_pastebin(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -58,12 +53,12 @@ class sfp_pastebin(SpiderFootPlugin):
 
     def start(self):
         # Sites hosted on the domain
-        pages = sf.googleIterate("site:pastebin.com+\"" + \
+        pages = self.sf.googleIterate("site:pastebin.com+\"" + \
             self.baseDomain + "\"", dict(limit=self.opts['pages'],
             useragent=self.opts['_useragent'], timeout=self.opts['_fetchtimeout']))
 
         if pages == None:
-            sf.info("No results returned from Google PasteBin search.")
+            self.sf.info("No results returned from Google PasteBin search.")
             return None
 
         for page in pages.keys():
@@ -81,7 +76,7 @@ class sfp_pastebin(SpiderFootPlugin):
             self.notifyListeners(evt)
 
             # Fetch the PasteBin page
-            links = sf.parseLinks(page, pages[page], "pastebin.com")
+            links = self.sf.parseLinks(page, pages[page], "pastebin.com")
             if len(links) == 0:
                 continue
 
@@ -91,16 +86,16 @@ class sfp_pastebin(SpiderFootPlugin):
                 else:
                     self.results.append(link)
 
-                sf.debug("Found a link: " + link)
-                if sf.urlBaseUrl(link).endswith("pastebin.com"):
+                self.sf.debug("Found a link: " + link)
+                if self.sf.urlBaseUrl(link).endswith("pastebin.com"):
                     if self.checkForStop():
                         return None
 
-                    res = sf.fetchUrl(link, timeout=self.opts['_fetchtimeout'],
+                    res = self.sf.fetchUrl(link, timeout=self.opts['_fetchtimeout'],
                         useragent=self.opts['_useragent'])
 
                     if res['content'] == None:
-                        sf.debug("Ignoring " + link + " as no data returned")
+                        self.sf.debug("Ignoring " + link + " as no data returned")
                         continue
 
                     evt = SpiderFootEvent("SEARCH_ENGINE_WEB_CONTENT",
@@ -116,7 +111,7 @@ class sfp_pastebin(SpiderFootPlugin):
                         startIndex = res['content'].index(self.baseDomain)-120
                         endIndex = startIndex+len(self.baseDomain)+240
                     except BaseException as e:
-                        sf.debug("String not found in pastebin content.")
+                        self.sf.debug("String not found in pastebin content.")
                         continue
 
                     data = res['content'][startIndex:endIndex]
@@ -13,13 +13,80 @@
 from netaddr import IPAddress, IPNetwork
 import sys
 import re
+import errno
+import heapq
+import select
 import socket
 import random
-import threading
+import time
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
+# connect_ex() results meaning the connection is still being established
+# (10035 is WSAEWOULDBLOCK on Windows)
+CONNECTING = [ 0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035 ]
+
+# Wait for sockets to become readable/writable, using the best mechanism
+# the platform offers
+class PortScanPoller:
+    def __init__(self):
+        self.readers = dict()
+        self.writers = dict()
+        if hasattr(select, 'epoll'):
+            self.poller = select.epoll()
+            self.rmask = select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP
+            self.wmask = select.EPOLLOUT | select.EPOLLERR | select.EPOLLHUP
+            self.scale = 1
+        elif hasattr(select, 'poll'):
+            self.poller = select.poll()
+            self.rmask = select.POLLIN | select.POLLERR | select.POLLHUP
+            self.wmask = select.POLLOUT | select.POLLERR | select.POLLHUP
+            self.scale = 1000
+        else:
+            self.poller = None
+
+    # Wait for the socket to become writable (connected) or, if
+    # read is True, readable
+    def register(self, fd, read=False):
+        self.unregister(fd)
+        if read:
+            self.readers[fd] = True
+        else:
+            self.writers[fd] = True
+        if self.poller != None:
+            if read:
+                self.poller.register(fd, self.rmask)
+            else:
+                self.poller.register(fd, self.wmask)
+
+    def unregister(self, fd):
+        if not self.readers.has_key(fd) and not self.writers.has_key(fd):
+            return
+        self.readers.pop(fd, None)
+        self.writers.pop(fd, None)
+        if self.poller != None:
+            self.poller.unregister(fd)
+
+    # Return the list of file descriptors ready, waiting up to timeout
+    # seconds for any
+    def poll(self, timeout):
+        if self.poller != None:
+            try:
+                return [x[0] for x in self.poller.poll(timeout * self.scale)]
+            except (IOError, select.error) as e:
+                if e.args[0] == errno.EINTR:
+                    return list()
+                raise
+
+        if len(self.readers) == 0 and len(self.writers) == 0:
+            time.sleep(timeout)
+            return list()
+        (r, w, x) = select.select(self.readers.keys(), self.writers.keys(),
+            self.writers.keys(), timeout)
+        return list(set(r + w + x))
+
+    def close(self):
+        if self.poller != None and hasattr(self.poller, 'close'):
+            self.poller.close()
 
 class sfp_portscan_basic(SpiderFootPlugin):
     """Port Scanner:Scans for commonly open TCP ports on Internet-facing systems."""
@@ -34,7 +101,8 @@ class sfp_portscan_basic(SpiderFootPlugin):
                             '5903', '5631', '631', '636',
                             '990', '992', '993', '995', '1080', '8080', '8888', '9000' ],
         'timeout':          15,
-        'maxthreads':       10,
+        'maxconcurrent':    500,
+        'maxrate':          0,
         'randomize':        True,
         'netblockscan':     True,
         'netblockscanmax':  24
@@ -42,7 +110,8 @@ class sfp_portscan_basic(SpiderFootPlugin):
 
     # Option descriptions
     optdescs = {
-        'maxthreads':   "Number of ports to try to open simultaneously (number of threads to spawn at once.)",
+        'maxconcurrent': "Maximum number of ports to try to open simultaneously, across all IPs being scanned.",
+        'maxrate':  "Maximum number of connection attempts to start per second (0 = unlimited.)",
         'ports':    "The TCP ports to scan. Prefix with an '@' to iterate through a file containing ports to try (one per line), e.g. @C:\ports.txt or @/home/bob/ports.txt. Or supply a URL to load the list from there.",
         'timeout':  "Seconds before giving up on a port.",
         'randomize':    "Randomize the order of ports scanned.",
@@ -54,12 +123,9 @@ class sfp_portscan_basic(SpiderFootPlugin):
     baseDomain = None
     results = dict()
     portlist = list()
-    portResults = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -69,7 +135,7 @@ class sfp_portscan_basic(SpiderFootPlugin):
         if self.opts['ports'][0].startswith("http://") or \
             self.opts['ports'][0].startswith("https://") or \
             self.opts['ports'][0].startswith("@"):
-            self.portlist = sf.optValueToData(self.opts['ports'][0])
+            self.portlist = self.sf.optValueToData(self.opts['ports'][0])
         else:
             self.portlist = self.opts['ports']
 
@@ -89,63 +155,174 @@ class sfp_portscan_basic(SpiderFootPlugin):
     def producedEvents(self):
         return [ "TCP_PORT_OPEN", "TCP_PORT_OPEN_BANNER" ]
 
+    # Blocking connect, used when going through a SOCKS proxy as the
+    # SOCKS socket can't connect without blocking
     def tryPort(self, ip, port):
         try:
             sock = socket.create_connection((ip, port), self.opts['timeout'])
             sock.settimeout(self.opts['timeout'])
-            self.portResults[ip + ":" + str(port)] = True
         except Exception as e:
-            self.portResults[ip + ":" + str(port)] = False
-            return
+            return None
 
         # If the port was open, see what we can read
         try:
-            self.portResults[ip + ":" + str(port)] = sock.recv(4096)
+            banner = sock.recv(4096)
         except Exception as e:
-            sock.close()
-            return
+            banner = ""
 
         sock.close()
+        return banner
 
-    def tryPortWrapper(self, ip, portList):
-        self.portResults = dict()
-        running = True
-        i = 0
-        t = []
-
-        # Spawn threads for scanning
-        while i < len(portList):
-            sf.info("Spawning thread to check port: " + str(portList[i]) + " on " + ip)
-            t.append(threading.Thread(name='sfp_portscan_basic_' + str(portList[i]), 
-                target=self.tryPort, args=(ip, portList[i])))
-            t[i].start()
-            i += 1
-
-        # Block until all threads are finished
-        while running:
-            found = False
-            for rt in threading.enumerate():
-                if rt.name.startswith("sfp_portscan_basic_"):
-                    found = True
-
-            if not found:
-                running = False
+    # Start a non-blocking connect, returning the socket, or None if the
+    # connection failed straight away
+    def startConnect(self, ip, port):
+        if ':' in ip:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(0)
+        try:
+            err = sock.connect_ex((ip, port))
+        except socket.error as e:
+            err = e.args[0]
 
-        return self.portResults
+        if err not in CONNECTING:
+            sock.close()
+            return None
+        return sock
+
+    # Generate TCP_PORT_OPEN event, and TCP_PORT_OPEN_BANNER if there's
+    # a banner already
+    def sendEvent(self, ip, port, banner, srcEvent):
+        self.sf.info("TCP Port " + ip + ":" + str(port) + " found to be OPEN.")
+        evt = SpiderFootEvent("TCP_PORT_OPEN", str(port), self.__name__, srcEvent)
+        self.notifyListeners(evt)
+        if banner != None:
+            self.sendBanner(banner, evt)
+        return evt
 
     # Generate TCP_PORT_OPEN_BANNER event
-    def sendEvent(self, resArray, srcEvent):
-        for cp in resArray:
-            if resArray[cp]:
-                sf.info("TCP Port " + cp + " found to be OPEN.")
-                (addr, port) = cp.split(":")
-                evt = SpiderFootEvent("TCP_PORT_OPEN", port, self.__name__, srcEvent)
-                self.notifyListeners(evt)
-                if resArray[cp] != "" and resArray[cp] != True:
-                    bevt = SpiderFootEvent("TCP_PORT_OPEN_BANNER", resArray[cp],
-                        self.__name__, evt)
-                    self.notifyListeners(bevt)
+    def sendBanner(self, banner, portEvent):
+        if banner != "":
+            bevt = SpiderFootEvent("TCP_PORT_OPEN_BANNER", banner,
+                self.__name__, portEvent)
+            self.notifyListeners(bevt)
+
+    # Try each (ip, port) in targets, reporting open ports as they're found.
+    # Connections are made without blocking, up to maxconcurrent at a time
+    # and starting no more than maxrate a second. Each open port then has
+    # until the timeout to send a banner.
+    def scanPorts(self, targets, srcEvent):
+        targets = iter(targets)
+        maxConcurrent = max(1, int(self.opts['maxconcurrent']))
+        # select() can't handle many sockets, particularly on Windows
+        if not hasattr(select, 'epoll') and not hasattr(select, 'poll'):
+            maxConcurrent = min(maxConcurrent, 500)
+        if self.opts['maxrate'] > 0:
+            interval = 1.0 / self.opts['maxrate']
+        else:
+            interval = 0
+        timeout = self.opts['timeout']
+
+        poller = PortScanPoller()
+        # fd -> [socket, ip, port, TCP_PORT_OPEN event once connected, sequence]
+        conns = dict()
+        # (deadline, sequence, fd), to time out connections and banners
+        deadlines = list()
+        seq = 0
+        nextStart = time.time()
+        exhausted = False
 
+        try:
+            while not exhausted or len(conns) > 0:
+                if self.checkForStop():
+                    return None
+
+                # Start as many new connections as allowed
+                now = time.time()
+                while not exhausted and len(conns) < maxConcurrent and \
+                    now >= nextStart:
+                    try:
+                        (ip, port) = targets.next()
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    nextStart = max(nextStart + interval, now)
+                    try:
+                        sock = self.startConnect(ip, port)
+                    except socket.error as e:
+                        # Most likely out of file descriptors, so wait for
+                        # some of the connections in progress to finish.
+                        if len(conns) == 0:
+                            self.sf.error("Unable to create socket: " + str(e),
+                                False)
+                            return None
+                        maxConcurrent = len(conns)
+                        targets = iter([(ip, port)] + list(targets))
+                        break
+
+                    if sock == None:
+                        continue
+
+                    seq += 1
+                    conns[sock.fileno()] = [sock, ip, port, None, seq]
+                    poller.register(sock.fileno())
+                    heapq.heappush(deadlines, (now + timeout, seq, sock.fileno()))
+
+                if len(conns) == 0:
+                    if not exhausted:
+                        time.sleep(max(0, nextStart - time.time()))
+                    continue
+
+                # Wait for something to happen, but not so long that new
+                # connections, time-outs or requests to stop are delayed.
+                wait = min(deadlines[0][0] - time.time(), 1)
+                if not exhausted and len(conns) < maxConcurrent:
+                    wait = min(wait, nextStart - time.time())
+                for fd in poller.poll(max(0, wait)):
+                    if not conns.has_key(fd):
+                        continue
+                    (sock, ip, port, portEvent, cseq) = conns[fd]
+                    if portEvent == None:
+                        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                        if err != 0:
+                            self.closeConn(poller, conns, fd)
+                            continue
+
+                        # Connected, so report it and see if we get a banner
+                        portEvent = self.sendEvent(ip, port, None, srcEvent)
+                        seq += 1
+                        conns[fd] = [sock, ip, port, portEvent, seq]
+                        poller.register(fd, True)
+                        heapq.heappush(deadlines, (time.time() + timeout, seq, fd))
+                        continue
+
+                    try:
+                        banner = sock.recv(4096)
+                    except socket.error as e:
+                        banner = ""
+                    self.closeConn(poller, conns, fd)
+                    self.sendBanner(banner, portEvent)
+
+                # Give up on anything that's been waiting too long
+                now = time.time()
+                while len(deadlines) > 0 and deadlines[0][0] <= now:
+                    (deadline, cseq, fd) = heapq.heappop(deadlines)
+                    if not conns.has_key(fd) or conns[fd][4] != cseq:
+                        continue
+                    self.closeConn(poller, conns, fd)
+        finally:
+            for fd in conns.keys():
+                self.closeConn(poller, conns, fd)
+            poller.close()
+
+        return None
+
+    def closeConn(self, poller, conns, fd):
+        poller.unregister(fd)
+        conns[fd][0].close()
+        del conns[fd]
 
     # Handle events sent to this module
     def handleEvent(self, event):
@@ -154,13 +331,13 @@ class sfp_portscan_basic(SpiderFootPlugin):
         eventData = event.data
         scanIps = list()
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         try:
             if eventName == "NETBLOCK" and self.opts['netblockscan']:
                 net = IPNetwork(eventData)
                 if net.prefixlen < self.opts['netblockscanmax']:
-                    sf.debug("Skipping port scanning of " + eventData + ", too big.")
+                    self.sf.debug("Skipping port scanning of " + eventData + ", too big.")
                     return None
 
                 for ip in list(net):
@@ -168,34 +345,34 @@ class sfp_portscan_basic(SpiderFootPlugin):
             else:
                 scanIps.append(eventData)
         except BaseException as e:
-            sf.error("Strange netblock identified, unable to parse: " + \
+            self.sf.error("Strange netblock identified, unable to parse: " + \
                 eventData + " (" + str(e) + ")", False)
             return None
 
+        targets = list()
         for ipAddr in scanIps:
             # Don't look up stuff twice
             if self.results.has_key(ipAddr):
-                sf.debug("Skipping " + ipAddr + " as already scanned.")
-                return None
+                self.sf.debug("Skipping " + ipAddr + " as already scanned.")
+                continue
             else:
                 self.results[ipAddr] = True
 
-            i = 0
-            portArr = []
             for port in self.portlist:
+                targets.append((ipAddr, port))
+
+        # The SOCKS socket only supports blocking connects
+        if self.opts.get('_socks1type', '') != '':
+            for (ipAddr, port) in targets:
                 if self.checkForStop():
                     return None
-                
-                if i < self.opts['maxthreads']:
-                    portArr.append(port)    
-                    i += 1
-                else:
-                    self.sendEvent(self.tryPortWrapper(ipAddr, portArr), event)
-                    i = 1
-                    portArr = []
-                    portArr.append(port)
-
-            # Scan whatever is remaining
-            self.sendEvent(self.tryPortWrapper(ipAddr, portArr), event)
+
+                banner = self.tryPort(ipAddr, port)
+                if banner != None:
+                    self.sendEvent(ipAddr, port, banner, event)
+            return None
+
+        self.scanPorts(targets, event)
+        return None
 
 # End of sfp_portscan_basic class
@@ -13,12 +13,8 @@ import sys
 import random
 import re
 import time
-import socket
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_sharedip(SpiderFootPlugin):
     """Shared IP:Search Bing and/or Robtex.com for hosts sharing the same IP."""
 
@@ -43,9 +39,7 @@ class sfp_sharedip(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -63,10 +57,9 @@ class sfp_sharedip(SpiderFootPlugin):
         return [ "CO_HOSTED_SITE", "SEARCH_ENGINE_WEB_CONTENT" ]
 
     def validateIP(self, host, ip):
-        try:
-            addrs = socket.gethostbyname_ex(host)
-        except BaseException as e:
-            sf.debug("Unable to resolve " + host + ": " + str(e))
+        addrs = self.sf.resolveHost(host)
+        if addrs == None:
+            self.sf.debug("Unable to resolve " + host)
             return False
 
         for addr in addrs:
@@ -86,20 +79,20 @@ class sfp_sharedip(SpiderFootPlugin):
         eventData = event.data
         self.currentEventSrc = event
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         # Don't look up stuff twice
         if eventData in self.results:
-            sf.debug("Skipping " + eventData + " as already mapped.")
+            self.sf.debug("Skipping " + eventData + " as already mapped.")
             return None
         else:
             self.results.append(eventData)
 
         # Robtex
         if self.opts['source'].lower() == "robtex":
-            res = sf.fetchUrl("https://www.robtex.com/ip/" + eventData + ".html")
+            res = self.sf.fetchUrl("https://www.robtex.com/ip/" + eventData + ".html")
             if res['content'] == None:
-                sf.error("Unable to fetch robtex content.", False)
+                self.sf.error("Unable to fetch robtex content.", False)
                 return None
 
             myres = list()
@@ -109,22 +102,22 @@ class sfp_sharedip(SpiderFootPlugin):
                 matches = re.findall("href=\"//www.robtex.com/dns/(.[^\"]*).html",
                     blob[0], re.IGNORECASE)
                 for m in matches:
-                    sf.info("Found something on same IP: " + m)
+                    self.sf.info("Found something on same IP: " + m)
                     if not self.opts['cohostsamedomain'] and m.endswith(self.baseDomain):
-                        sf.debug("Skipping " + m + " because it is on the same domain.")
+                        self.sf.debug("Skipping " + m + " because it is on the same domain.")
                         continue
 
                     if '*' in m:
-                        sf.debug("Skipping wildcard name: " + m)
+                        self.sf.debug("Skipping wildcard name: " + m)
                         continue
 
                     if '.' not in m:
-                        sf.debug("Skipping tld: " + m)
+                        self.sf.debug("Skipping tld: " + m)
                         continue
 
                     if m not in myres and m != eventData:
                         if self.opts['verify'] and not self.validateIP(m, eventData):
-                            sf.debug("Host no longer resolves to our IP.")
+                            self.sf.debug("Host no longer resolves to our IP.")
                             continue
                         evt = SpiderFootEvent("CO_HOSTED_SITE", m, self.__name__, event)
                         self.notifyListeners(evt)
@@ -132,11 +125,11 @@ class sfp_sharedip(SpiderFootPlugin):
 
         # Bing
         if self.opts['source'].lower() == "bing":
-            results = sf.bingIterate("ip:" + eventData, dict(limit=self.opts['pages'],
+            results = self.sf.bingIterate("ip:" + eventData, dict(limit=self.opts['pages'],
                 useragent=self.opts['_useragent'], timeout=self.opts['_fetchtimeout']))
             myres = list()
             if results == None:
-                sf.info("No data returned from Bing.")
+                self.sf.info("No data returned from Bing.")
                 return None
 
             for key in results.keys():
@@ -144,14 +137,14 @@ class sfp_sharedip(SpiderFootPlugin):
                 matches = re.findall("<div class=\"sb_meta\"><cite>(\S+)</cite>", 
                     res, re.IGNORECASE)
                 for match in matches:
-                    sf.info("Found something on same IP: " + match)
-                    site = sf.urlFQDN(match)
+                    self.sf.info("Found something on same IP: " + match)
+                    site = self.sf.urlFQDN(match)
                     if site not in myres and site != eventData:
                         if not self.opts['cohostsamedomain'] and site.endswith(self.baseDomain):
-                            sf.debug("Skipping " + site + " because it is on the same domain.")
+                            self.sf.debug("Skipping " + site + " because it is on the same domain.")
                             continue
                         if self.opts['verify'] and not self.validateIP(m, eventData):
-                            sf.debug("Host no longer resolves to our IP.")
+                            self.sf.debug("Host no longer resolves to our IP.")
                             continue
                         evt = SpiderFootEvent("CO_HOSTED_SITE", site, self.__name__, event)
                         self.notifyListeners(evt)
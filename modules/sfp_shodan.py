@@ -13,9 +13,6 @@ import sys
 import json
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_shodan(SpiderFootPlugin):
     """SHODAN:Obtain information from SHODAN about identified IP addresses."""
 
@@ -37,9 +34,7 @@ class sfp_shodan(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -64,30 +59,30 @@ class sfp_shodan(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if self.opts['apikey'] == "":
-            sf.error("You enabled sfp_shodan but did not set an API key!", False)
+            self.sf.error("You enabled sfp_shodan but did not set an API key!", False)
             return None
 
        # Don't look up stuff twice
         if self.results.has_key(eventData):
-            sf.debug("Skipping " + eventData + " as already mapped.")
+            self.sf.debug("Skipping " + eventData + " as already mapped.")
             return None
         else:
             self.results[eventData] = True
 
-        res = sf.fetchUrl("https://api.shodan.io/shodan/host/" + eventData + \
+        res = self.sf.fetchUrl("https://api.shodan.io/shodan/host/" + eventData + \
             "?key=" + self.opts['apikey'],
             timeout=self.opts['_fetchtimeout'], useragent=self.opts['_useragent'])
         if res['content'] == None:
-            sf.info("No SHODAN info found for " + eventData)
+            self.sf.info("No SHODAN info found for " + eventData)
             return None
 
         try:
             info = json.loads(res['content'])
         except Exception as e:
-            sf.error("Error processing JSON response from SHODAN.", False)
+            self.sf.error("Error processing JSON response from SHODAN.", False)
             return None
 
         os = info.get('os')
@@ -104,7 +99,7 @@ class sfp_shodan(SpiderFootPlugin):
             self.notifyListeners(evt)
 
 
-        sf.info("Found SHODAN data for " + eventData)
+        self.sf.info("Found SHODAN data for " + eventData)
         for rec in info['data']:
             port = str(rec.get('port'))
             banner = rec.get('banner')
@@ -39,9 +39,6 @@ whoisUrlN = "http://www.whois.net/domain-keyword-search/{0}/{1}"
 whoisLastPageIndicator = "Next >"
 whoisIncrement = 16
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_similar(SpiderFootPlugin):
     """Similar Domains:Search various sources to identify similar looking domain names."""
 
@@ -66,9 +63,7 @@ class sfp_similar(SpiderFootPlugin):
     baseDomain = None
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -108,7 +103,7 @@ class sfp_similar(SpiderFootPlugin):
             if self.checkForStop():
                 return None
 
-            whois = sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
+            whois = self.sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
                 useragent=self.opts['_useragent'])
             if whois['content'] == None:
                 return None
@@ -140,7 +135,7 @@ class sfp_similar(SpiderFootPlugin):
             if self.checkForStop():
                 return None
 
-            domtool = sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
+            domtool = self.sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
                 useragent=self.opts['_useragent'])
             if domtool['content'] == None:
                 return None
@@ -175,7 +170,7 @@ class sfp_similar(SpiderFootPlugin):
             if self.checkForStop():
                 return None
 
-            namedrop = sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
+            namedrop = self.sf.fetchUrl(fetchPage, timeout=self.opts['_fetchtimeout'], 
                 useragent=self.opts['_useragent'])
             if namedrop['content'] == None:
                 return None
@@ -200,7 +195,7 @@ class sfp_similar(SpiderFootPlugin):
         if result == self.baseDomain:
             return
 
-        sf.info("Found a similar domain: " + result)
+        self.sf.info("Found a similar domain: " + result)
         self.results.append(result)
 
         # Inform listening modules
@@ -208,7 +203,7 @@ class sfp_similar(SpiderFootPlugin):
             if self.checkForStop():
                 return None
 
-            pageContent = sf.fetchUrl('http://' + result, 
+            pageContent = self.sf.fetchUrl('http://' + result, 
                 timeout=self.opts['_fetchtimeout'], useragent=self.opts['_useragent'])
             if pageContent['content'] != None:
                 evt = SpiderFootEvent("SIMILARDOMAIN", result, self.__name__)
@@ -220,8 +215,8 @@ class sfp_similar(SpiderFootPlugin):
 
     # Search for similar sounding domains
     def start(self):
-        keyword = sf.domainKeyword(self.baseDomain, self.opts['_internettlds'])
-        sf.debug("Keyword extracted from " + self.baseDomain + ": " + keyword)
+        keyword = self.sf.domainKeyword(self.baseDomain, self.opts['_internettlds'])
+        self.sf.debug("Keyword extracted from " + self.baseDomain + ": " + keyword)
 
         # No longer seems to work.
         #if "whois" in self.opts['source'] or "ALL" in self.opts['source']:
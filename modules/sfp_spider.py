@@ -12,11 +12,9 @@
 
 import sys
 import re
-import time
-from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
-
-# SpiderFoot standard lib (must be initialized in __init__)
-sf = None
+import threading
+from collections import deque
+from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent, SpiderFootHostScheduler
 
 class sfp_spider(SpiderFootPlugin):
     """Spider:Spidering of web-pages to extract content for searching. """
@@ -24,7 +22,10 @@ class sfp_spider(SpiderFootPlugin):
     # Default options
     opts = {
         'robotsonly':   False, # only follow links specified by robots.txt
-        'pause':        1, # number of seconds to pause between fetches
+        'pause':        1, # number of seconds to pause between fetches from a site
+        'maxfetches':   10, # max number of pages to fetch at once
+        'sitefetches':  1, # max number of pages to fetch at once from a site
+        'maxsites':     3, # max number of targets to spider at once
         'maxpages':     100, # max number of pages to fetch
         'maxlevels':    3, # max number of levels to traverse within a site
         'usecookies':   True, # Use cookies?
@@ -42,7 +43,10 @@ class sfp_spider(SpiderFootPlugin):
     # Option descriptions
     optdescs = {
         'robotsonly':   "Only follow links specified by robots.txt?",
-        'pause':        "Number of seconds to pause between fetches.",
+        'pause':        "Number of seconds to pause between fetches from the same site.",
+        'maxfetches':   "Maximum number of pages to fetch at the same time, across all sites being spidered.",
+        'sitefetches':  "Maximum number of pages to fetch from the same site at the same time.",
+        'maxsites':     "Maximum number of targets identified to spider at the same time.",
         'usecookies':   "Accept and use cookies?",
         'start':        "Prepend targets with these until you get a hit, to start spidering.",
         'maxpages':     "Maximum number of pages to fetch per target identified.",
@@ -56,6 +60,12 @@ class sfp_spider(SpiderFootPlugin):
     # If using robots.txt, this will get populated with filter rules
     robotsRules = dict()
 
+    # Compiled matchers for the robots.txt rules of each site
+    robotsMatchers = dict()
+
+    # File name endings to skip, compiled from filterfiles
+    filterExts = None
+
     # Target
     baseDomain = None
 
@@ -69,34 +79,119 @@ class sfp_spider(SpiderFootPlugin):
     siteCookies = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
+        self.log = self.sf.logger(__name__)
         self.baseDomain = target
         self.fetchedPages = dict()
         self.urlEvents = dict()
         self.siteCookies = dict()
+        self.robotsRules = dict()
+        self.robotsMatchers = dict()
+        self.lock = threading.Lock()
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
-    # Fetch data from a URL and obtain all links that should be followed
-    def processUrl(self, url):
-        site = sf.urlFQDN(url)
+        # Checked against every link found, so build the list of file
+        # endings to skip once rather than per link
+        self.filterExts = tuple(['.' + ext.lower() for ext in self.opts['filterfiles']])
+
+        # Fetches for all targets being spidered go through the one
+        # scheduler, so that sites are fetched from in parallel but each
+        # one is only fetched from at the pace allowed
+        self.scheduler = SpiderFootHostScheduler(self.opts['maxfetches'],
+            self.opts['pause'], self.opts['sitefetches'])
+
+    # Several targets may be spidered at once
+    def eventConcurrency(self):
+        return self.opts['maxsites']
+
+    # Fetch the contents of a URL (object returned)
+    def fetchPage(self, url):
+        site = self.sf.urlFQDN(url)
         cookies = None
         if self.siteCookies.has_key(site):
-            sf.debug("Restoring cookies for " + site + ": " + str(self.siteCookies[site]))
+            self.log.debug("Restoring cookies for %s: %s", site, self.siteCookies[site])
             cookies = self.siteCookies[site]
-        # Fetch the contents of the supplied URL (object returned)
-        fetched = sf.fetchUrl(url, False, cookies, 
+        return self.sf.fetchUrl(url, False, cookies, 
             self.opts['_fetchtimeout'], self.opts['_useragent'])
-        self.fetchedPages[url] = True
+
+    # Fetch the URLs through the scheduler, yielding (url, result) for each
+    # in the order supplied as it becomes available. Fetches for the URLs
+    # that follow are started in the meantime. URLs already fetched, or
+    # claimed by another target being spidered, are skipped and no more
+    # than limit are fetched.
+    def fetchPages(self, urls, limit):
+        window = max(1, self.opts['maxfetches']) * 2
+        pending = deque()
+        urls = iter(urls)
+        queued = 0
+        try:
+            while True:
+                while len(pending) < window and queued < limit:
+                    try:
+                        url = urls.next()
+                    except StopIteration:
+                        break
+
+                    # Always skip links we've already fetched, and claim
+                    # the rest so that no other spider fetches them too
+                    self.lock.acquire()
+                    try:
+                        if self.fetchedPages.has_key(url):
+                            self.log.debug("Already fetched %s, skipping.", url)
+                            continue
+
+                        self.log.debug("Fetching fresh content from: %s", url)
+                        job = self.scheduler.submit(self.sf.urlFQDN(url),
+                            self.fetchPage, url)
+                        self.fetchedPages[url] = job
+                    finally:
+                        self.lock.release()
+
+                    pending.append((url, job))
+                    queued += 1
+
+                if len(pending) == 0:
+                    return
+
+                (url, job) = pending.popleft()
+                while not job.wait(1):
+                    if self.checkForStop():
+                        return
+
+                # Check if we've been asked to stop
+                if self.checkForStop():
+                    return
+
+                # An earlier page may have redirected here
+                if self.fetchedPages.get(url) is not job:
+                    self.log.debug("Already fetched %s, skipping.", url)
+                    queued -= 1
+                    continue
+
+                yield (url, job.result)
+        finally:
+            # Let go of the URLs not fetched after all
+            self.lock.acquire()
+            try:
+                for (url, job) in pending:
+                    self.scheduler.cancel(job)
+                    if self.fetchedPages.get(url) is job:
+                        del self.fetchedPages[url]
+            finally:
+                self.lock.release()
+
+    # Process the data fetched from a URL and obtain all links that should
+    # be followed
+    def processUrl(self, url, fetched):
+        site = self.sf.urlFQDN(url)
 
         # Track cookies a site has sent, then send the back in subsquent requests
         if self.opts['usecookies'] and fetched['headers'] != None:
             if fetched['headers'].get('Set-Cookie'):
                 self.siteCookies[site] = fetched['headers'].get('Set-Cookie')
-                sf.debug("Saving cookies for " + site + ": " + str(self.siteCookies[site]))
+                self.log.debug("Saving cookies for %s: %s", site, self.siteCookies[site])
 
         if not self.urlEvents.has_key(url):
             self.urlEvents[url] = None
@@ -105,19 +200,21 @@ class sfp_spider(SpiderFootPlugin):
         self.contentNotify(url, fetched, self.urlEvents[url])
 
         if fetched['realurl'] != None and fetched['realurl'] != url:
-            sf.debug("Redirect of " + url + " to " + fetched['realurl'])
+            self.log.debug("Redirect of %s to %s", url, fetched['realurl'])
             # Store the content for the redirect so that it isn't fetched again
+            self.lock.acquire()
             self.fetchedPages[fetched['realurl']] = True
+            self.lock.release()
             # Notify modules about the new link
             self.urlEvents[fetched['realurl']] = self.linkNotify(fetched['realurl'], 
                 self.urlEvents[url])
             url = fetched['realurl'] # override the URL if we had a redirect
 
         # Extract links from the content
-        links = sf.parseLinks(url, fetched['content'], self.baseDomain)
+        links = self.sf.parseLinks(url, fetched['content'], self.baseDomain)
 
         if links == None or len(links) == 0:
-            sf.info("No links found at " + url)
+            self.sf.info("No links found at " + url)
             return None
 
         # Notify modules about the links found
@@ -127,52 +224,68 @@ class sfp_spider(SpiderFootPlugin):
             # Supply the SpiderFootEvent of the parent URL as the parent
             self.urlEvents[link] = self.linkNotify(link, self.urlEvents[url])
 
-        sf.debug('Links found from parsing: ' + str(links))
+        self.log.debug('Links found from parsing: %s', links)
         return links
 
+    # Build a matcher for the robots.txt rules of a site, returning
+    # True if everything is disallowed, None if nothing is and otherwise
+    # a regex matching any of the disallowed paths in a lower-cased URL.
+    def robotsMatcher(self, rules):
+        if '*' in rules:
+            return True
+
+        paths = set([ rule.lower() for rule in rules if rule != '' ])
+        if len(paths) == 0:
+            return None
+
+        return re.compile('|'.join([ re.escape(path) for path in paths ]))
+
     # Clear out links that we don't want to follow
     def cleanLinks(self, links):
         returnLinks = dict()
+        internalEnd = self.baseDomain
+        subEnd = '://' + self.baseDomain
 
         for link in links.keys():
-            linkBase = sf.urlBaseUrl(link)
+            linkBase = self.sf.urlBaseUrl(link)
+            linkLower = link.lower()
 
             # Optionally skip external sites (typical behaviour..)
-            if self.opts['noexternal'] and not sf.urlBaseUrl(link).endswith(self.baseDomain):
-                sf.debug('Ignoring external site: ' + link)
+            if self.opts['noexternal'] and not linkBase.endswith(internalEnd):
+                self.log.debug('Ignoring external site: %s', link)
                 continue
 
             # Optionally skip sub-domain sites
-            if self.opts['nosubs'] and not sf.urlBaseUrl(link).endswith('://' + self.baseDomain):
-                sf.debug("Ignoring subdomain: " + link)
+            if self.opts['nosubs'] and not linkBase.endswith(subEnd):
+                self.log.debug("Ignoring subdomain: %s", link)
                 continue
 
             # Optionally skip user directories
             if self.opts['filterusers'] and '/~' in link:
-                sf.debug("Ignoring user folder: " + link)
+                self.log.debug("Ignoring user folder: %s", link)
                 continue
 
             # If we are respecting robots.txt, filter those out too
-            checkRobots = lambda blocked: str.lower(blocked) in link.lower() or blocked == '*'
-            if self.opts['robotsonly'] and filter(checkRobots, self.robotsRules[linkBase]):
-                sf.debug("Ignoring page found in robots.txt: " + link)
-                continue
+            if self.opts['robotsonly']:
+                matcher = self.robotsMatchers.get(linkBase)
+                if matcher == True or (matcher != None and matcher.search(linkLower)):
+                    self.log.debug("Ignoring page found in robots.txt: %s", link)
+                    continue
 
             # Filter out certain file types (if user chooses to)
-            checkExts = lambda ext: link.lower().endswith('.' + ext.lower())
-            if filter(checkExts, self.opts['filterfiles']):
-                sf.debug('Ignoring filtered extension: ' + link)
+            if linkLower.endswith(self.filterExts):
+                self.log.debug('Ignoring filtered extension: %s', link)
                 continue
 
             # All tests passed, add link to be spidered
-            sf.debug("Adding URL for spidering: " + link)
+            self.log.debug("Adding URL for spidering: %s", link)
             returnLinks[link] = links[link]
 
         return returnLinks
 
     # Notify listening modules about links
     def linkNotify(self, url, parentEvent=None):
-        if sf.urlBaseUrl(url).endswith(self.baseDomain):
+        if self.sf.urlBaseUrl(url).endswith(self.baseDomain):
             type = "LINKED_URL_INTERNAL"
         else:
             type = "LINKED_URL_EXTERNAL"
@@ -218,21 +331,25 @@ class sfp_spider(SpiderFootPlugin):
 
         # Ignore self-generated events so that we don't end up in a recursive loop
         if "sfp_spider" in srcModuleName:
-            sf.debug("Ignoring event from myself.")
+            self.sf.debug("Ignoring event from myself.")
             return None
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
-        if eventData in self.urlEvents.keys():
-            sf.debug("Ignoring " + eventData + " as already spidered or is being spidered.")           
-            return None
-        else:
-            self.urlEvents[eventData] = event
+        self.lock.acquire()
+        try:
+            if self.urlEvents.has_key(eventData):
+                self.sf.debug("Ignoring " + eventData + " as already spidered or is being spidered.")           
+                return None
+            else:
+                self.urlEvents[eventData] = event
+        finally:
+            self.lock.release()
 
         # Determine where to start spidering from if it's a SUBDOMAIN event
         if eventName == "SUBDOMAIN":
             for prefix in self.opts['start']:
-                res = sf.fetchUrl(prefix + eventData, timeout=self.opts['_fetchtimeout'], 
+                res = self.sf.fetchUrl(prefix + eventData, timeout=self.opts['_fetchtimeout'], 
                     useragent=self.opts['_useragent'])
                 if res['content'] != None:
                     spiderTarget = prefix + eventData
@@ -243,7 +360,7 @@ class sfp_spider(SpiderFootPlugin):
         if spiderTarget == None:
             return None
 
-        sf.info("Initiating spider of " + spiderTarget)
+        self.sf.info("Initiating spider of " + spiderTarget)
 
         # Link the spidered URL to the event that triggered it
         self.urlEvents[spiderTarget] = event
@@ -255,27 +372,52 @@ class sfp_spider(SpiderFootPlugin):
         totalFetched = 0
         levelsTraversed = 0
         nextLinks = dict()
-        targetBase = sf.urlBaseUrl(startingPoint)
-
-        # Are we respecting robots.txt?
-        if self.opts['robotsonly'] and not self.robotsRules.has_key(targetBase):
-            robotsTxt = sf.fetchUrl(targetBase + '/robots.txt', 
-                timeout=self.opts['_fetchtimeout'], useragent=self.opts['_useragent'])
-            if robotsTxt['content'] != None:
-                sf.debug('robots.txt contents: ' + robotsTxt['content'])
-                self.robotsRules[targetBase] = sf.parseRobotsTxt(robotsTxt['content'])
-            else:
-                sf.error("Unable to fetch robots.txt and you've asked to abide by its contents.")
-                return None
+        targetBase = self.sf.urlBaseUrl(startingPoint)
+
+        # Are we respecting robots.txt? Other targets being spidered may
+        # be on the same site, so the lock is only held to check for and
+        # store its rules, not while fetching it.
+        if self.opts['robotsonly']:
+            self.lock.acquire()
+            haveRules = self.robotsRules.has_key(targetBase)
+            self.lock.release()
+
+            if not haveRules:
+                robotsTxt = self.sf.fetchUrl(targetBase + '/robots.txt', 
+                    timeout=self.opts['_fetchtimeout'], useragent=self.opts['_useragent'])
+                if robotsTxt['content'] == None:
+                    self.sf.error("Unable to fetch robots.txt and you've asked to abide by its contents.")
+                    return None
+
+                self.log.debug('robots.txt contents: %s', robotsTxt['content'])
+                rules = self.sf.parseRobotsTxt(robotsTxt['content'])
+                matcher = self.robotsMatcher(rules)
+                self.lock.acquire()
+                if not self.robotsRules.has_key(targetBase):
+                    self.robotsRules[targetBase] = rules
+                    self.robotsMatchers[targetBase] = matcher
+                self.lock.release()
 
         # First iteration we are starting with links found on the start page
         # Iterations after that are based on links found on those pages,
         # and so on..
-        links = self.processUrl(startingPoint)  # fetch first page
+        links = None
+        startFetched = False
+        for (url, fetched) in self.fetchPages([ startingPoint ], 1):
+            startFetched = True
+            links = self.processUrl(url, fetched)  # fetch first page
+
+        if self.checkForStop():
+            return None
+
+        # Another target being spidered got to the start page first
+        if not startFetched:
+            self.log.debug("Already spidered %s, skipping.", startingPoint)
+            return None
 
         # No links from the first fetch means we've got a problem
         if links == None:
-            sf.error("No links found on the first fetch!", exception=False)
+            self.sf.error("No links found on the first fetch!", exception=False)
             return
 
         while keepSpidering:
@@ -284,44 +426,34 @@ class sfp_spider(SpiderFootPlugin):
             if len(nextLinks) > 0:
                 links = dict()
 
-                # Fetch content from the new links
-                for link in nextLinks.keys():
-                    # Always skip links we've already fetched
-                    if (link in self.fetchedPages.keys()):
-                        sf.debug("Already fetched " + link + ", skipping.")
-                        continue
-
-                    # Check if we've been asked to stop
-                    if self.checkForStop():
-                        return None
-
-                    sf.debug("Fetching fresh content from: " + link)
-                    time.sleep(self.opts['pause'])
-                    freshLinks = self.processUrl(link)
+                # Fetch content from the new links, several at a time
+                for (link, fetched) in self.fetchPages(nextLinks.keys(),
+                    self.opts['maxpages'] - totalFetched):
+                    freshLinks = self.processUrl(link, fetched)
                     if freshLinks != None:
                         links.update(freshLinks)
 
                     totalFetched += 1
                     if totalFetched >= self.opts['maxpages']:
-                        sf.info("Maximum number of pages (" + str(self.opts['maxpages']) + \
+                        self.sf.info("Maximum number of pages (" + str(self.opts['maxpages']) + \
                             ") reached.")
                         keepSpidering = False
                         break
 
             nextLinks = self.cleanLinks(links)
-            sf.info("Found links: " + str(nextLinks))
+            self.log.info("Found links: %s", nextLinks)
 
             # We've scanned through another layer of the site
             levelsTraversed += 1
-            sf.info("Now at traversal level: " + str(levelsTraversed))
+            self.sf.info("Now at traversal level: " + str(levelsTraversed))
             if levelsTraversed >= self.opts['maxlevels']:
-                sf.info("Maximum number of levels (" + str(self.opts['maxlevels']) + \
+                self.sf.info("Maximum number of levels (" + str(self.opts['maxlevels']) + \
                     ") reached.")
                 keepSpidering = False
 
             # We've reached the end of our journey..
             if len(nextLinks) == 0:
-                sf.info("No more links found to spider, finishing..")
+                self.sf.info("No more links found to spider, finishing..")
                 keepSpidering = False
 
             # We've been asked to stop scanning
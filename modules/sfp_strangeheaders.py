@@ -14,9 +14,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 # Standard headers, taken from http://en.wikipedia.org/wiki/List_of_HTTP_header_fields
 headers = [ "access-control-allow-origin","accept-ranges","age","allow","cache-control",
 "connection","content-encoding","content-language","content-length","content-location",
@@ -38,9 +35,7 @@ class sfp_strangeheaders(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -65,14 +60,14 @@ class sfp_strangeheaders(SpiderFootPlugin):
         parentEvent = event.sourceEvent
         eventSource = event.sourceEvent.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
         if self.results.has_key(eventSource):
             return None
         else:
             self.results[eventSource] = True
 
-        if not sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
-            sf.debug("Not collecting header information for external sites.")
+        if not self.sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
+            self.sf.debug("Not collecting header information for external sites.")
             return None
 
         for key in eventData:
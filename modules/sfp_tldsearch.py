@@ -10,17 +10,12 @@
 # Licence:     GPL
 #-------------------------------------------------------------------------------
 
-import socket
 import sys
 import re
 import time
 import random
-import threading
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_tldsearch(SpiderFootPlugin):
     """TLD Search:Search all Internet TLDs for domains with the same name as the target (this can be slow.)"""
 
@@ -28,6 +23,7 @@ class sfp_tldsearch(SpiderFootPlugin):
     opts = {
         'activeonly':   True, # Only report domains that have content (try to fetch the page)
         'skipwildcards':    True,
+        'wildcardcacheperiod':  72,
         'maxthreads':   100
     }
 
@@ -35,6 +31,7 @@ class sfp_tldsearch(SpiderFootPlugin):
     optdescs = {
         'activeonly':   "Only report domains that have content (try to fetch the page)?",
         "skipwildcards":    "Skip TLDs and sub-TLDs that have wildcard DNS.",
+        "wildcardcacheperiod":  "Hours to remember whether a TLD has wildcard DNS before checking again.",
         "maxthreads":   "Number of simultaneous DNS resolutions to perform at once."
     }
 
@@ -44,13 +41,8 @@ class sfp_tldsearch(SpiderFootPlugin):
     # Target
     baseDomain = None
 
-    # Track TLD search results between threads
-    tldResults = dict()
-
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -67,47 +59,70 @@ class sfp_tldsearch(SpiderFootPlugin):
     def producedEvents(self):
         return [ "SIMILARDOMAIN" ]
 
-    def tryTld(self, target):
-        try:
-            addrs = socket.gethostbyname_ex(target)
-            self.tldResults[target] = True
-        except BaseException as e:
-            self.tldResults[target] = False
-
-    def tryTldWrapper(self, tldList):
-        self.tldResults = dict()
-        running = True
-        i = 0
-        t = []
-
-        # Spawn threads for scanning
-        sf.info("Spawning threads to check TLDs: " + str(tldList))
-        for tld in tldList:
-            tn = 'sfp_tldsearch_' + str(random.randint(0,999999999))
-            t.append(threading.Thread(name=tn, target=self.tryTld, args=(tld,)))
-            t[i].start()
-            i += 1
+    # Load the wildcard DNS status of TLDs found in previous scans,
+    # {tld => [wildcard, time checked]}, leaving out any that have expired
+    def loadWildcards(self):
+        wildcards = dict()
+        data = self.sf.cacheGet("sftld_wildcards", 0)
+        if data == None:
+            return wildcards
+
+        expiry = time.time() - self.opts['wildcardcacheperiod'] * 3600
+        for line in data.splitlines():
+            try:
+                (tld, wild, checked) = line.split("\t")
+                if float(checked) > expiry:
+                    wildcards[tld] = [wild == "1", float(checked)]
+            except ValueError:
+                continue
 
-        # Block until all threads are finished
-        while running:
-            found = False
-            for rt in threading.enumerate():
-                if rt.name.startswith("sfp_tldsearch_"):
-                    found = True
+        return wildcards
 
-            if not found:
-                running = False
+    def saveWildcards(self, wildcards):
+        lines = list()
+        for tld in wildcards.keys():
+            (wild, checked) = wildcards[tld]
+            if wild:
+                wild = "1"
+            else:
+                wild = "0"
+            lines.append((tld + "\t" + wild + "\t" + str(checked)).encode('utf-8'))
+        self.sf.cachePut("sftld_wildcards", lines)
+
+    # Check the supplied TLDs for wildcard DNS all at once, in the same way
+    # as SpiderFoot.checkDnsWildcard(). Returns {tld => wildcard}, or None
+    # if the scan was stopped.
+    def checkWildcards(self, tldList):
+        randpool = 'bcdfghjklmnpqrstvwxyz3456789'
+        probes = dict()
+        for tld in tldList:
+            for l in [ 6, 10 ]:
+                randhost = ''.join([random.choice(randpool) for x in range(l)])
+                probes[randhost + "." + tld] = tld
 
-        for res in self.tldResults.keys():
-            if self.tldResults[res]:
-                self.sendEvent(None, res)
+        resolved = dict()
+        for tld in tldList:
+            resolved[tld] = 0
+        for (probe, addrs) in self.sf.resolveBatch(probes.keys(), False,
+            self.opts['maxthreads']):
+            if self.checkForStop():
+                return None
+            if addrs != None:
+                resolved[probes[probe]] += 1
+
+        ret = dict()
+        for tld in tldList:
+            ret[tld] = resolved[tld] == 2
+            if ret[tld]:
+                self.sf.debug(tld + " has wildcard DNS.")
+        return ret
 
     # Store the result internally and notify listening modules
     def sendEvent(self, source, result):
         if result == self.baseDomain:
             return
 
-        sf.info("Found a TLD with the target's name: " + result)
+        self.sf.info("Found a TLD with the target's name: " + result)
         self.results.append(result)
 
         # Inform listening modules
@@ -115,7 +130,7 @@ class sfp_tldsearch(SpiderFootPlugin):
             if self.checkForStop():
                 return None
 
-            pageContent = sf.fetchUrl('http://' + result,
+            pageContent = self.sf.fetchUrl('http://' + result,
                 timeout=self.opts['_fetchtimeout'], useragent=self.opts['_useragent'])
             if pageContent['content'] != None:
                 evt = SpiderFootEvent("SIMILARDOMAIN", result, self.__name__)
@@ -126,11 +141,11 @@ class sfp_tldsearch(SpiderFootPlugin):
 
     # Search for similar sounding domains
     def start(self):
-        keyword = sf.domainKeyword(self.baseDomain, self.opts['_internettlds'])
-        sf.debug("Keyword extracted from " + self.baseDomain + ": " + keyword)
-        targetList = list()
+        keyword = self.sf.domainKeyword(self.baseDomain, self.opts['_internettlds'])
+        self.sf.debug("Keyword extracted from " + self.baseDomain + ": " + keyword)
+        # {domain to try => tld}
+        targets = dict()
 
-        # Look through all TLDs for the existence of this target keyword
         for tld in self.opts['_internettlds']:
             if type(tld) != unicode:
                 tld = unicode(tld.strip(), errors='ignore')
@@ -146,23 +161,43 @@ class sfp_tldsearch(SpiderFootPlugin):
             if tld.endswith(".arpa"):
                 continue
 
-            if self.opts['skipwildcards'] and sf.checkDnsWildcard(tld):
-                continue
-
-            tryDomain = keyword + "." + tld
+            targets[keyword + "." + tld] = tld
 
+        # Look through all TLDs for the existence of this target keyword
+        self.sf.info("Checking " + str(len(targets)) + " TLDs for " + keyword)
+        found = list()
+        for (tryDomain, addrs) in self.sf.resolveBatch(targets.keys(), False,
+            self.opts['maxthreads']):
             if self.checkForStop():
                 return None
-
-            if len(targetList) <= self.opts['maxthreads']:
-                targetList.append(tryDomain)
-            else:
-                self.tryTldWrapper(targetList)
-                targetList = list()
-
-        # Scan whatever may be left over.
-        if len(targetList) > 0:
-            self.tryTldWrapper(targetList)
+            if addrs != None:
+                found.append(tryDomain)
+
+        # Only the TLDs the keyword was found on need checking for wildcard
+        # DNS, and most of those will be known from previous scans.
+        if self.opts['skipwildcards'] and len(found) > 0:
+            wildcards = self.loadWildcards()
+            unknown = list()
+            for tryDomain in found:
+                tld = targets[tryDomain]
+                if not wildcards.has_key(tld) and tld not in unknown:
+                    unknown.append(tld)
+
+            if len(unknown) > 0:
+                checked = self.checkWildcards(unknown)
+                if checked == None:
+                    return None
+                now = time.time()
+                for tld in checked.keys():
+                    wildcards[tld] = [checked[tld], now]
+                self.saveWildcards(wildcards)
+
+            found = [d for d in found if not wildcards[targets[d]][0]]
+
+        for tryDomain in found:
+            if self.checkForStop():
+                return None
+            self.sendEvent(None, tryDomain)
 
         return None
 
@@ -14,9 +14,6 @@ import json
 import time
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_virustotal(SpiderFootPlugin):
     """VirusTotal:Obtain information from VirusTotal about identified IP addresses."""
 
@@ -44,9 +41,7 @@ class sfp_virustotal(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -73,15 +68,15 @@ class sfp_virustotal(SpiderFootPlugin):
         srcModuleName = event.module
         eventData = event.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if self.opts['apikey'] == "":
-            sf.error("You enabled sfp_virustotal but did not set an API key!", False)
+            self.sf.error("You enabled sfp_virustotal but did not set an API key!", False)
             return None
 
        # Don't look up stuff twice
         if self.results.has_key(eventData):
-            sf.debug("Skipping " + eventData + " as already mapped.")
+            self.sf.debug("Skipping " + eventData + " as already mapped.")
             return None
         else:
             self.results[eventData] = True
@@ -97,7 +92,7 @@ class sfp_virustotal(SpiderFootPlugin):
         else:
             url = "https://www.virustotal.com/vtapi/v2/ip-address/report?ip="
 
-        res = sf.fetchUrl(url + eventData + "&apikey=" + self.opts['apikey'],
+        res = self.sf.fetchUrl(url + eventData + "&apikey=" + self.opts['apikey'],
             timeout=self.opts['_fetchtimeout'], useragent="SpiderFoot")
 
         # Public API is limited to 4 queries per minute
@@ -105,17 +100,17 @@ class sfp_virustotal(SpiderFootPlugin):
             time.sleep(15)
 
         if res['content'] == None:
-            sf.info("No VirusTotal info found for " + eventData)
+            self.sf.info("No VirusTotal info found for " + eventData)
             return None
 
         try:
             info = json.loads(res['content'])
         except Exception as e:
-            sf.error("Error processing JSON response from VirusTotal.", False)
+            self.sf.error("Error processing JSON response from VirusTotal.", False)
             return None
 
         if info.has_key('detected_urls'):
-            sf.info("Found VirusTotal URL data for " + eventData)
+            self.sf.info("Found VirusTotal URL data for " + eventData)
             if eventName == "IP_ADDRESS":
                 evt = "MALICIOUS_IPADDR"
                 infotype = "ip-address"
@@ -147,21 +142,21 @@ class sfp_virustotal(SpiderFootPlugin):
             self.results[self.baseDomain] = True
 
         url = "https://www.virustotal.com/vtapi/v2/domain/report?domain="
-        res = sf.fetchUrl(url + self.baseDomain + "&apikey=" + self.opts['apikey'],
+        res = self.sf.fetchUrl(url + self.baseDomain + "&apikey=" + self.opts['apikey'],
             timeout=self.opts['_fetchtimeout'], useragent="SpiderFoot")
 
         if res['code'] == 403:
-            sf.error("VirusTotal API limit reached or invalid API key.", False)
+            self.sf.error("VirusTotal API limit reached or invalid API key.", False)
             return None
 
         if res['content'] == None:
-            sf.info("No VirusTotal info found for " + self.baseDomain)
+            self.sf.info("No VirusTotal info found for " + self.baseDomain)
             return None
 
         try:
             info = json.loads(res['content'])
         except Exception as e:
-            sf.error("Error processing JSON response from VirusTotal.", False)
+            self.sf.error("Error processing JSON response from VirusTotal.", False)
             return None
 
         if info.has_key('detected_urls'):
@@ -13,9 +13,6 @@ import re
 import sys
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 regexps = dict({
     "jQuery":           list(['jquery']), # unlikely false positive
     "YUI":              list(['\/yui\/', 'yui\-', 'yui\.']),
@@ -46,15 +43,18 @@ class sfp_webframework(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
         for opt in userOpts.keys():
             self.opts[opt] = userOpts[opt]
 
+        for regexpGrp in regexps.keys():
+            for regex in regexps[regexpGrp]:
+                self.sf.contentPatterns.register(("sfp_webframework", regex), regex,
+                    re.IGNORECASE)
+
     # What events is this module interested in for input
     # * = be notified about all events.
     def watchedEvents(self):
@@ -70,7 +70,6 @@ class sfp_webframework(SpiderFootPlugin):
     def handleEvent(self, event):
         eventName = event.eventType
         srcModuleName = event.module
-        eventData = event.data
 
         # We only want web content
         if srcModuleName != "sfp_spider":
@@ -80,14 +79,14 @@ class sfp_webframework(SpiderFootPlugin):
         # source of that raw data (e.g. a URL.)
         eventSource = event.sourceEvent.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
 
         if eventSource not in self.results.keys():
             self.results[eventSource] = list()
 
         # We only want web content for pages on the target site
-        if not sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
-            sf.debug("Not collecting web content information for external sites.")
+        if not self.sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
+            self.sf.debug("Not collecting web content information for external sites.")
             return None
 
         for regexpGrp in regexps.keys():
@@ -95,13 +94,13 @@ class sfp_webframework(SpiderFootPlugin):
                 continue
 
             for regex in regexps[regexpGrp]:
-                matches = re.findall(regex, eventData, re.IGNORECASE)
-                if len(matches) > 0 and regexpGrp not in self.results[eventSource]:
-                    sf.info("Matched " + regexpGrp + " in content from " + eventSource)
+                if self.sf.contentPatterns.search(event, ("sfp_webframework", regex)):
+                    self.sf.info("Matched " + regexpGrp + " in content from " + eventSource)
                     self.results[eventSource].append(regexpGrp)
                     evt = SpiderFootEvent("URL_WEB_FRAMEWORK", regexpGrp, 
                         self.__name__, event.sourceEvent)
                     self.notifyListeners(evt)
+                    break
 
         return None
 
@@ -14,9 +14,6 @@ import sys
 import re
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_websvr(SpiderFootPlugin):
     """Web Server:Obtain web server banners to identify versions of web servers being used."""
 
@@ -28,9 +25,7 @@ class sfp_websvr(SpiderFootPlugin):
     results = dict()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = dict()
 
@@ -55,14 +50,14 @@ class sfp_websvr(SpiderFootPlugin):
         parentEvent = event.sourceEvent
         eventSource = event.sourceEvent.data
 
-        sf.debug("Received event, " + eventName + ", from " + srcModuleName)
+        self.sf.debug("Received event, " + eventName + ", from " + srcModuleName)
         if self.results.has_key(eventSource):
             return None
         else:
             self.results[eventSource] = True
 
-        if not sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
-            sf.debug("Not collecting web server information for external sites.")
+        if not self.sf.urlBaseUrl(eventSource).endswith(self.baseDomain):
+            self.sf.debug("Not collecting web server information for external sites.")
             return None
 
         # Could apply some smarts here, for instance looking for certain
@@ -74,7 +69,7 @@ class sfp_websvr(SpiderFootPlugin):
                 self.__name__, parentEvent)
             self.notifyListeners(evt)
 
-            sf.info("Found web server: " + eventData['server'] + " (" + eventSource + ")")
+            self.sf.info("Found web server: " + eventData['server'] + " (" + eventSource + ")")
 
         if eventData.has_key('x-powered-by'):
             evt = SpiderFootEvent("WEBSERVER_TECHNOLOGY", eventData['x-powered-by'], 
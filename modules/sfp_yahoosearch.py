@@ -16,9 +16,6 @@ import time
 import urllib
 from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent
 
-# SpiderFoot standard lib (must be initialized in setup)
-sf = None
-
 class sfp_yahoosearch(SpiderFootPlugin):
     """Yahoo:Some light Yahoo scraping to identify sub-domains and links."""
 
@@ -39,9 +36,7 @@ class sfp_yahoosearch(SpiderFootPlugin):
     results = list()
 
     def setup(self, sfc, target, userOpts=dict()):
-        global sf
-
-        sf = sfc
+        self.sf = sfc
         self.baseDomain = target
         self.results = list()
 
@@ -64,10 +59,10 @@ class sfp_yahoosearch(SpiderFootPlugin):
 
     def start(self):
         # Sites hosted on the domain
-        pages = sf.yahooIterate("site:" + self.baseDomain, dict(limit=self.opts['pages'],
+        pages = self.sf.yahooIterate("site:" + self.baseDomain, dict(limit=self.opts['pages'],
             useragent=self.opts['_useragent'], timeout=self.opts['_fetchtimeout']))
         if pages == None:
-            sf.info("No results returned from Yahoo.")
+            self.sf.info("No results returned from Yahoo.")
             return None
 
         for page in pages.keys():
@@ -89,7 +84,7 @@ class sfp_yahoosearch(SpiderFootPlugin):
             # We can optionally fetch links to our domain found in the search
             # results. These may not have been identified through spidering.
             if self.opts['fetchlinks']:
-                links = sf.parseLinks(page, content, self.baseDomain)
+                links = self.sf.parseLinks(page, content, self.baseDomain)
                 if len(links) == 0:
                     continue
 
@@ -98,8 +93,8 @@ class sfp_yahoosearch(SpiderFootPlugin):
                         continue
                     else:
                         self.results.append(link)
-                    if sf.urlBaseUrl(link).endswith(self.baseDomain):
-                        sf.debug("Found a link: " + link)
+                    if self.sf.urlBaseUrl(link).endswith(self.baseDomain):
+                        self.sf.debug("Found a link: " + link)
                         if self.checkForStop():
                             return None
 
@@ -46,6 +46,7 @@ for mod in deps:
 import imp
 import time
 import os
+import multiprocessing
 import cherrypy
 from sflib import SpiderFoot
 from sfwebui import SpiderFootWebUi
@@ -58,7 +59,21 @@ sfConfig = {
     '__blocknotif':      False, # Block notifications
     '_useragent':        'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:23.0) Gecko/20100101 Firefox/23.0', # User-Agent to use for HTTP requests
     '_dnsserver':       '', # Override the default resolver
+    '_dnstimeout':      5, # number of seconds before giving up on a DNS lookup
+    '_dnsconcurrency':  20, # max DNS lookups at once when resolving in bulk
+    '_dnscachesize':    10000, # max DNS answers kept in the cache
     '_fetchtimeout':     5, # number of seconds before giving up on a fetch
+    '_fetchconnections': 50, # max HTTP(S) connections open/kept for re-use
+    '_fetchmaxsize':     10000000, # max bytes of a HTTP response body to read
+    '_maxscans':         3, # max scans running at once, others are queued
+    '_maxthreads':       10, # max module handlers running at once in a scan
+    '_modulethreads':    1, # worker threads per module
+    '_processmodules':   '', # modules to run in worker processes of their own
+    '_dbbuffersize':     500, # max scan results/log entries to buffer before writing
+    '_dbqueuesize':      10000, # max scan results/log entries waiting to be written
+    '_logratelimit':     50, # max info/debug log entries a second per module
+    '_logratelimits':    '', # per module overrides of the above
+    '_logtailsize':      1000, # newest log entries of a running scan kept in memory
     '_internettlds':    'http://mxr.mozilla.org/mozilla-central/source/netwerk/dns/effective_tld_names.dat?raw=1',
     '_internettlds_cache':  72,
     '__database':        'spiderfoot.db',
@@ -80,7 +95,21 @@ sfOptdescs = {
     '_internettlds_cache': "Hours to cache the Internet TLD list. This can safely be quite a long time given that the list doesn't change too often.",
     '_useragent':   "User-Agent string to use for HTTP requests. Prefix with an '@' to randomly select the User Agent from a file containing user agent strings for each request, e.g. @C:\useragents.txt or @/home/bob/useragents.txt. Or supply a URL to load the list from there.",
     '_dnsserver':   "Override the default resolver with another DNS server. For example, 8.8.8.8 is Google's open DNS server.",
+    '_dnstimeout':  "Number of seconds before giving up on a DNS lookup.",
+    '_dnsconcurrency':  "Maximum number of DNS lookups to run at the same time when many names are resolved at once.",
+    '_dnscachesize':    "Maximum number of DNS answers to keep cached, shared between all modules and scans.",
     '_fetchtimeout':    "Number of seconds before giving up on a HTTP request.",
+    '_fetchconnections':    "Maximum number of HTTP(S) connections open at once. Connections are kept open and re-used for further requests to the same site.",
+    '_fetchmaxsize':    "Maximum bytes of a HTTP response to read, anything beyond which is ignored (0 = unlimited.)",
+    '_maxscans':        "Maximum number of scans running at the same time. Further scans are queued until one finishes.",
+    '_maxthreads':      "Maximum number of modules processing events at the same time during a scan.",
+    '_modulethreads':   "Number of events each module may process at the same time. Most modules expect to handle one event at a time, so only increase this with care.",
+    '_processmodules':  "Comma-separated list of modules to run in worker processes of their own, so that CPU-heavy modules (e.g. sfp_names,sfp_pageinfo,sfp_email,sfp_filemeta) can use other cores. The worker processes are started along with SpiderFoot, and when none is free (e.g. after changing this setting) the module runs within the scan instead.",
+    '_dbbuffersize':    "Number of scan results and log entries to write to the database at a time. Set to 0 to write each one out immediately.",
+    '_dbqueuesize':     "Maximum number of scan results and log entries waiting to be written to the database before modules have to wait.",
+    '_logratelimit':    "Maximum number of info and debug log entries a second from each module (0 = unlimited.) Entries beyond this are counted rather than logged.",
+    '_logratelimits':   "Comma-separated list of log rate limits for particular modules, overriding the above, e.g. sfp_spider=10,sfp_dns=100.",
+    '_logtailsize':     "Number of the newest log entries of a running scan to keep in memory for showing the scan log.",
     '_socks1type':    "SOCKS Server Type. Can be '4', '5' or 'HTTP'",
     '_socks2addr':    'SOCKS Server IP Address.',
     '_socks3port':    'SOCKS Server TCP Port. Usually 1080 for 4/5 and 8080 for HTTP.',
@@ -92,6 +121,9 @@ sfOptdescs = {
 }
 
 if __name__ == '__main__':
+    # Needed for worker processes when frozen using py2exe
+    multiprocessing.freeze_support()
+
     if len(sys.argv) > 1:
         (addr, port) = sys.argv[1].split(":")
         sfConfig['__webaddr'] = addr
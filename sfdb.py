@@ -10,10 +10,13 @@
 #-------------------------------------------------------------------------------
 
 import hashlib
+import Queue
 import random
 import sqlite3
 import sys
+import threading
 import time
+from collections import deque
 from sflib import SpiderFoot
 
 # SpiderFoot class passed to us
@@ -153,7 +156,11 @@ class SpiderFootDb:
         # connect() will create the database file if it doesn't exist, but
         # at least we can use this opportunity to ensure we have permissions to
         # read and write to such a file.
-        dbh = sqlite3.connect(sf.myPath() + "/" + opts['__database'], timeout=10)
+        # Modules store events and log from their own worker threads during
+        # a scan, so the connection is shared between threads and writes are
+        # serialised through self.lock.
+        dbh = sqlite3.connect(sf.myPath() + "/" + opts['__database'], timeout=10,
+            check_same_thread=False)
         if dbh == None:
             sf.fatal("Could not connect to internal database, and couldn't create " + \
                 opts['__database'])
@@ -161,6 +168,13 @@ class SpiderFootDb:
 
         self.conn = dbh
         self.dbh = dbh.cursor()
+        self.lock = threading.Lock()
+
+        # Events and log entries may be buffered and written out in batches
+        # (see scanBufferSet()), rather than committed one row at a time.
+        self.bufferSize = 0
+        self.eventBuffer = list()
+        self.logBuffer = list()
 
         # Now we actually check to ensure the database file has the schema set
         # up correctly.
@@ -189,10 +203,67 @@ class SpiderFootDb:
             raise BaseException("SQL error encountered when setting up database: " +
                 e.args[0])
 
-    # Close the database handle
+    # Close the database handle, writing out anything still buffered
     def close(self):
+        self.scanBufferSet(0)
         self.dbh.close()
 
+    # Buffer up to maxRows events and log entries before writing them to the
+    # database in a single transaction. Anything buffered is also written
+    # whenever the scan instance is updated, when scanBufferFlush() is called
+    # and when the handle is closed. A maxRows of 0 writes out what is
+    # buffered and goes back to committing every row.
+    def scanBufferSet(self, maxRows):
+        self.scanBufferFlush()
+        self.lock.acquire()
+        self.bufferSize = maxRows
+        self.lock.release()
+
+    # Write out buffered events and log entries
+    def scanBufferFlush(self):
+        self.lock.acquire()
+        try:
+            self._scanBufferWrite()
+        finally:
+            self.lock.release()
+
+    # Queue a row for writing, or write it straight away if buffering is
+    # disabled. Must be called with self.lock held.
+    def _scanBufferAdd(self, buf, row):
+        buf.append(row)
+        if self.bufferSize <= 0:
+            self._scanBufferWrite()
+            return
+
+        if len(self.eventBuffer) + len(self.logBuffer) >= self.bufferSize:
+            self._scanBufferWrite()
+
+    # Write out buffered rows in one transaction. Must be called with
+    # self.lock held.
+    def _scanBufferWrite(self):
+        if len(self.eventBuffer) == 0 and len(self.logBuffer) == 0:
+            return
+
+        logQry = "INSERT INTO tbl_scan_log \
+            (scan_instance_id, generated, component, type, message) \
+            VALUES (?, ?, ?, ?, ?)"
+        eventQry = "INSERT INTO tbl_scan_results \
+            (scan_instance_id, hash, type, generated, confidence, \
+            visibility, risk, module, data, source_event_hash) \
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+        try:
+            if len(self.logBuffer) > 0:
+                self.dbh.executemany(logQry, self.logBuffer)
+            if len(self.eventBuffer) > 0:
+                self.dbh.executemany(eventQry, self.eventBuffer)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            sf.fatal("SQL error encountered when storing scan data: " + e.args[0])
+        finally:
+            del self.logBuffer[:]
+            del self.eventBuffer[:]
+
     # Get event types
     def eventTypes(self):
         qry = "SELECT event_descr, event, event_raw FROM tbl_event_types"
@@ -204,24 +275,21 @@ class SpiderFootDb:
                 e.args[0])
 
     # Log an event to the database
-    def scanLogEvent(self, instanceId, classification, message, component=None):
+    def scanLogEvent(self, instanceId, classification, message, component=None,
+        generated=None):
         if component == None:
             component = "SpiderFoot"
 
-        qry = "INSERT INTO tbl_scan_log \
-            (scan_instance_id, generated, component, type, message) \
-            VALUES (?, ?, ?, ?, ?)"
+        if generated == None:
+            generated = time.time() * 1000
+
+        self.lock.acquire()
         try:
-            self.dbh.execute(qry, (
-                    instanceId, time.time() * 1000, component, classification, message
+            self._scanBufferAdd(self.logBuffer, (
+                    instanceId, generated, component, classification, message
                 ))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            if "locked" in e.args[0]:
-                # TODO: Do something smarter here to handle locked databases
-                sf.fatal("Unable to log event in DB: " + e.args[0])
-            else:
-                sf.fatal("Unable to log event in DB: " + e.args[0])
+        finally:
+            self.lock.release()
 
         return True
 
@@ -270,11 +338,17 @@ class SpiderFootDb:
         qry += " guid = guid WHERE guid = ?"
         qvars.append(instanceId)
 
+        self.lock.acquire()
         try:
+            # Make sure everything stored so far is written before the
+            # scan is marked as having moved on.
+            self._scanBufferWrite()
             self.dbh.execute(qry, qvars)
             self.conn.commit()
         except sqlite3.Error:
             sf.fatal("Unable to set information for the scan instance.")
+        finally:
+            self.lock.release()
 
     # Return info about a scan instance (name, target, created, started,
     # ended, status) - don't need this yet - untested
@@ -519,23 +593,18 @@ class SpiderFootDb:
         if truncateSize > 0:
             storeData = storeData[0:truncateSize]
 
-        qry = "INSERT INTO tbl_scan_results \
-            (scan_instance_id, hash, type, generated, confidence, \
-            visibility, risk, module, data, source_event_hash) \
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        qvals = [ instanceId, sfEvent.getHash(), sfEvent.eventType, sfEvent.generated,
+        qvals = ( instanceId, sfEvent.getHash(), sfEvent.eventType, sfEvent.generated,
             sfEvent.confidence, sfEvent.visibility, sfEvent.risk,
-            sfEvent.module, storeData, sfEvent.sourceEventHash ]
+            sfEvent.module, storeData, sfEvent.sourceEventHash )
 
         #print "STORING: " + str(qvals)
 
+        self.lock.acquire()
         try:
-            self.dbh.execute(qry, qvals)
-            self.conn.commit()
+            self._scanBufferAdd(self.eventBuffer, qvals)
             return None
-        except sqlite3.Error as e:
-            sf.fatal("SQL error encountered when storing event data (" + str(self.dbh) + ": " +
-                e.args[0])
+        finally:
+            self.lock.release()
 
     # List of all previously run scans
     def scanInstanceList(self):
@@ -595,4 +664,200 @@ class SpiderFootDb:
         except sqlite3.Error as e:
             sf.error("SQL error encountered when getting source element IDs: " + e.args[0])
 
+# Writes scan results, logs and scan status updates to the database from a
+# single background thread, which owns its own connection. Producers only
+# queue the writes, blocking only when more than queueSize are outstanding.
+# Whatever has been queued is written as one batch (of up to maxRows rows)
+# each time the writer catches up.
+#
+# The newest tailSize log entries are also kept in memory, for showing the
+# scan log while the scan runs without going to the database. INFO and
+# DEBUG messages are limited to logRate a second from each component (0 =
+# no limit, logRates holding limits for particular components), those
+# over the limit being counted rather than written.
+class SpiderFootDbWriter:
+    def __init__(self, opts, queueSize, maxRows, logRate=0, logRates=None,
+        tailSize=1000):
+        self.dbh = SpiderFootDb(opts)
+        self.dbh.scanBufferSet(maxRows)
+        self.queue = Queue.Queue(max(1, queueSize))
+        self.depthMax = 0
+        self.blockedCount = 0
+        self.blockedTime = 0
+        self.statsLock = threading.Lock()
+        self.logRate = logRate
+        if logRates == None:
+            logRates = dict()
+        self.logRates = logRates
+        # Per component: [rate, messages allowed, last message time,
+        # messages suppressed, scan instance]
+        self.logLimits = dict()
+        self.logTail = deque(maxlen=max(1, tailSize))
+        self.logCount = 0
+        self.logLock = threading.Lock()
+        self.thread = threading.Thread(name="SFDbWriter", target=self._writer)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    # Queue an operation, recording how long we were held up if the
+    # queue was full
+    def _put(self, item):
+        blocked = 0
+        try:
+            self.queue.put_nowait(item)
+        except Queue.Full:
+            started = time.time()
+            self.queue.put(item)
+            blocked = time.time() - started
+
+        depth = self.queue.qsize()
+        self.statsLock.acquire()
+        if depth > self.depthMax:
+            self.depthMax = depth
+        if blocked > 0:
+            self.blockedCount += 1
+            self.blockedTime += blocked
+        self.statsLock.release()
+
+    def _writer(self):
+        running = True
+        while running:
+            item = self.queue.get()
+            while True:
+                if item == None:
+                    running = False
+                    break
+
+                (method, args) = item
+                try:
+                    method(*args)
+                except BaseException as e:
+                    sf.error("Unable to write to the database: " + str(e), False)
+
+                try:
+                    item = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+
+            try:
+                self.dbh.scanBufferFlush()
+            except BaseException as e:
+                sf.error("Unable to write to the database: " + str(e), False)
+
+    # Same as SpiderFootDb.scanEventStore(), but queued
+    def scanEventStore(self, instanceId, sfEvent, truncateSize=0):
+        self._put((self.dbh.scanEventStore, (instanceId, sfEvent, truncateSize)))
+        return None
+
+    # Same as SpiderFootDb.scanLogEvent(), but queued and rate limited
+    def scanLogEvent(self, instanceId, classification, message, component=None):
+        if component == None:
+            component = "SpiderFoot"
+        now = time.time()
+        rows = list()
+
+        self.logLock.acquire()
+        try:
+            if classification in [ "INFO", "DEBUG" ]:
+                limit = self.logLimits.get(component)
+                if limit == None:
+                    rate = self.logRates.get(component.split('.')[-1], self.logRate)
+                    limit = [rate, rate, now, 0, instanceId]
+                    self.logLimits[component] = limit
+
+                if limit[0] > 0:
+                    # Allowances build up at the rate, up to a second's worth
+                    limit[1] = min(limit[0], limit[1] + (now - limit[2]) * limit[0])
+                    limit[2] = now
+                    limit[4] = instanceId
+                    if limit[1] < 1:
+                        limit[3] += 1
+                        return True
+
+                    limit[1] -= 1
+                    if limit[3] > 0:
+                        rows.append(self._logRow(instanceId, now, component, "INFO",
+                            self._suppressedMessage(limit[3])))
+                        limit[3] = 0
+
+            rows.append(self._logRow(instanceId, now, component, classification,
+                message))
+        finally:
+            self.logLock.release()
+
+        for row in rows:
+            self._put((self.dbh.scanLogEvent, row))
+        return True
 
+    # Add a log entry to the in-memory tail, returning the arguments to
+    # write it to the database with. Must be called with self.logLock held.
+    def _logRow(self, instanceId, now, component, classification, message):
+        generated = now * 1000
+        if type(message) is unicode:
+            tailMessage = message.encode('utf-8')
+        else:
+            tailMessage = message
+        self.logTail.append((generated, component, classification, tailMessage))
+        self.logCount += 1
+        return (instanceId, classification, message, component, generated)
+
+    def _suppressedMessage(self, count):
+        return "{0:,}".format(count) + " similar messages suppressed."
+
+    # The newest limit (all if None) log entries, newest first as from
+    # SpiderFootDb.scanLogs(), or None if there are more than are kept in
+    # memory.
+    def scanLogs(self, limit=None):
+        self.logLock.acquire()
+        try:
+            if limit == None:
+                limit = self.logCount
+            limit = int(limit)
+            if limit > len(self.logTail) and self.logCount > len(self.logTail):
+                return None
+
+            rows = list()
+            for row in reversed(self.logTail):
+                if len(rows) >= limit:
+                    break
+                rows.append(row)
+            return rows
+        finally:
+            self.logLock.release()
+
+    # Same as SpiderFootDb.scanInstanceSet(), but queued so that it is
+    # only written after everything queued before it
+    def scanInstanceSet(self, instanceId, started=None, ended=None, status=None):
+        self._put((self.dbh.scanInstanceSet, (instanceId, started, ended, status)))
+
+    # Queue depth and how much producers have been held up by a full queue
+    def stats(self):
+        self.statsLock.acquire()
+        ret = {
+            'depth': self.queue.qsize(),
+            'depthMax': self.depthMax,
+            'size': self.queue.maxsize,
+            'blockedCount': self.blockedCount,
+            'blockedTime': self.blockedTime
+        }
+        self.statsLock.release()
+        return ret
+
+    # Write out everything queued, then stop the writer thread and close
+    # its database handle
+    def close(self):
+        rows = list()
+        self.logLock.acquire()
+        for component in self.logLimits.keys():
+            limit = self.logLimits[component]
+            if limit[3] > 0:
+                rows.append(self._logRow(limit[4], time.time(), component, "INFO",
+                    self._suppressedMessage(limit[3])))
+                limit[3] = 0
+        self.logLock.release()
+
+        for row in rows:
+            self._put((self.dbh.scanLogEvent, row))
+        self.queue.put(None)
+        self.thread.join()
+        self.dbh.close()
@@ -10,21 +10,61 @@
 # Licence:     GPL
 #-------------------------------------------------------------------------------
 
-import inspect
 import hashlib
-import gzip
+import dns.exception
+import dns.name
+import dns.rdatatype
+import dns.resolver
+import dns.reversename
+import httplib
+import cPickle
 import re
+import sre_constants
+import sre_parse
 import os
 import random
 import socket
 import sys
+import threading
 import time
 import urllib2
+import Queue
+import tempfile
+import zlib
+import binascii
+import bisect
+import mmap
+import struct
 import StringIO
+from collections import deque
+from copy import deepcopy
+from netaddr import IPNetwork
 
 class SpiderFoot:
     dbh = None
     scanGUID = None
+    # Parsed public suffix lists, keyed by a hash of the list content and
+    # shared between all instances within the process.
+    psCache = dict()
+    psLast = None
+    psLock = threading.Lock()
+    # DNS answers (and failures), also shared between all instances within
+    # the process. Each entry is [expiry time, answer, last used tick].
+    dnsCache = dict()
+    dnsInFlight = dict()
+    dnsLock = threading.Lock()
+    dnsTick = 0
+    resolver = None
+    # Idle HTTP(S) connections kept for re-use, shared the same way
+    httpPool = None
+    httpLock = threading.Lock()
+    # Patterns used by parseLinks(), plus those for mentions of each
+    # domain links have been parsed for (compiled on first use)
+    linkRx = re.compile('(href|src|action|url)[:=][ \'\"]*(.[^\'\"<> ]*)', re.IGNORECASE)
+    linkRunRx = re.compile('[a-zA-Z0-9\-\.]+', re.IGNORECASE)
+    linkRunChars = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-.')
+    linkInPageRx = re.compile('.*#.[^/]+')
+    linkPatterns = dict()
 
     # 'options' is a dictionary of options which changes the behaviour
     # of how certain things are done in this module
@@ -33,6 +73,8 @@ class SpiderFoot:
     def __init__(self, options, handle=None):
         self.handle = handle
         self.opts = options
+        self.contentPatterns = SpiderFootContentPatterns()
+        self.log = SpiderFootLogger(self, __name__)
 
     # Bit of a hack to support SOCKS because of the loading order of
     # modules. sfscan will call this to update the socket reference
@@ -116,36 +158,26 @@ class SpiderFoot:
             self._dblog("STATUS", message)
 
     def info(self, message):
-        frm = inspect.stack()[1]
-        mod = inspect.getmodule(frm[0])
-
-        if mod == None:
-            modName = "Unknown"
-        else:
-            modName = mod.__name__
-
-        if self.dbh == None:
-            print '[' + modName + '] ' + message
-        else:
-            self._dblog("INFO", message, modName)
+        self.log.write("INFO", message, self.callerName())
         return
 
     def debug(self, message):
         if self.opts['_debug'] == False:
             return
-        frm = inspect.stack()[1]
-        mod = inspect.getmodule(frm[0])
+        self.log.write("DEBUG", message, self.callerName())
+        return
 
-        if mod == None:
-            modName = "Unknown"
-        else:
-            modName = mod.__name__
+    # Name of the module that called the logging function calling this,
+    # which is the component info() and debug() log messages against.
+    # Loggers from logger() know their component and avoid looking it up.
+    def callerName(self):
+        return sys._getframe(2).f_globals.get('__name__', "Unknown")
 
-        if self.dbh == None:
-            print '[' + modName + '] ' + message
-        else:
-            self._dblog("DEBUG", message, modName)
-        return
+    # A logger for component (normally the __name__ of the module using it)
+    # optionally only logging one in every sampling[level] messages of a
+    # level.
+    def logger(self, component, sampling=None):
+        return SpiderFootLogger(self, component, sampling)
 
     def myPath(self):
         # This will get us the program's directory, even if we are frozen using py2exe.
@@ -461,9 +493,66 @@ class SpiderFoot:
     # Obtain the domain name for a supplied hostname
     # tldList needs to be an array based on the Mozilla public list
     def hostDomain(self, hostname, tldList):
-        ps = PublicSuffixList(tldList)
+        ps = self.publicSuffixList(tldList)
         return ps.get_public_suffix(hostname)
 
+    # Obtain the parsed PublicSuffixList for a list of TLDs. Parsing the
+    # list is expensive, so it is only done once per process for a given
+    # list content, and the parsed form is also kept in the cache directory
+    # so that it doesn't need to be parsed again on the next start-up.
+    def publicSuffixList(self, tldList):
+        # Callers almost always pass the same list object as last time
+        last = SpiderFoot.psLast
+        if last != None and last[0] is tldList:
+            return last[1]
+
+        SpiderFoot.psLock.acquire()
+        try:
+            h = hashlib.sha256()
+            for line in tldList:
+                if type(line) is unicode:
+                    line = line.encode('utf-8')
+                h.update(line + '\n')
+            digest = h.hexdigest()
+
+            ps = SpiderFoot.psCache.get(digest)
+            if ps == None:
+                ps = self.publicSuffixListLoad(digest, tldList)
+                SpiderFoot.psCache[digest] = ps
+            SpiderFoot.psLast = (tldList, ps)
+            return ps
+        finally:
+            SpiderFoot.psLock.release()
+
+    # Load a pre-compiled PublicSuffixList from the cache directory, or
+    # parse tldList and store the compiled form there for next time.
+    def publicSuffixListLoad(self, digest, tldList):
+        pathLabel = hashlib.sha224("internet_tlds_psl_" + digest).hexdigest()
+        cacheFile = self.cachePath() + "/" + pathLabel
+        try:
+            fp = open(cacheFile, "rb")
+            try:
+                return cPickle.load(fp)
+            finally:
+                fp.close()
+        except BaseException as e:
+            pass
+
+        ps = PublicSuffixList(tldList)
+        try:
+            # Write to a temporary file first so that other processes never
+            # load a partially written file.
+            tmpFile = cacheFile + "." + str(os.getpid())
+            fp = open(tmpFile, "wb")
+            cPickle.dump(ps, fp, cPickle.HIGHEST_PROTOCOL)
+            fp.close()
+            if os.path.exists(cacheFile):
+                os.remove(cacheFile)
+            os.rename(tmpFile, cacheFile)
+        except BaseException as e:
+            self.debug("Unable to cache the compiled public suffix list: " + str(e))
+        return ps
+
     # Simple way to verify IPs.
     def validIP(self, address):
         parts = address.split(".")
@@ -479,6 +568,178 @@ class SpiderFoot:
                 return False
         return True
 
+    # Resolve a hostname, returning the same (hostname, aliases, addresses)
+    # as socket.gethostbyname_ex(), or None if it doesn't resolve.
+    def resolveHost(self, hostname):
+        if self.validIP(hostname):
+            return (hostname, [], [hostname])
+        return self.dnsLookup('A', hostname)
+
+    # Reverse-resolve an IP address, returning the same (hostname, aliases,
+    # addresses) as socket.gethostbyaddr(), or None if it doesn't resolve.
+    def resolveIP(self, ipaddr):
+        return self.dnsLookup('PTR', ipaddr)
+
+    # Resolve many hostnames (or IP addresses if reverse is True) at once,
+    # up to concurrency (default _dnsconcurrency) at a time. Yields (name,
+    # result) tuples in the order the lookups complete, results being as per
+    # resolveHost() and resolveIP(). names may be any iterable, and is only
+    # read from as lookups are started. No further lookups are started once
+    # the caller stops iterating. For reverse look-ups, any hostnames found
+    # ending in confirmDomain are also resolved forward by the same worker,
+    # so that the caller checking them finds the answer already cached.
+    def resolveBatch(self, names, reverse=False, concurrency=None,
+        confirmDomain=None):
+        if concurrency == None:
+            concurrency = self.opts.get('_dnsconcurrency', 10)
+
+        # No point starting more workers than there are names to look up
+        running = int(concurrency)
+        if hasattr(names, '__len__'):
+            running = min(running, len(names))
+        running = max(1, running)
+
+        names = iter(names)
+        nameLock = threading.Lock()
+        results = Queue.Queue()
+        state = { 'stopped': False }
+
+        def worker():
+            try:
+                while True:
+                    nameLock.acquire()
+                    try:
+                        if state['stopped']:
+                            return
+                        name = names.next()
+                    except StopIteration:
+                        return
+                    finally:
+                        nameLock.release()
+
+                    if reverse:
+                        res = self.resolveIP(name)
+                        if res != None and confirmDomain != None:
+                            for host in [res[0]] + res[1]:
+                                if host.lower().endswith(confirmDomain):
+                                    self.resolveHost(host)
+                        results.put((name, res))
+                    else:
+                        results.put((name, self.resolveHost(name)))
+            finally:
+                results.put(None)
+
+        for i in range(running):
+            t = threading.Thread(name="SFDns_" + str(i), target=worker)
+            t.setDaemon(True)
+            t.start()
+
+        try:
+            while running > 0:
+                res = results.get()
+                if res == None:
+                    running -= 1
+                    continue
+                yield res
+        finally:
+            state['stopped'] = True
+
+    # The dnspython resolver to use, honouring any DNS server override
+    def dnsResolver(self):
+        if self.resolver == None:
+            if self.opts.get('_dnsserver', '') != '':
+                res = dns.resolver.Resolver(configure=False)
+                res.nameservers = [ self.opts['_dnsserver'] ]
+            else:
+                res = dns.resolver.Resolver()
+            res.lifetime = self.opts.get('_dnstimeout', 5)
+            res.timeout = min(res.timeout, res.lifetime)
+            self.resolver = res
+        return self.resolver
+
+    # Look up a name through the process-wide DNS cache, which holds answers
+    # for their TTL and failures for a while too. Concurrent lookups of the
+    # same name wait for the first one rather than querying again.
+    def dnsLookup(self, rdtype, name):
+        key = (self.opts.get('_dnsserver', ''), rdtype, name.lower())
+
+        SpiderFoot.dnsLock.acquire()
+        while True:
+            entry = SpiderFoot.dnsCache.get(key)
+            if entry != None and entry[0] > time.time():
+                SpiderFoot.dnsTick += 1
+                entry[2] = SpiderFoot.dnsTick
+                SpiderFoot.dnsLock.release()
+                return entry[1]
+
+            pending = SpiderFoot.dnsInFlight.get(key)
+            if pending == None:
+                break
+            SpiderFoot.dnsLock.release()
+            pending.wait()
+            SpiderFoot.dnsLock.acquire()
+
+        done = threading.Event()
+        SpiderFoot.dnsInFlight[key] = done
+        SpiderFoot.dnsLock.release()
+
+        ttl = 0
+        ret = None
+        try:
+            (ttl, ret) = self.dnsQuery(rdtype, name)
+        finally:
+            SpiderFoot.dnsLock.acquire()
+            if ttl > 0:
+                SpiderFoot.dnsTick += 1
+                SpiderFoot.dnsCache[key] = [ time.time() + ttl, ret, SpiderFoot.dnsTick ]
+                if len(SpiderFoot.dnsCache) > self.opts.get('_dnscachesize', 10000):
+                    self.dnsCacheTrim()
+            del SpiderFoot.dnsInFlight[key]
+            SpiderFoot.dnsLock.release()
+            done.set()
+
+        return ret
+
+    # Drop the least recently used quarter of the DNS cache. Must be called
+    # with dnsLock held.
+    def dnsCacheTrim(self):
+        entries = sorted(SpiderFoot.dnsCache.items(), key=lambda e: e[1][2])
+        for (key, entry) in entries[0:len(entries) / 4 + 1]:
+            del SpiderFoot.dnsCache[key]
+
+    # Query DNS, returning how long the result may be cached for and the
+    # result in the form of socket.gethostbyname_ex()/gethostbyaddr().
+    def dnsQuery(self, rdtype, name):
+        try:
+            res = self.dnsResolver()
+            if rdtype == 'PTR':
+                answer = res.query(dns.reversename.from_address(name), 'PTR')
+                hosts = [ str(r.target).rstrip('.') for r in answer ]
+                ret = (hosts[0], hosts[1:], [ name ])
+            else:
+                # Names are always fully qualified, so don't have the
+                # resolver try them again with search domains appended.
+                answer = res.query(dns.name.from_text(name), rdtype)
+                aliases = list()
+                for rrset in answer.response.answer:
+                    if rrset.rdtype == dns.rdatatype.CNAME:
+                        aliases.append(str(rrset.name).rstrip('.'))
+                ret = (str(answer.canonical_name).rstrip('.'), aliases,
+                    [ r.address for r in answer ])
+            return (answer.rrset.ttl, ret)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            # The name doesn't exist (or has no such records), which isn't
+            # going to change during a scan.
+            return (300, None)
+        except (dns.exception.Timeout, dns.resolver.NoNameservers) as e:
+            # Don't keep waiting on the same unresponsive servers, but try
+            # again later on.
+            self.log.debug("Unable to resolve %s: %s", name, e)
+            return (30, None)
+        except BaseException as e:
+            self.log.debug("Unable to resolve %s: %s", name, e)
+            return (0, None)
+
     # Converts a dictionary of k -> array to a nested
     # tree that can be digested by d3 for visualizations.
     def dataParentChildToTree(self, data):
@@ -537,7 +798,7 @@ class SpiderFoot:
         for line in robotsTxtData.splitlines():
             if line.lower().startswith('disallow:'):
                 m = re.match('disallow:\s*(.[^ #]*)', line, re.IGNORECASE)
-                self.debug('robots.txt parsing found disallow: ' + m.group(1))
+                self.log.debug('robots.txt parsing found disallow: %s', m.group(1))
                 returnArr.append(m.group(1))
                 continue
 
@@ -558,58 +819,49 @@ class SpiderFoot:
             return None
 
         # Find actual links
-        try:
-            regRel = re.compile('(href|src|action|url)[:=][ \'\"]*(.[^\'\"<> ]*)',
-                re.IGNORECASE)
-            urlsRel = regRel.findall(data)
-        except Exception as e:
-            self.error("Error applying regex to: " + data)
-            return None
+        urlsRel = self.linkRx.findall(data)
 
         # Find potential links that aren't links (text possibly in comments, etc.)
-        try:
-            # Because we're working with a big blob of text now, don't worry
-            # about clobbering proper links by url decoding them.
+        # Because we're working with a big blob of text now, don't worry
+        # about clobbering proper links by url decoding them.
+        if '%' in data:
             data = urllib2.unquote(data)
-            regRel = re.compile('(.)([a-zA-Z0-9\-\.]+\.'+domain+')', 
-                re.IGNORECASE)
-            urlsRel = urlsRel + regRel.findall(data)
-        except Exception as e:
-            self.error("Error applying regex2 to: " + data)
-        try:
-            # Some links are sitting inside a tag, e.g. Google's use of <cite>
-            regRel = re.compile('(>)('+domain+'/.[^<]+)', re.IGNORECASE)
-            urlsRel = urlsRel + regRel.findall(data)
-        except Exception as e:
-            self.error("Error applying regex3 to: " + data)
+        (mentionRx, tagRx) = self.linkDomainPatterns(domain)
+        urlsRel.extend(self.linkMentions(data, mentionRx, len(domain) + 1))
+
+        # Some links are sitting inside a tag, e.g. Google's use of <cite>
+        urlsRel.extend(tagRx.findall(data))
+
+        domainLower = domain.lower()
+        baseUrl = None
+        baseDir = None
 
         # Loop through all the URLs/links found by the regex
-        for linkTuple in urlsRel:
-            # Remember the regex will return two vars (two groups captured)
-            meta = linkTuple[0]
-            link = linkTuple[1]
+        for (meta, link) in urlsRel:
+            linkLower = link.lower()
             absLink = None
 
             # Don't include stuff likely part of some dynamically built incomplete
             # URL found in Javascript code (character is part of some logic)
-            if link[len(link)-1] == '.' or link[0] == '+' or \
-                'javascript:' in link.lower() or '();' in link:
-                self.debug('unlikely link: ' + link)
+            if link[-1] == '.' or link[0] == '+' or \
+                'javascript:' in linkLower or '();' in link:
+                self.log.debug('unlikely link: %s', link)
                 continue
 
             # Filter in-page links
-            if re.match('.*#.[^/]+', link):
-                self.debug('in-page link: ' + link)
+            if '#' in link and self.linkInPageRx.match(link):
+                self.log.debug('in-page link: %s', link)
                 continue
 
             # Ignore mail links
-            if 'mailto:' in link.lower():
-                self.debug("Ignoring mail link: " + link)
+            if 'mailto:' in linkLower:
+                self.log.debug("Ignoring mail link: %s", link)
                 continue
 
             # URL decode links
-            if '%2f' in link.lower():
+            if '%2f' in linkLower:
                 link = urllib2.unquote(link)
+                linkLower = link.lower()
 
             # Capture the absolute link:
             # If the link contains ://, it is already an absolute link
@@ -618,15 +870,19 @@ class SpiderFoot:
 
             # If the link starts with a /, the absolute link is off the base URL
             if link.startswith('/'):
-                absLink = self.urlBaseUrl(url) + link
+                if baseUrl == None:
+                    baseUrl = self.urlBaseUrl(url)
+                absLink = baseUrl + link
 
             # Maybe the domain was just mentioned and not a link, so we make it one
-            if absLink == None and domain.lower() in link.lower():
+            if absLink == None and domainLower in linkLower:
                 absLink = 'http://' + link
 
             # Otherwise, it's a flat link within the current directory
             if absLink == None:
-                absLink = self.urlBaseDir(url) + link
+                if baseDir == None:
+                    baseDir = self.urlBaseDir(url)
+                absLink = baseDir + link
 
             # Translate any relative pathing (../)
             absLink = self.urlRelativeToAbsolute(absLink)
@@ -634,17 +890,93 @@ class SpiderFoot:
 
         return returnLinks
 
+    # Patterns for finding mentions of a domain in content: the start of
+    # each mention of '.<domain>', and '<domain>/...' directly after a tag.
+    def linkDomainPatterns(self, domain):
+        key = domain.lower()
+        patterns = self.linkPatterns.get(key)
+        if patterns == None:
+            patterns = (re.compile('(?=\\.' + re.escape(domain) + ')', re.IGNORECASE),
+                re.compile('(>)(' + re.escape(domain) + '/.[^<]+)', re.IGNORECASE))
+            self.linkPatterns[key] = patterns
+        return patterns
+
+    # Find host names ending with a domain mentioned in content, returning
+    # the same (preceding character, host name) tuples as findall() would
+    # for '(.)([a-zA-Z0-9\-\.]+\.<domain>)', but in a single pass. That
+    # regex backtracks over every run of host name characters from every
+    # starting point, which is quadratic in the length of long runs such
+    # as base64 data.
+    def linkMentions(self, data, mentionRx, mentionLen):
+        found = list()
+        end = 0
+        runEnd = 0
+        runStart = 0
+        last = None
+
+        for m in mentionRx.finditer(data):
+            pos = m.start()
+            if pos < end:
+                continue
+
+            # Still within the run of host name characters being looked at
+            if pos < runEnd:
+                last = pos
+                continue
+
+            if last != None:
+                end = self.linkMention(data, found, runStart, last, mentionLen, end)
+                last = None
+                if pos < end:
+                    continue
+
+            # A new run, which the greedy regex would match from its start
+            # through to the last mention within it
+            runStart = pos
+            while runStart > end and data[runStart - 1] in self.linkRunChars:
+                runStart -= 1
+            runEnd = self.linkRunRx.match(data, pos).end()
+            last = pos
+
+        if last != None:
+            self.linkMention(data, found, runStart, last, mentionLen, end)
+
+        return found
+
+    # Add the match for the run of host name characters starting at
+    # runStart whose last mention of the domain is at last, returning where
+    # the next match may start.
+    def linkMention(self, data, found, runStart, last, mentionLen, end):
+        start = max(end, runStart - 1)
+        if start == runStart - 1 and data[start] == '\n':
+            start += 1
+        if last < start + 2:
+            return end
+
+        found.append((data[start], data[start + 1:last + mentionLen]))
+        return last + mentionLen
+
     # Fetch a URL, return the response object
+    # No more than sizeLimit bytes of the (decompressed) body are read,
+    # defaulting to _fetchmaxsize (0 = no limit); 'truncated' is set if
+    # there was more. If spool is set, the content is returned undecoded
+    # as a file object (a SpooledTemporaryFile, which only goes to disk
+    # when large) for the caller to read and close.
     def fetchUrl(self, url, fatal=False, cookies=None, timeout=30, 
-        useragent="SpiderFoot", headers=None, dontMangle=False):
+        useragent="SpiderFoot", headers=None, dontMangle=False,
+        sizeLimit=None, spool=False):
         result = {
             'code': None,
             'status': None,
             'content': None,
             'headers': None,
-            'realurl': None
+            'realurl': None,
+            'truncated': False
         }
 
+        if sizeLimit == None:
+            sizeLimit = self.opts.get('_fetchmaxsize', 0)
+
         if url == None:
             self.error('Blank URL supplied to be fetched')
             return result
@@ -667,29 +999,53 @@ class SpiderFoot:
             req = urllib2.Request(url, None, header)
             if cookies != None:
                 req.add_header('cookie', cookies)
-                self.info("Fetching (incl. cookies): " + url + \
-                    " [user-agent: " + header['User-Agent'] + "] [timeout: " + \
-                    str(timeout) + "]")
+                self.log.info("Fetching (incl. cookies): %s [user-agent: %s] [timeout: %s]",
+                    url, header['User-Agent'], timeout)
             else:
-                self.info("Fetching: " + url + " [user-agent: " + \
-                    header['User-Agent'] + "] [timeout: " + str(timeout) + "]")
+                self.log.info("Fetching: %s [user-agent: %s] [timeout: %s]",
+                    url, header['User-Agent'], timeout)
 
             result['headers'] = dict()
-            opener = urllib2.build_opener(SmartRedirectHandler())
+            pool = self.fetchPool()
+            opener = urllib2.build_opener(SmartRedirectHandler(),
+                SpiderFootHTTPHandler(pool), SpiderFootHTTPSHandler(pool))
             fullPage = opener.open(req, timeout=timeout)
-            content = fullPage.read()
-
             for k, v in fullPage.info().items():
                 result['headers'][k.lower()] = v
 
-            # Content is compressed
-            if 'gzip' in result['headers'].get('content-encoding', ''):
-                content = gzip.GzipFile(fileobj=StringIO.StringIO(content)).read()
-
-            if dontMangle:
+            if spool:
+                content = tempfile.SpooledTemporaryFile(max_size=1048576)
+                write = content.write
+            else:
+                content = list()
+                write = content.append
+            try:
+                result['truncated'] = self.fetchBody(fullPage, write,
+                    'gzip' in result['headers'].get('content-encoding', ''),
+                    sizeLimit)
+            except BaseException as e:
+                if spool:
+                    content.close()
+                raise
+            finally:
+                fullPage.close()
+
+            if result['truncated']:
+                self.log.info("Stopped reading %s after %s bytes.", url,
+                    sizeLimit)
+
+            if spool:
+                content.seek(0)
                 result['content'] = content
             else:
-                result['content'] = unicode(content, 'utf-8', errors='replace')
+                # Drop the pieces before decoding, so there's only one
+                # copy of the raw content held at a time
+                raw = ''.join(content)
+                del content[:]
+                if dontMangle:
+                    result['content'] = raw
+                else:
+                    result['content'] = unicode(raw, 'utf-8', errors='replace')
 
             #print "FOR: " + url
             #print "HEADERS: " + str(result['headers'])
@@ -702,6 +1058,7 @@ class SpiderFoot:
             result['code'] = h.code
             for k, v in h.info().items():
                 result['headers'][k.lower()] = v
+            h.close()
             if fatal:
                 self.fatal('URL could not be fetched (' + h.code + ')')
         except urllib2.URLError as e:
@@ -718,22 +1075,64 @@ class SpiderFoot:
 
         return result
 
+    # Read the body of a response, passing it to write() a piece at a time
+    # and decompressing it as it's read if gzipped, up to sizeLimit bytes
+    # (0 = no limit). Returns True if there was more than that.
+    def fetchBody(self, response, write, gzipped, sizeLimit):
+        if gzipped:
+            # 16 + MAX_WBITS to expect a gzip header
+            decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        def pieces():
+            while True:
+                data = response.read(65536)
+                if not gzipped:
+                    if len(data) == 0:
+                        return
+                    yield data
+                elif len(data) == 0:
+                    yield decomp.flush()
+                    return
+                else:
+                    # A little compressed data can expand enormously, so
+                    # decompress it a bit at a time
+                    while len(data) > 0:
+                        yield decomp.decompress(data, 1048576)
+                        data = decomp.unconsumed_tail
+
+        size = 0
+        for piece in pieces():
+            if sizeLimit > 0 and size + len(piece) > sizeLimit:
+                write(piece[0:sizeLimit - size])
+                return True
+            write(piece)
+            size += len(piece)
+
+        return False
+
+    # The pool of HTTP(S) connections used by fetchUrl()
+    def fetchPool(self):
+        self.httpLock.acquire()
+        if SpiderFoot.httpPool == None:
+            SpiderFoot.httpPool = SpiderFootHttpPool()
+        self.httpLock.release()
+        SpiderFoot.httpPool.setMaxConns(self.opts.get('_fetchconnections', 50))
+        return SpiderFoot.httpPool
+
     # Check if wildcard DNS is enabled by looking up two random hostnames
     def checkDnsWildcard(self, target):
         randpool = 'bcdfghjklmnpqrstvwxyz3456789'
         randhost1 = ''.join([random.choice(randpool) for x in range(6)])
         randhost2 = ''.join([random.choice(randpool) for x in range(10)])
 
-        # An exception will be raised if either of the resolutions fail
-        try:
-            addrs = socket.gethostbyname_ex(randhost1 + "." + target)
-            addrs = socket.gethostbyname_ex(randhost2 + "." + target)
-            self.debug(target + " has wildcard DNS.")
-            return True
-        except BaseException as e:
+        if self.resolveHost(randhost1 + "." + target) == None or \
+            self.resolveHost(randhost2 + "." + target) == None:
             self.debug(target + " does not have wildcard DNS.")
             return False
 
+        self.debug(target + " has wildcard DNS.")
+        return True
+
     # Scrape Google for content, starting at startUrl and iterating through
     # results based on options supplied. Will return a dictionary of all pages
     # fetched and their contents {page => content}.
@@ -962,14 +1361,24 @@ class SpiderFootPlugin(object):
     _stopScanning = False
     # Modules that will be notified when this module produces events
     _listenerModules = list()
+    # Event type to listener modules lookup, built from _listenerModules
+    _listenerIndex = None
     # Current event being processed
     _currentEvent = None
+    # Scan event queue to dispatch events through, set by the controller.
+    # When not set, listeners are called directly within this thread.
+    _eventQueue = None
     # Name of this module, set at startup time
     __name__ = "module_name_not_set!"
+    # SpiderFoot object of the scan this module is part of, set in setup()
+    sf = None
+    # Default options, overridden by the implementer
+    opts = dict()
 
-    # Not really needed in most cases.
+    # Each instance gets its own copy of the module's default options, as
+    # setup() overrides them and several scans may be running at once.
     def __init__(self):
-        pass
+        self.opts = deepcopy(self.opts)
 
     # Hack to override module's use of socket, replacing it with
     # one that uses the supplied SOCKS server
@@ -981,7 +1390,9 @@ class SpiderFootPlugin(object):
     # Python seems to cache local variables even between threads.
     def clearListeners(self):
         self._listenerModules = list()
+        self._listenerIndex = None
         self._stopScanning = False
+        self._eventQueue = None
 
     # Will always be overriden by the implementer.
     def setup(self, sf, url, userOpts=dict()):
@@ -991,10 +1402,23 @@ class SpiderFootPlugin(object):
     # work with.
     def registerListener(self, listener):
         self._listenerModules.append(listener)
+        self._listenerIndex = None
+
+    # Use a pre-built event type to listener index (see buildListenerIndex),
+    # typically one shared between all modules of a scan.
+    def setListenerIndex(self, index):
+        self._listenerIndex = index
+
+    # Queue that events will be put on for listeners to pick up from their
+    # own worker threads, rather than being handled in this thread.
+    def setEventQueue(self, queue):
+        self._eventQueue = queue
 
     # Call the handleEvent() method of every other plug-in listening for
-    # events from this plug-in. Remember that those plug-ins will be called
-    # within the same execution context of this thread, not on their own.
+    # events from this plug-in. If an event queue has been set, the event
+    # is queued for each listener instead and handled by its own workers,
+    # otherwise listeners are called within the execution context of this
+    # thread.
     def notifyListeners(self, sfEvent):
         eventName = sfEvent.eventType
         eventData = sfEvent.data
@@ -1018,35 +1442,40 @@ class SpiderFootPlugin(object):
         # from dest, as we are already operating on dest's original
         # notification from one of the upstream events.
 
+        # Each summary carries a bloom filter of its ancestors' types and
+        # data, so the walk is only needed when the filter says there
+        # may be a match, which for nearly every event it won't.
         prevEvent = sfEvent.sourceEvent
+        if prevEvent != None and not prevEvent.mayDescendFrom(sfEvent.summary()):
+            prevEvent = None
         while prevEvent != None:
             if prevEvent.sourceEvent != None:
                 if prevEvent.sourceEvent.eventType == sfEvent.eventType and \
-                    prevEvent.sourceEvent.data.lower() == sfEvent.data.lower():
+                    prevEvent.sourceEvent.dataMatches(sfEvent.data):
                     #print "Skipping notification of " + sfEvent.eventType + " / " + sfEvent.data
                     storeOnly = True
                     break
             prevEvent = prevEvent.sourceEvent
 
-        self._listenerModules.sort()
-        for listener in self._listenerModules:
-            #print listener.__module__ + ": " + listener.watchedEvents().__str__()
-            if eventName not in listener.watchedEvents() and '*' not in listener.watchedEvents():
-                #print listener.__module__ + " not listening for " + eventName
-                continue
+        if self._listenerIndex == None:
+            self._listenerIndex = buildListenerIndex(self._listenerModules)
 
+        for listener in self._listenerIndex.get(eventName, self._listenerIndex['*']):
             if storeOnly and "__stor" not in listener.__module__:
                 #print "Storing only for " + sfEvent.eventType + " / " + sfEvent.data
                 continue
 
-            #print "Notifying " + eventName + " to " + listener.__module__
-            listener._currentEvent = sfEvent
-
             # Check if we've been asked to stop in the meantime, so that
             # notifications stop triggering module activity.
             if self.checkForStop():
                 return None
 
+            if self._eventQueue != None:
+                self._eventQueue.put(listener, sfEvent)
+                continue
+
+            #print "Notifying " + eventName + " to " + listener.__module__
+            listener._currentEvent = sfEvent
             listener.handleEvent(sfEvent)
 
     # Called to stop scanning
@@ -1087,21 +1516,53 @@ class SpiderFootPlugin(object):
     def start(self):
         return None
 
+    # Number of events this module can handle at the same time. Modules
+    # whose handleEvent() is safe to call from several threads at once may
+    # override this. The scan runs at least _modulethreads regardless.
+    def eventConcurrency(self):
+        return 1
+
+# Build an index of event types to the listener modules interested in them,
+# so that dispatching an event is a single lookup. Modules watching for '*'
+# are included under every event type, and alone under '*' for event types
+# no module has asked for specifically. Listeners are ordered by name.
+def buildListenerIndex(listeners):
+    index = dict()
+    wildcards = list()
+
+    for listener in sorted(listeners, key=lambda l: l.__name__):
+        watched = listener.watchedEvents()
+        if watched == None:
+            continue
+        if '*' in watched:
+            wildcards.append(listener)
+        for eventName in watched:
+            if eventName == '*':
+                continue
+            index.setdefault(eventName, list()).append(listener)
+
+    for eventName in index.keys():
+        index[eventName] = tuple(sorted(set(index[eventName] + wildcards),
+            key=lambda l: l.__name__))
+    index['*'] = tuple(wildcards)
+    return index
+
 # Class for SpiderFoot Events
+# An event (a piece of data found, and where it was found from) passed
+# between modules. Scans create a great many of these, so they are kept
+# compact: there are no per-instance dicts, event types are interned and
+# the hash is only worked out once, when first asked for. sourceEvent is
+# a SpiderFootEventSummary of the event this one came from, not the event
+# itself.
 class SpiderFootEvent(object):
-    generated = None
-    eventType = None
-    confidence = None
-    visibility = None
-    risk = None
-    module = None
-    data = None
-    sourceEvent = None
-    sourceEventHash = None
-    __id = None
-    
+    __slots__ = [ 'generated', 'eventType', 'confidence', 'visibility', 'risk',
+        'module', 'data', 'sourceEvent', 'sourceEventHash', '__salt', '__hash',
+        '__summary', '__weakref__' ]
+
     def __init__(self, eventType, data, module, sourceEvent=None,
         confidence=100, visibility=100, risk=0):
+        if type(eventType) is str:
+            eventType = intern(eventType)
         self.eventType = eventType
         self.generated = time.time()
         self.confidence = confidence
@@ -1109,25 +1570,58 @@ class SpiderFootEvent(object):
         self.risk = risk
         self.module = module
         self.data = data
-        self.sourceEvent = sourceEvent
+        self.__salt = random.getrandbits(32)
+        self.__hash = None
+        self.__summary = None
 
         # "ROOT" is a special "hash" reserved for elements with no
         # actual parent (e.g. the first page spidered.)
         if sourceEvent != None:
+            self.sourceEvent = sourceEvent.summary()
             self.sourceEventHash = sourceEvent.getHash()
         else:
+            self.sourceEvent = None
             self.sourceEventHash = "ROOT"
 
-        self.__id = self.eventType + str(self.generated) + self.module + \
-            str(random.randint(0, 99999999))
-
     # Unique hash of this event
     def getHash(self):
-        if self.eventType == "INITIAL_TARGET":
-            return "ROOT"
+        if self.__hash != None:
+            return self.__hash
 
-        digestStr = self.__id.encode('raw_unicode_escape')
-        return hashlib.sha256(digestStr).hexdigest()
+        if self.eventType == "INITIAL_TARGET":
+            self.__hash = "ROOT"
+            return self.__hash
+
+        digestStr = self.eventType + str(self.generated) + self.module + \
+            str(self.__salt)
+        self.__hash = hashlib.sha256(digestStr.encode('raw_unicode_escape')).hexdigest()
+        return self.__hash
+
+    # What events created from this one keep of it
+    def summary(self):
+        if self.__summary == None:
+            self.__summary = SpiderFootEventSummary(self)
+        return self.__summary
+
+    # Whether data is the same as the data of this event (ignoring case)
+    def dataMatches(self, data):
+        return self.data.lower() == data.lower()
+
+    # Events are pickled to pass them to and from modules running in
+    # worker processes, which needs doing explicitly with __slots__
+    def __getstate__(self):
+        return (self.generated, self.eventType, self.confidence, self.visibility,
+            self.risk, self.module, self.data, self.sourceEvent,
+            self.sourceEventHash, self.__salt, self.__hash)
+
+    def __setstate__(self, state):
+        (self.generated, eventType, self.confidence, self.visibility,
+            self.risk, self.module, self.data, self.sourceEvent,
+            self.sourceEventHash, self.__salt, self.__hash) = state
+        if type(eventType) is str:
+            eventType = intern(eventType)
+        self.eventType = eventType
+        self.__summary = None
 
     # Update variables as new information becomes available
     def setConfidence(self, confidence):
@@ -1142,6 +1636,478 @@ class SpiderFootEvent(object):
     def setSourceEventHash(self, srcHash):
         self.sourceEventHash = srcHash
 
+# What an event keeps of the event it came from: its hash, type, module and
+# data, the data being cut down to summarySize characters if longer (with a
+# digest kept so that it can still be compared), plus the summary of the
+# event that one came from in turn. Modules only look at the type and data
+# of source events, and only pass them on as the source of new events, so
+# this is all they need. Holding summaries rather than the events means the
+# content of a page, for instance, is freed once every module has handled
+# it, rather than being kept for as long as anything found in it is.
+# bits is the summarised event's type and (lower-cased) data hashed into
+# a few bits of an ancestryBits-wide bloom filter, and ancestry the bits
+# of all the events it came from, so that whether an event repeats one
+# of its ancestors can usually be ruled out without walking back.
+class SpiderFootEventSummary(object):
+    __slots__ = [ 'generated', 'eventType', 'module', 'data', 'truncated',
+        'sourceEvent', 'sourceEventHash', 'bits', 'ancestry', '__digest',
+        '__hash' ]
+
+    summarySize = 4096
+    ancestryBits = 256
+
+    def __init__(self, event):
+        self.generated = event.generated
+        self.eventType = event.eventType
+        self.module = event.module
+        self.sourceEvent = event.sourceEvent
+        self.sourceEventHash = event.sourceEventHash
+        self.__hash = event.getHash()
+        self.__digest = None
+        self.truncated = False
+
+        if self.sourceEvent != None:
+            self.ancestry = self.sourceEvent.ancestry | self.sourceEvent.bits
+        else:
+            self.ancestry = 0
+
+        data = event.data
+        if type(data) in [ str, unicode ]:
+            lowerData = data.lower()
+            self.bits = self.keyBits(self.eventType, lowerData)
+            if len(data) > self.summarySize:
+                self.__digest = self.dataDigest(lowerData)
+                self.truncated = True
+                data = data[:self.summarySize]
+        else:
+            self.bits = self.keyBits(self.eventType, None)
+        self.data = data
+
+    def getHash(self):
+        return self.__hash
+
+    def summary(self):
+        return self
+
+    # Whether data is the same as the data of the summarised event
+    # (ignoring case)
+    def dataMatches(self, data):
+        if not self.truncated:
+            return self.data.lower() == data.lower()
+        if len(data) <= self.summarySize:
+            return False
+        return self.__digest == self.dataDigest(data.lower())
+
+    # A cheap checksum of (lower-cased) data, as payloads summarised
+    # can be large and there can be many of them
+    def dataDigest(self, data):
+        if type(data) is unicode:
+            data = data.encode('utf-8')
+        return (len(data), zlib.crc32(data), zlib.adler32(data))
+
+    # Bloom filter bits for an event type and its (lower-cased) data.
+    # Equal str and unicode data hash the same, as they compare equal.
+    def keyBits(self, eventType, data):
+        h = hash((eventType, data))
+        n = self.ancestryBits
+        return (1 << (h % n)) | (1 << ((h // n) % n)) | \
+            (1 << ((h // (n * n)) % n))
+
+    # Whether the events this one came from might include one of the same
+    # type and data as the event summarised by summary. False means
+    # they definitely don't.
+    def mayDescendFrom(self, summary):
+        return self.ancestry & summary.bits == summary.bits
+
+    def __getstate__(self):
+        return (self.generated, self.eventType, self.module, self.data,
+            self.truncated, self.sourceEvent, self.sourceEventHash,
+            self.bits, self.ancestry, self.__digest, self.__hash)
+
+    def __setstate__(self, state):
+        (self.generated, self.eventType, self.module, self.data,
+            self.truncated, self.sourceEvent, self.sourceEventHash,
+            self.bits, self.ancestry, self.__digest, self.__hash) = state
+
+# Logs messages for one component (normally a module), so that it doesn't
+# have to be looked up on every message. Messages may be supplied as a
+# format string and arguments, which are only formatted if the message is
+# going to be logged, e.g. log.debug("Found %s at %s", link, url), and each
+# level may be sampled to keep only one in every N messages.
+class SpiderFootLogger:
+    def __init__(self, sf, component, sampling=None):
+        self.sf = sf
+        self.component = component
+        if sampling == None:
+            sampling = dict()
+        self.sampling = sampling
+        # Messages seen per sampled level. Updates from different threads
+        # may race, which only makes the sampling approximate.
+        self.counts = dict()
+
+    # Whether messages of level would be logged, for callers with more
+    # work to do than formatting before they can log anything
+    def enabled(self, level):
+        if level == "DEBUG":
+            return self.sf.opts.get('_debug', False)
+        return True
+
+    def debug(self, message, *args):
+        if not self.sf.opts.get('_debug', False):
+            return
+        self.log("DEBUG", message, args)
+
+    def info(self, message, *args):
+        self.log("INFO", message, args)
+
+    def log(self, level, message, args):
+        rate = self.sampling.get(level)
+        if rate != None and rate > 1:
+            count = self.counts.get(level, 0)
+            self.counts[level] = count + 1
+            if count % rate != 0:
+                return
+
+        if len(args) > 0:
+            message = message % args
+        self.write(level, message, self.component)
+
+    # Write a formatted message out, to the console if there is no
+    # database to log to
+    def write(self, level, message, component):
+        if self.sf.dbh == None:
+            print '[' + component + '] ' + message
+        else:
+            self.sf._dblog(level, message, component)
+
+# Patterns that modules look for in the data of events, registered by name
+# when each module is set up. Rather than every module running its regexes
+# over the whole of every page, each pattern is checked once, when it is
+# registered, for the literal text any match must contain. Content without
+# it is ruled out with a substring check, against one lower-cased copy of
+# the content shared by all modules for case-insensitive patterns, and
+# only the patterns that could match are run. The lower-cased copies are
+# kept by event hash, up to cacheSize bytes of them, so neither the events
+# nor more than a bounded amount of their content is held on to.
+class SpiderFootContentPatterns:
+    def __init__(self, cacheSize=2097152):
+        self.patterns = dict()
+        self.cacheSize = cacheSize
+        self.cachedSize = 0
+        self.lowered = dict()
+        self.loweredOrder = deque()
+        self.lock = threading.Lock()
+
+    # Register regex (compiled with the re flags supplied) under name,
+    # replacing any pattern already registered under that name.
+    def register(self, name, regex, flags=0):
+        compiled = re.compile(regex, flags)
+        literal = self.requiredLiteral(sre_parse.parse(regex, flags))
+        lower = (compiled.flags & re.IGNORECASE) != 0
+        if lower:
+            literal = literal.lower()
+        self.patterns[name] = (compiled, literal, lower)
+
+    # All matches of the pattern registered under name in the data of
+    # event, as re.findall() would return them
+    def findall(self, event, name):
+        compiled = self.candidate(event, name)
+        if compiled == None:
+            return list()
+        return compiled.findall(event.data)
+
+    # Whether the pattern registered under name matches anywhere in the
+    # data of event
+    def search(self, event, name):
+        compiled = self.candidate(event, name)
+        if compiled == None:
+            return False
+        return compiled.search(event.data) != None
+
+    # The compiled pattern registered under name, or None if the data of
+    # event doesn't contain the literal text all of its matches need
+    def candidate(self, event, name):
+        (compiled, literal, lower) = self.patterns[name]
+        if literal == '':
+            return compiled
+
+        if lower:
+            data = self.lowerData(event)
+        else:
+            data = event.data
+
+        if literal not in data:
+            return None
+        return compiled
+
+    # The data of event in lower case, kept for the most recent events
+    # so that it is only worked out once for all the modules
+    def lowerData(self, event):
+        key = event.getHash()
+        self.lock.acquire()
+        try:
+            data = self.lowered.get(key)
+            if data != None:
+                return data
+        finally:
+            self.lock.release()
+
+        data = event.data.lower()
+        if len(data) > self.cacheSize:
+            return data
+
+        self.lock.acquire()
+        try:
+            if not self.lowered.has_key(key):
+                while self.cachedSize + len(data) > self.cacheSize:
+                    oldKey = self.loweredOrder.popleft()
+                    self.cachedSize -= len(self.lowered.pop(oldKey))
+                self.lowered[key] = data
+                self.loweredOrder.append(key)
+                self.cachedSize += len(data)
+        finally:
+            self.lock.release()
+
+        return data
+
+    # The longest run of literal (ASCII) characters that must appear in
+    # anything matching the parsed pattern supplied
+    def requiredLiteral(self, parsed):
+        longest = ''
+        current = ''
+        for (op, av) in self.requiredItems(parsed):
+            if op == sre_constants.LITERAL and av < 128:
+                current += chr(av)
+                continue
+            if len(current) > len(longest):
+                longest = current
+            current = ''
+
+        if len(current) > len(longest):
+            longest = current
+        return longest
+
+    # The items of a parsed pattern that every match goes through in turn,
+    # with groups expanded into the items within them
+    def requiredItems(self, parsed):
+        items = list()
+        for (op, av) in parsed:
+            if op == sre_constants.SUBPATTERN:
+                items.extend(self.requiredItems(av[1]))
+            else:
+                items.append((op, av))
+        return items
+
+# Index of a downloaded block list, so that IP addresses, netblocks and
+# hostnames can be checked against it without going through the list.
+# IPs and CIDRs in the list are kept as sorted, merged ranges and
+# everything else as sorted hostname hashes, all in one compact binary
+# form that can be stored with save() and memory-mapped back in by
+# passing path, so that scans (and processes) share one read-only copy.
+# regex, if supplied, must capture the entry from each line of interest.
+# If subdomains is True, a hostname also matches any entry within it
+# (i.e. the entry is it or a sub-domain of it), down to the entry's
+# registered domain as given by domainOf(entry), so that nothing matches
+# a bare TLD or other public suffix. Without domainOf, only the bare TLD
+# is left out.
+class SpiderFootBlocklist:
+    # Magic, subdomains flag, then the number of IPv4 ranges, IPv6 ranges,
+    # hostnames and hostname suffixes. The ranges follow as arrays of
+    # starts then ends, then the sorted hashes of hostnames and suffixes.
+    header = '>8s?xxxIIII'
+    magic = 'SFBLIST2'
+
+    def __init__(self, content=None, regex=None, subdomains=False, path=None,
+        domainOf=None):
+        if content == None:
+            fp = open(path, 'rb')
+            try:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                fp.close()
+        else:
+            data = self.compile(content, regex, subdomains, domainOf)
+        self.use(data)
+
+    # Hash of a hostname, as stored
+    def _hash(self, host):
+        if type(host) == unicode:
+            host = host.encode('utf-8')
+        return hashlib.md5(host).digest()[0:8]
+
+    # An integer as a fixed-width big-endian string, as stored
+    def _pack(self, val, width):
+        return binascii.unhexlify('%0*x' % (width * 2, val))
+
+    # Parse the list content into the binary form
+    def compile(self, content, regex, subdomains, domainOf=None):
+        hosts = set()
+        suffixes = set()
+        ranges = { 4: list(), 6: list() }
+        ipRx = re.compile("^(\d+\.\d+\.\d+\.\d+|[0-9a-f:]*:[0-9a-f:.]+)(/\d+)?$")
+        if regex != None:
+            regex = re.compile(regex, re.IGNORECASE)
+
+        for line in content.split('\n'):
+            line = line.strip()
+            if len(line) == 0 or line.startswith('#'):
+                continue
+
+            if regex != None:
+                m = regex.match(line)
+                if m == None:
+                    continue
+                entry = m.group(1).strip().lower()
+            else:
+                entry = line.lower()
+
+            if ipRx.match(entry):
+                try:
+                    net = IPNetwork(entry)
+                    ranges[net.version].append((net.first, net.last))
+                    continue
+                except BaseException as e:
+                    pass
+
+            hosts.add(self._hash(entry))
+            if subdomains:
+                parts = entry.split('.')
+                last = len(parts) - 2
+                if domainOf != None:
+                    domain = domainOf(entry)
+                    if domain != None:
+                        last = len(parts) - len(domain.split('.'))
+                for i in range(last + 1):
+                    suffixes.add(self._hash('.'.join(parts[i:])))
+
+        counts = list()
+        sections = list()
+        for (version, width) in [ (4, 4), (6, 16) ]:
+            starts = list()
+            ends = list()
+            for (first, last) in sorted(ranges[version]):
+                if len(ends) > 0 and first <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], last)
+                else:
+                    starts.append(first)
+                    ends.append(last)
+            counts.append(len(starts))
+            sections.extend([self._pack(x, width) for x in starts])
+            sections.extend([self._pack(x, width) for x in ends])
+
+        for hashes in [ hosts, suffixes ]:
+            counts.append(len(hashes))
+            sections.extend(sorted(hashes))
+
+        return struct.pack(self.header, self.magic, subdomains, *counts) + \
+            ''.join(sections)
+
+    # Set up the look-ups over the binary form
+    def use(self, data):
+        size = struct.calcsize(self.header)
+        (magic, subdomains, n4, n6, nh, ns) = struct.unpack(self.header,
+            data[0:size])
+        if magic != self.magic:
+            raise ValueError("Not a SpiderFoot block list index.")
+
+        self.data = data
+        self.subdomains = subdomains
+        self.counts = (n4, n6, nh)
+        self.ranges = dict()
+        offset = size
+        for (version, width, count) in [ (4, 4, n4), (6, 16, n6) ]:
+            starts = SpiderFootRecords(data, offset, count, width)
+            offset += count * width
+            ends = SpiderFootRecords(data, offset, count, width)
+            offset += count * width
+            self.ranges[version] = (starts, ends, width)
+        self.hosts = SpiderFootRecords(data, offset, nh, 8)
+        offset += nh * 8
+        self.suffixes = SpiderFootRecords(data, offset, ns, 8)
+
+    # Store the index at path, replacing any there already without anyone
+    # reading it ever seeing a partial file, and map it back in from there.
+    def save(self, path):
+        tmpPath = path + "." + str(os.getpid()) + "_" + \
+            str(threading.current_thread().ident) + ".tmp"
+        fp = open(tmpPath, 'wb')
+        try:
+            fp.write(self.data[0:len(self.data)])
+        finally:
+            fp.close()
+
+        try:
+            os.rename(tmpPath, path)
+        except OSError as e:
+            # Windows won't rename over an existing file
+            try:
+                os.remove(path)
+                os.rename(tmpPath, path)
+            except OSError as e:
+                os.remove(tmpPath)
+                raise
+
+        fp = open(path, 'rb')
+        try:
+            self.use(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+        finally:
+            fp.close()
+
+    # Number of entries indexed
+    def size(self):
+        return sum(self.counts)
+
+    # Is any address between first and last (integers) listed?
+    def _hasRange(self, version, first, last):
+        (starts, ends, width) = self.ranges[version]
+        i = bisect.bisect_right(starts, self._pack(last, width)) - 1
+        return i >= 0 and ends[i] >= self._pack(first, width)
+
+    # Is the hash amongst the sorted hashes?
+    def _hasHash(self, hashes, h):
+        i = bisect.bisect_left(hashes, h)
+        return i < len(hashes) and hashes[i] == h
+
+    # Is the IP address listed, or within a listed netblock?
+    def hasAddress(self, ip):
+        try:
+            net = IPNetwork(ip)
+        except BaseException as e:
+            return False
+        return self._hasRange(net.version, net.first, net.first)
+
+    # Is any IP address within the netblock listed?
+    def hasNetblock(self, netblock):
+        try:
+            net = IPNetwork(netblock)
+        except BaseException as e:
+            return False
+        return self._hasRange(net.version, net.first, net.last)
+
+    # Is the hostname listed (or anything within it, if subdomains)?
+    def hasHost(self, host):
+        h = self._hash(host.lower())
+        if self._hasHash(self.hosts, h):
+            return True
+        return self.subdomains and self._hasHash(self.suffixes, h)
+
+# Sorted fixed-width records within a buffer (string or mmap), for bisect
+# to search in place
+class SpiderFootRecords:
+    def __init__(self, data, offset, count, width):
+        self.data = data
+        self.offset = offset
+        self.count = count
+        self.width = width
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.count:
+            raise IndexError(i)
+        start = self.offset + i * self.width
+        return self.data[start:start + self.width]
 
 # Override the default redirectors to re-use cookies
 class SmartRedirectHandler(urllib2.HTTPRedirectHandler):
@@ -1159,6 +2125,340 @@ class SmartRedirectHandler(urllib2.HTTPRedirectHandler):
             self, req, fp, code, msg, headers)
         return result
 
+# Runs functions on a pool of threads on behalf of a number of hosts,
+# starting no more than hostThreads at a time for the same host, and
+# leaving at least hostDelay seconds between starting each for the same
+# host. Functions for other hosts run in the meantime, up to maxThreads at
+# once. Threads are only running while there is work queued.
+class SpiderFootHostScheduler:
+    def __init__(self, maxThreads, hostDelay=0, hostThreads=1):
+        self.maxThreads = max(1, maxThreads)
+        self.hostDelay = hostDelay
+        self.hostThreads = max(1, hostThreads)
+        self.cond = threading.Condition()
+        # Jobs not yet started, in the order submitted
+        self.queue = list()
+        # {host => functions running}
+        self.hostBusy = dict()
+        # {host => time the next function may start}
+        self.hostNext = dict()
+        self.threads = 0
+
+    # Queue func(*args) to be run for host, returning the SpiderFootHostJob
+    # to wait on for the result
+    def submit(self, host, func, *args):
+        job = SpiderFootHostJob(host, func, args)
+        self.cond.acquire()
+        try:
+            self.queue.append(job)
+            if self.threads < self.maxThreads:
+                self.threads += 1
+                t = threading.Thread(name="SFHostScheduler", target=self._worker)
+                t.setDaemon(True)
+                t.start()
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+        return job
+
+    # Drop a job if it hasn't started yet
+    def cancel(self, job):
+        self.cond.acquire()
+        try:
+            if job in self.queue:
+                self.queue.remove(job)
+                job.finish(None)
+        finally:
+            self.cond.release()
+
+    # The first queued job allowed to start now, or None along with how
+    # long until one might be. To be called with the lock held.
+    def _next(self):
+        now = time.time()
+        wait = None
+        for job in self.queue:
+            if self.hostBusy.get(job.host, 0) >= self.hostThreads:
+                continue
+            start = self.hostNext.get(job.host, 0)
+            if start <= now:
+                return (job, 0)
+            if wait == None or start - now < wait:
+                wait = start - now
+        return (None, wait)
+
+    def _worker(self):
+        self.cond.acquire()
+        try:
+            while len(self.queue) > 0:
+                (job, wait) = self._next()
+                if job == None:
+                    self.cond.wait(wait)
+                    continue
+
+                self.queue.remove(job)
+                self.hostBusy[job.host] = self.hostBusy.get(job.host, 0) + 1
+                self.hostNext[job.host] = time.time() + self.hostDelay
+                self.cond.release()
+                try:
+                    job.run()
+                finally:
+                    self.cond.acquire()
+                    self.hostBusy[job.host] -= 1
+                    self.cond.notifyAll()
+        finally:
+            self.threads -= 1
+            self.cond.release()
+
+# A function queued on a SpiderFootHostScheduler
+class SpiderFootHostJob:
+    def __init__(self, host, func, args):
+        self.host = host
+        self.func = func
+        self.args = args
+        self.result = None
+        self.done = threading.Event()
+
+    def run(self):
+        result = None
+        try:
+            result = self.func(*self.args)
+        finally:
+            self.finish(result)
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+    # Wait up to timeout seconds for the function to have run, returning
+    # True if it has
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.done.isSet()
+
+# Persistent HTTP(S) connections, kept per host (and per socket
+# implementation, so that connections made before a SOCKS proxy was set up
+# aren't used through it) for re-use by later requests. No more than
+# maxConns connections are open at once; the least recently used idle
+# connections are closed to make room, otherwise callers wait for one to
+# be released.
+class SpiderFootHttpPool:
+    # Seconds a connection may sit idle before it's no longer re-used, as
+    # servers will likely have closed it by then
+    maxIdle = 30
+
+    def __init__(self, maxConns=50):
+        self.maxConns = maxConns
+        # {key => [[connection, time released], ..]}, most recent last
+        self.idle = dict()
+        self.idleCount = 0
+        self.busyCount = 0
+        self.cond = threading.Condition()
+
+    def setMaxConns(self, maxConns):
+        self.maxConns = max(1, int(maxConns))
+
+    # Close the least recently used idle connection
+    def _closeOldest(self):
+        oldest = None
+        for key in self.idle.keys():
+            if oldest == None or self.idle[key][0][1] < self.idle[oldest][0][1]:
+                oldest = key
+        (conn, released) = self.idle[oldest].pop(0)
+        if len(self.idle[oldest]) == 0:
+            del self.idle[oldest]
+        self.idleCount -= 1
+        conn.close()
+
+    # Get an idle connection for key, or one made by factory() if there
+    # isn't one, returning (connection, True if re-used)
+    def get(self, key, factory, timeout=None):
+        waitUntil = None
+        if timeout != None:
+            waitUntil = time.time() + timeout
+
+        self.cond.acquire()
+        try:
+            while True:
+                while self.idle.has_key(key):
+                    (conn, released) = self.idle[key].pop()
+                    if len(self.idle[key]) == 0:
+                        del self.idle[key]
+                    self.idleCount -= 1
+                    if released > time.time() - self.maxIdle:
+                        self.busyCount += 1
+                        return (conn, True)
+                    conn.close()
+
+                if self.idleCount + self.busyCount < self.maxConns:
+                    break
+                if self.idleCount > 0:
+                    self._closeOldest()
+                    continue
+                # Don't wait forever on connections that were never
+                # released, just go over the limit.
+                if waitUntil != None and time.time() >= waitUntil:
+                    break
+                if waitUntil != None:
+                    self.cond.wait(waitUntil - time.time())
+                else:
+                    self.cond.wait()
+            self.busyCount += 1
+        finally:
+            self.cond.release()
+
+        try:
+            return (factory(), False)
+        except BaseException as e:
+            self.discard(None)
+            raise
+
+    # Return a connection to the pool once its response has been read
+    def put(self, key, conn):
+        self.cond.acquire()
+        try:
+            self.busyCount -= 1
+            self.idle.setdefault(key, list()).append([conn, time.time()])
+            self.idleCount += 1
+            while self.idleCount + self.busyCount > self.maxConns and \
+                self.idleCount > 0:
+                self._closeOldest()
+            self.cond.notify()
+        finally:
+            self.cond.release()
+
+    # Close a connection that can't be re-used
+    def discard(self, conn):
+        if conn != None:
+            conn.close()
+        self.cond.acquire()
+        try:
+            self.busyCount -= 1
+            self.cond.notify()
+        finally:
+            self.cond.release()
+
+# Response body from a pooled connection, handing the connection back to
+# the pool once it has all been read (or closing it if it can't be re-used)
+class SpiderFootPooledResponse:
+    def __init__(self, pool, key, conn, response):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.buffer = None
+
+    def _release(self):
+        if self.conn == None:
+            return
+        if self.response.will_close or not self.response.isclosed():
+            self.pool.discard(self.conn)
+        else:
+            self.pool.put(self.key, self.conn)
+        self.conn = None
+
+    def read(self, amt=None):
+        if self.buffer != None:
+            if amt == None:
+                return self.buffer.read()
+            return self.buffer.read(amt)
+
+        if amt == None:
+            data = self.response.read()
+        else:
+            data = self.response.read(amt)
+        if self.response.isclosed():
+            self._release()
+        return data
+
+    # Lines are read from the rest of the body in one go, as the connection
+    # can only be released once the response has been read through it
+    def readline(self):
+        if self.buffer == None:
+            self.buffer = StringIO.StringIO(self.read())
+        return self.buffer.readline()
+
+    def readlines(self):
+        if self.buffer == None:
+            self.buffer = StringIO.StringIO(self.read())
+        return self.buffer.readlines()
+
+    def fileno(self):
+        return self.conn.sock.fileno()
+
+    def close(self):
+        self._release()
+
+# Send requests over pooled connections rather than a new connection per
+# request (see SpiderFootHttpPool)
+class SpiderFootHTTPHandler(urllib2.HTTPHandler):
+    def __init__(self, pool):
+        urllib2.HTTPHandler.__init__(self)
+        self.pool = pool
+
+    def http_open(self, req):
+        return pooledOpen(self.pool, httplib.HTTPConnection, req)
+
+class SpiderFootHTTPSHandler(urllib2.HTTPSHandler):
+    def __init__(self, pool):
+        urllib2.HTTPSHandler.__init__(self)
+        self.pool = pool
+
+    def https_open(self, req):
+        # Python 2.7.9+ verifies certificates according to the context
+        context = getattr(self, '_context', None)
+        if context != None:
+            return pooledOpen(self.pool, httplib.HTTPSConnection, req,
+                context=context)
+        return pooledOpen(self.pool, httplib.HTTPSConnection, req)
+
+# As urllib2.AbstractHTTPHandler.do_open(), but keeping the connection
+# alive for re-use via the pool
+def pooledOpen(pool, connClass, req, **connArgs):
+    host = req.get_host()
+    if not host:
+        raise urllib2.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict((k, v) for k, v in req.headers.items()
+        if k not in headers))
+    headers = dict((name.title(), val) for name, val in headers.items())
+    tunnelHeaders = dict()
+    if req._tunnel_host and headers.has_key("Proxy-Authorization"):
+        tunnelHeaders["Proxy-Authorization"] = headers["Proxy-Authorization"]
+        del headers["Proxy-Authorization"]
+
+    def connect():
+        conn = connClass(host, timeout=req.timeout, **connArgs)
+        if req._tunnel_host:
+            conn.set_tunnel(req._tunnel_host, headers=tunnelHeaders)
+        return conn
+
+    key = (connClass, host, req._tunnel_host, socket.create_connection)
+    (conn, reused) = pool.get(key, connect, req.timeout)
+    while True:
+        try:
+            if reused:
+                conn.timeout = req.timeout
+                if conn.sock != None:
+                    conn.sock.settimeout(req.timeout)
+            conn.request(req.get_method(), req.get_selector(), req.data, headers)
+            r = conn.getresponse(buffering=True)
+            break
+        except (socket.error, httplib.HTTPException) as e:
+            pool.discard(conn)
+            # The server may have closed an idle connection, so try once
+            # more on a new one, unless it could have acted on a POST.
+            if reused and req.data == None:
+                (conn, reused) = pool.get(key, connect, req.timeout)
+                continue
+            raise urllib2.URLError(e)
+
+    resp = urllib2.addinfourl(SpiderFootPooledResponse(pool, key, conn, r),
+        r.msg, req.get_full_url())
+    resp.code = r.status
+    resp.msg = r.reason
+    return resp
+
 
 """
 Public Suffix List module for Python.
@@ -14,58 +14,589 @@ import os
 import time
 import sys
 import socket
+import threading
+import multiprocessing
+import Queue
+import weakref
 import socks
 import dns.resolver
 from copy import deepcopy
-from sfdb import SpiderFootDb
-from sflib import SpiderFoot, SpiderFootEvent
+from sfdb import SpiderFootDb, SpiderFootDbWriter
+from sflib import SpiderFoot, SpiderFootPlugin, SpiderFootEvent, buildListenerIndex
 
-# Controls all scanning activity
-# Eventually change this to be able to control multiple scan instances
+# The socket calls a SOCKS proxy replaces, so that they can be put back for
+# scans that don't use one
+socketDefaults = (socket.socket, socket.create_connection, socket.getaddrinfo)
+
+# Options that change how the whole process connects out, rather than only
+# the scan they're set for
+networkOpts = [ '_socks1type', '_socks2addr', '_socks3port', '_socks4user',
+    '_socks5pwd', '_socks6dns', '_dnsserver' ]
+
+# Dispatches events to the handleEvent() method of listening modules.
+# Each module gets its own queue, serviced by a small pool of worker threads
+# (_modulethreads), and no more than _maxthreads handlers may run at once
+# across the whole scan. Events are therefore queued rather than handled
+# within the producing module's stack, so network lookups from different
+# modules overlap.
+class SpiderFootEventQueue:
+    def __init__(self, sf, maxThreads, moduleThreads):
+        self.sf = sf
+        self.moduleThreads = max(1, moduleThreads)
+        self.slots = threading.BoundedSemaphore(max(1, maxThreads))
+        self.queues = dict()
+        self.threads = dict()
+        self.modules = list()
+        self.workers = list()
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.failure = None
+
+    # Set up the queue and worker threads for a module, which may ask for
+    # more than the default
+    def addModule(self, module):
+        q = Queue.Queue()
+        self.queues[module.__name__] = q
+        self.threads[module.__name__] = max(self.moduleThreads,
+            module.eventConcurrency())
+        self.modules.append(module)
+        for i in range(self.threads[module.__name__]):
+            # Thread names must not start with SF_ (running scans) or the
+            # module name (used by some modules to track their own threads)
+            t = threading.Thread(name="SFWorker_" + module.__name__ + "_" + str(i),
+                target=self._worker, args=(module, q))
+            t.setDaemon(True)
+            t.start()
+            self.workers.append(t)
+        module.setEventQueue(self)
+
+    # Queue an event to be handled by a listening module
+    def put(self, module, sfEvent):
+        self.idle.acquire()
+        self.pending += 1
+        self.idle.release()
+        self.queues[module.__name__].put((module.handleEvent, sfEvent))
+
+    # Queue the start() method of a module
+    def start(self, module):
+        self.idle.acquire()
+        self.pending += 1
+        self.idle.release()
+        self.queues[module.__name__].put((module.start, None))
+
+    def _worker(self, module, q):
+        while True:
+            task = q.get()
+            if task == None:
+                return
+
+            (method, sfEvent) = task
+            try:
+                # Once stopped, drain the queue without handling anything
+                if not module.checkForStop():
+                    self.slots.acquire()
+                    try:
+                        if sfEvent == None:
+                            method()
+                        else:
+                            module._currentEvent = sfEvent
+                            method(sfEvent)
+                    finally:
+                        self.slots.release()
+            except BaseException as e:
+                # Same as an exception escaping a module when called directly,
+                # the scan is stopped and the scanner reports it as failed.
+                if self.failure == None:
+                    self.failure = sys.exc_info()
+                    for mod in self.modules:
+                        mod.stopScanning()
+                else:
+                    self.sf.error("Module " + module.__name__ + " failed: " + \
+                        repr(traceback.format_exception(*sys.exc_info())), False)
+            finally:
+                self.idle.acquire()
+                self.pending -= 1
+                if self.pending == 0:
+                    self.idle.notifyAll()
+                self.idle.release()
+
+    # Block until every queue is drained and every worker is idle
+    def wait(self):
+        self.idle.acquire()
+        while self.pending > 0:
+            # Wake up periodically so that this thread remains interruptible
+            self.idle.wait(1)
+        self.idle.release()
+
+    # Stop all worker threads, to be called once the queues are drained
+    def shutdown(self):
+        for name in self.queues.keys():
+            for i in range(self.threads[name]):
+                self.queues[name].put(None)
+        for t in self.workers:
+            t.join()
+        for mod in self.modules:
+            mod.setEventQueue(None)
+
+# Stands in for a module of the scan within another module's worker
+# process, so that the worker can work out which modules to send its
+# events to without needing the modules themselves.
+class SpiderFootListenerStub:
+    def __init__(self, name, moduleName, watched):
+        self.__name__ = name
+        self.__module__ = moduleName
+        self.watched = watched
+
+    def watchedEvents(self):
+        return self.watched
+
+# Stands in for the event queue and database handle of a module running in
+# a worker process, passing its events and log entries back to the scan.
+class SpiderFootProcessChannel:
+    def __init__(self, results):
+        self.results = results
+
+    def put(self, listener, sfEvent):
+        self.results.put(('event', (listener.__name__, sfEvent)))
+
+    def scanLogEvent(self, instanceId, classification, message, component=None):
+        self.results.put(('log', (instanceId, classification, message, component)))
+        return True
+
+# Raised when a module running in a worker process fails, or the worker
+# process itself does
+class SpiderFootProcessError(Exception):
+    def __init__(self, modName, error):
+        Exception.__init__(self, "Module " + modName + " failed in its " + \
+            "worker process: " + error)
+        self.modName = modName
+
+# Main loop of a module's worker process. Each task is the name of a method
+# to run and its argument, and is answered with a 'done' message carrying
+# the formatted exception if the method failed. 'setup' loads the module
+# to run and 'unload' finishes with it, after which the worker waits to be
+# given another.
+def _moduleProcess(tasks, results, stopEvent):
+    current = dict()
+
+    # Pass on the scan being stopped to the module loaded, then wait for
+    # the event to be cleared when the module is unloaded
+    def watchStop():
+        while True:
+            stopEvent.wait()
+            if current.has_key('mod'):
+                current['mod'].stopScanning()
+            while stopEvent.is_set():
+                time.sleep(1)
+    t = threading.Thread(name="SFStop", target=watchStop)
+    t.setDaemon(True)
+    t.start()
+
+    while True:
+        task = tasks.get()
+        if task == None:
+            break
+
+        (method, arg) = task
+        if method == 'unload':
+            current.clear()
+            results.put(('unloaded', None))
+            continue
+
+        try:
+            if method == 'setup':
+                (modName, target, opts) = arg
+                module = __import__('modules.' + modName, globals(), locals(), [modName])
+                mod = getattr(module, modName)()
+                mod.__name__ = modName
+                mod.clearListeners()
+                channel = SpiderFootProcessChannel(results)
+                sf = SpiderFoot(opts)
+                sf.setDbh(channel)
+                sf.setScanId(opts['__guid__'])
+                mod.setup(sf, target, opts)
+                mod.setEventQueue(channel)
+                current['mod'] = mod
+            mod = current['mod']
+            if method == 'listeners':
+                mod.setListenerIndex(buildListenerIndex(arg))
+            if method == 'start':
+                mod.start()
+            if method == 'handleEvent':
+                mod._currentEvent = arg
+                mod.handleEvent(arg)
+            results.put(('done', None))
+        except BaseException as e:
+            results.put(('done', ''.join(traceback.format_exception(*sys.exc_info()))))
+
+# A worker process for running modules in (see SpiderFootPluginProcess),
+# along with the queues for talking to it
+class SpiderFootProcessWorker:
+    def __init__(self, pool):
+        self.pool = pool
+        self.tasks = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.stopEvent = multiprocessing.Event()
+        self.process = multiprocessing.Process(name="SFProcess",
+            target=_moduleProcess, args=(self.tasks, self.results,
+            self.stopEvent))
+        self.process.daemon = True
+        self.process.start()
+
+# Worker processes, forked when SpiderFoot starts. Forking once threads
+# are running would leave any lock another thread held at the time (the
+# DNS cache's, the HTTP pool's, a module's) held forever in the worker, so
+# scans take workers from here and hand them back when done rather than
+# starting their own. If none are free, modules run within the scan.
+class SpiderFootProcessPool:
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.idle = list()
+        for i in range(size):
+            self.idle.append(SpiderFootProcessWorker(self))
+
+    # Take a free worker, or None if there are none
+    def acquire(self):
+        self.lock.acquire()
+        try:
+            if len(self.idle) == 0:
+                return None
+            return self.idle.pop()
+        finally:
+            self.lock.release()
+
+    # Hand a worker back once its module has been unloaded
+    def release(self, worker):
+        self.lock.acquire()
+        self.idle.append(worker)
+        self.lock.release()
+
+# Runs a module in a worker process (taken from a SpiderFootProcessPool),
+# so that CPU-heavy modules are not held to the same core as the rest of
+# the scan by the GIL. The scanner treats this like any other module.
+# Events are pickled on their way to and from the worker, and events coming
+# back are linked up to the original objects of this process again, by
+# hash, wherever those are still around. Log entries come back here to be
+# written to the database.
+class SpiderFootPluginProcess(SpiderFootPlugin):
+    def __init__(self, module, worker):
+        self.module = module
+        self.opts = module.opts
+        self.__name__ = module.__name__
+        self.__module__ = module.__module__
+        self.sfdb = None
+        self.listenerMap = dict()
+        self.events = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        self.replies = Queue.Queue()
+        self.worker = worker
+        self.tasks = worker.tasks
+        self.results = worker.results
+        self.stopEvent = worker.stopEvent
+        self.process = worker.process
+        self.reader = threading.Thread(name="SFReader_" + self.__name__,
+            target=self._reader)
+        self.reader.setDaemon(True)
+        self.reader.start()
+
+    def _reader(self):
+        while True:
+            (msgType, arg) = self.results.get()
+            if msgType == 'unloaded':
+                return
+            if msgType == 'done':
+                self.replies.put(arg)
+            if msgType == 'log':
+                self.sfdb.scanLogEvent(*arg)
+            if msgType == 'event':
+                (listenerName, sfEvent) = arg
+                self._eventQueue.put(self.listenerMap[listenerName],
+                    self._relink(sfEvent))
+
+    # Swap a copy of an event that came back from the worker for the
+    # original, or link it to the original of its source event.
+    def _relink(self, sfEvent):
+        known = self.events.get(sfEvent.getHash())
+        if known != None:
+            return known
+
+        source = self.events.get(sfEvent.sourceEventHash)
+        if source != None:
+            sfEvent.sourceEvent = source.summary()
+        self.events[sfEvent.getHash()] = sfEvent
+        return sfEvent
+
+    # Run a task in the worker process and wait for it to finish, raising
+    # any exception from the worker here.
+    def _call(self, method, arg=None):
+        self.lock.acquire()
+        try:
+            self.tasks.put((method, arg))
+            while True:
+                try:
+                    error = self.replies.get(timeout=1)
+                    break
+                except Queue.Empty:
+                    if not self.process.is_alive():
+                        error = "Worker process exited unexpectedly."
+                        break
+        finally:
+            self.lock.release()
+
+        if error != None:
+            raise SpiderFootProcessError(self.__name__, error)
+
+    def setup(self, sf, target, userOpts=dict()):
+        self.sf = sf
+        self.sfdb = userOpts['__sfdb__']
+        opts = dict()
+        for opt in userOpts.keys():
+            if opt not in [ '__sfdb__', '__modules__' ]:
+                opts[opt] = userOpts[opt]
+        try:
+            self._call('setup', (self.__name__, target, opts))
+        except BaseException as e:
+            self.shutdown()
+            raise
+
+    def setListenerIndex(self, index):
+        SpiderFootPlugin.setListenerIndex(self, index)
+        stubs = list()
+        for listeners in index.values():
+            for listener in listeners:
+                if self.listenerMap.has_key(listener.__name__):
+                    continue
+                self.listenerMap[listener.__name__] = listener
+                stubs.append(SpiderFootListenerStub(listener.__name__,
+                    listener.__module__, listener.watchedEvents()))
+        self._call('listeners', stubs)
+
+    def stopScanning(self):
+        SpiderFootPlugin.stopScanning(self)
+        self.stopEvent.set()
+
+    def watchedEvents(self):
+        return self.module.watchedEvents()
+
+    def producedEvents(self):
+        return self.module.producedEvents()
+
+    def handleEvent(self, sfEvent):
+        self.events[sfEvent.getHash()] = sfEvent
+        self._call('handleEvent', sfEvent)
+
+    def start(self):
+        self._call('start')
+
+    # Unload the module and hand the worker process back to the pool, or
+    # if the module doesn't finish what it's doing in time, kill it
+    def shutdown(self):
+        self.tasks.put(('unload', None))
+        self.reader.join(5)
+        if not self.reader.isAlive():
+            self.stopEvent.clear()
+            self.worker.pool.release(self.worker)
+            return
+
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.results.put(('unloaded', None))
+        self.reader.join()
+        self.tasks.close()
+        self.results.close()
+
+# Runs up to maxScans scans at the same time, each in its own SF_ thread.
+# Any further scans are queued, and started in order as running ones end.
+# Scans, running or queued, are looked up by their GUID.
+#
+# The SOCKS proxy and DNS server are set for the whole process, so scans
+# only run together if they have the same settings for those. A scan with
+# different ones waits (holding up those queued behind it) until the
+# running scans have ended.
+#
+# processWorkers worker processes are forked for modules set to run out of
+# process (see SpiderFootProcessPool), so this must be created before any
+# threads are started.
+class SpiderFootScanManager:
+    def __init__(self, maxScans, processWorkers=0):
+        self.maxScans = max(1, maxScans)
+        self.lock = threading.Lock()
+        self.scanners = dict()
+        self.pending = list()
+        self.running = 0
+        self.networkSettings = None
+        self.processPool = SpiderFootProcessPool(processWorkers)
+
+    # Change the number of scans allowed to run at once
+    def setMaxScans(self, maxScans):
+        self.lock.acquire()
+        self.maxScans = max(1, maxScans)
+        self.lock.release()
+        self._startPending()
+
+    # Create a new scan and queue it to be run, returning its GUID
+    def startScan(self, name, target, moduleList, globalOpts, moduleOpts):
+        scanner = SpiderFootScanner(name, target, moduleList, globalOpts, moduleOpts,
+            self.processPool)
+        self.lock.acquire()
+        self.scanners[scanner.myId] = scanner
+        self.pending.append(scanner)
+        self.lock.release()
+        self._startPending()
+        return scanner.myId
+
+    def _startPending(self):
+        self.lock.acquire()
+        while self.running < self.maxScans and len(self.pending) > 0:
+            scanner = self.pending[0]
+            if self.running > 0 and \
+                scanner.networkSettings() != self.networkSettings:
+                break
+
+            self.pending.pop(0)
+            self.networkSettings = scanner.networkSettings()
+            self.running += 1
+            t = threading.Thread(name="SF_" + scanner.name, target=self._runScan,
+                args=(scanner,))
+            t.start()
+        self.lock.release()
+
+    def _runScan(self, scanner):
+        try:
+            scanner.startScan()
+        finally:
+            self.lock.acquire()
+            self.running -= 1
+            del self.scanners[scanner.myId]
+            self.lock.release()
+            self._startPending()
+
+    # Status of a running or queued scan, or UNKNOWN if it is neither
+    def scanStatus(self, id):
+        self.lock.acquire()
+        scanner = self.scanners.get(id)
+        self.lock.release()
+
+        if scanner == None:
+            return "UNKNOWN"
+        return scanner.scanStatus(id)
+
+    # Stop a running scan, or take a queued one off the queue
+    def stopScan(self, id):
+        self.lock.acquire()
+        scanner = self.scanners.get(id)
+        if scanner == None:
+            self.lock.release()
+            return None
+
+        if scanner in self.pending:
+            self.pending.remove(scanner)
+            del self.scanners[id]
+            self.lock.release()
+            scanner.cancelScan()
+            return None
+
+        self.lock.release()
+        scanner.stopScan(id)
+
+    # The newest log entries of a running scan if they are still held in
+    # memory, otherwise None (and they have to be read from the database)
+    def scanLogs(self, id, limit=None):
+        self.lock.acquire()
+        scanner = self.scanners.get(id)
+        self.lock.release()
+
+        if scanner == None:
+            return None
+        return scanner.scanLogs(id, limit)
+
+    # GUIDs of all running and queued scans
+    def scanList(self):
+        self.lock.acquire()
+        ret = self.scanners.keys()
+        self.lock.release()
+        return ret
+
+# Controls all scanning activity for a single scan. Any number of these may
+# run at once (see SpiderFootScanManager), so nothing here or in the modules
+# may keep per-scan state in module or class level variables.
 class SpiderFootScanner:
     moduleInstances = None
     status = "UNKNOWN"
     myId = None
+    stopping = False
+    dbWriter = None
 
-    def __init__(self, name, target, moduleList, globalOpts, moduleOpts):
+    def __init__(self, name, target, moduleList, globalOpts, moduleOpts,
+        processPool=None):
         self.config = deepcopy(globalOpts)
+        self.processPool = processPool
         self.sf = SpiderFoot(self.config)
         self.target = target
         self.moduleList = moduleList
         self.name = name
 
+        # Create a unique ID for this scan and create it in the back-end DB.
+        # It will show as CREATED until the scan actually starts.
+        dbh = SpiderFootDb(self.config)
+        self.config['__guid__'] = dbh.scanInstanceGenGUID(self.target)
+        self.sf.setScanId(self.config['__guid__'])
+        self.myId = self.config['__guid__']
+        dbh.scanInstanceCreate(self.config['__guid__'], self.name, self.target)
+        dbh.close()
+        self.status = "CREATED"
+
         return
 
-    # Status of the currently running scan (if any)
+    # The settings of this scan that apply to the whole process (see
+    # networkOpts)
+    def networkSettings(self):
+        return [ self.config.get(opt, '') for opt in networkOpts ]
+
+    # Status of this scan
     def scanStatus(self, id):
         if id != self.myId:
             return "UNKNOWN"
         return self.status  
 
-    # Stop a scan (id variable is unnecessary for now given that only one simultaneous
-    # scan is permitted.)
+    # The newest log entries of this scan if they are still held in memory
+    # (see SpiderFootDbWriter.scanLogs()), otherwise None
+    def scanLogs(self, id, limit=None):
+        dbWriter = self.dbWriter
+        if id != self.myId or dbWriter == None:
+            return None
+        return dbWriter.scanLogs(limit)
+
+    # Stop this scan
     def stopScan(self, id):
         if id != self.myId:
             return None
 
+        # Checked once all modules are loaded, in case we are still loading
+        self.stopping = True
+
         if self.moduleInstances == None:
             return None
 
         for modName in self.moduleInstances.keys():
             self.moduleInstances[modName].stopScanning()
 
+    # Mark a scan that was never started as aborted
+    def cancelScan(self):
+        dbh = SpiderFootDb(self.config)
+        dbh.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'ABORTED')
+        dbh.close()
+        self.status = "ABORTED"
+
     # Start running a scan
     def startScan(self):
         self.moduleInstances = dict()
         dbh = SpiderFootDb(self.config)
+        eventQueue = None
         self.sf.setDbh(dbh)
         aborted = False
 
-        # Create a unique ID for this scan and create it in the back-end DB.
-        self.config['__guid__'] = dbh.scanInstanceGenGUID(self.target)
-        self.sf.setScanId(self.config['__guid__'])
-        self.myId = self.config['__guid__']
-        dbh.scanInstanceCreate(self.config['__guid__'], self.name, self.target)
         dbh.scanInstanceSet(self.config['__guid__'], time.time() * 1000, None, 'STARTING')
         self.status = "STARTING"
         
@@ -73,6 +604,22 @@ class SpiderFootScanner:
         self.config['_modulesenabled'] = self.moduleList
         dbh.scanConfigSet(self.config['__guid__'], self.sf.configSerialize(self.config))
 
+        # From here on, scan results, logs and status updates are queued for
+        # a single writer thread, written out in batches, so that modules
+        # don't wait on the disk or on each other to store anything.
+        # Chatty modules are rate limited, so that they can't hold the
+        # scan up writing logs.
+        logRates = dict()
+        for limit in self.config['_logratelimits'].split(','):
+            if '=' in limit:
+                (component, rate) = limit.split('=', 1)
+                logRates[component.strip()] = int(rate)
+        dbWriter = SpiderFootDbWriter(self.config, self.config['_dbqueuesize'],
+            self.config['_dbbuffersize'], self.config['_logratelimit'], logRates,
+            self.config['_logtailsize'])
+        self.sf.setDbh(dbWriter)
+        self.dbWriter = dbWriter
+
         self.sf.status("Scan [" + self.config['__guid__'] + "] initiated.")
         # moduleList = list of modules the user wants to run
         try:
@@ -109,6 +656,10 @@ class SpiderFootScanner:
                 socket.getaddrinfo = socks.getaddrinfo
 
                 self.sf.updateSocket(socket)
+            else:
+                # An earlier scan may have gone through a proxy
+                (socket.socket, socket.create_connection,
+                    socket.getaddrinfo) = socketDefaults
             
             # Override the default DNS server
             if self.config['_dnsserver'] != "":
@@ -130,6 +681,7 @@ class SpiderFootScanner:
             else:
                 self.config["_internettlds"] = tlddata.splitlines()
 
+            processModules = [ m.strip() for m in self.config['_processmodules'].split(',') ]
             for modName in self.moduleList:
                 if modName == '':
                     continue
@@ -138,12 +690,23 @@ class SpiderFootScanner:
                 mod = getattr(module, modName)()
                 mod.__name__ = modName
 
+                # Run the module in a worker process of its own if asked to
+                if modName in processModules:
+                    worker = None
+                    if self.processPool != None:
+                        worker = self.processPool.acquire()
+                    if worker != None:
+                        mod = SpiderFootPluginProcess(mod, worker)
+                    else:
+                        self.sf.info("No worker process free for " + modName + \
+                            ", running it within the scan.")
+
                 # A bit hacky: we pass the database object as part of the config. This
                 # object should only be used by the internal SpiderFoot modules writing
                 # to the database, which at present is only sfp__stor_db.
                 # Individual modules cannot create their own SpiderFootDb instance or
                 # we'll get database locking issues, so it all goes through this.
-                self.config['__sfdb__'] = dbh
+                self.config['__sfdb__'] = dbWriter
 
                 # Set up the module
                 # Configuration is a combined global config with module-specific options
@@ -163,36 +726,41 @@ class SpiderFootScanner:
 
                 self.sf.status(modName + " module loaded.")
 
-            # Register listener modules and then start all modules sequentially
+            # Build the index of which modules listen for which event types
+            # once, and share it between all modules. Note that modules may
+            # be listeners to themselves, as some will act on their own
+            # notifications (e.g. sfp_dns)!
+            listenerIndex = buildListenerIndex(self.moduleInstances.values())
             for module in self.moduleInstances.values():
-                for listenerModule in self.moduleInstances.values():
-                    # Careful not to register twice or you will get duplicate events
-                    if listenerModule in module._listenerModules:
-                        continue
-                    # Note the absence of a check for whether a module can register
-                    # to itself. That is intentional because some modules will
-                    # act on their own notifications (e.g. sfp_dns)!
-                    if listenerModule.watchedEvents() != None:
-                        module.registerListener(listenerModule)
-
-            dbh.scanInstanceSet(self.config['__guid__'], status='RUNNING')
+                module.setListenerIndex(listenerIndex)
+
+            # The scan may have been stopped while modules were being loaded
+            if self.stopping:
+                for module in self.moduleInstances.values():
+                    module.stopScanning()
+
+            dbWriter.scanInstanceSet(self.config['__guid__'], status='RUNNING')
             self.status = "RUNNING"
 
             # Create the "ROOT" event which un-triggered modules will link events to
             rootEvent = SpiderFootEvent("INITIAL_TARGET", self.target, "SpiderFoot UI")
-            dbh.scanEventStore(self.config['__guid__'], rootEvent)
+            dbWriter.scanEventStore(self.config['__guid__'], rootEvent)
 
-            # Start the modules sequentially.
+            # Queue up the start() method of every module and wait for all of
+            # them, and all events they trigger, to be handled.
+            eventQueue = SpiderFootEventQueue(self.sf, self.config['_maxthreads'],
+                self.config['_modulethreads'])
+            for module in self.moduleInstances.values():
+                eventQueue.addModule(module)
             for module in self.moduleInstances.values():
-                # Check in case the user requested to stop the scan between modules initializing
-                if module.checkForStop():
-                    dbh.scanInstanceSet(self.config['__guid__'], status='ABORTING')
-                    self.status = "ABORTING"
-                    aborted = True
-                    break
                 # Many modules' start() method will return None, as most will rely on 
                 # notifications during the scan from other modules.
-                module.start()
+                eventQueue.start(module)
+            eventQueue.wait()
+
+            # A module failing takes the scan down with it
+            if eventQueue.failure != None:
+                raise eventQueue.failure[0], eventQueue.failure[1], eventQueue.failure[2]
 
             # Check if any of the modules ended due to being stopped
             for module in self.moduleInstances.values():
@@ -201,11 +769,11 @@ class SpiderFootScanner:
 
             if aborted:
                 self.sf.status("Scan [" + self.config['__guid__'] + "] aborted.")
-                dbh.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'ABORTED')
+                dbWriter.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'ABORTED')
                 self.status = "ABORTED"
             else:
                 self.sf.status("Scan [" + self.config['__guid__'] + "] completed.")
-                dbh.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'FINISHED')
+                dbWriter.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'FINISHED')
                 self.status = "FINISHED"
         except BaseException as e:
             exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -213,9 +781,27 @@ class SpiderFootScanner:
                 "encountered during scan. Please report this as a bug: " + \
                 repr(traceback.format_exception(exc_type, exc_value, exc_traceback)), False)
             self.sf.status("Scan [" + self.config['__guid__'] + "] failed: " + str(e))
-            dbh.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'ERROR-FAILED')
+            dbWriter.scanInstanceSet(self.config['__guid__'], None, time.time() * 1000, 'ERROR-FAILED')
             self.status = "ERROR-FAILED"
 
+        if eventQueue != None:
+            for module in self.moduleInstances.values():
+                module.stopScanning()
+            eventQueue.wait()
+            eventQueue.shutdown()
+
+        for module in self.moduleInstances.values():
+            if isinstance(module, SpiderFootPluginProcess):
+                module.shutdown()
+
+        stats = dbWriter.stats()
+        self.sf.info("Database writer queue peaked at " + str(stats['depthMax']) + \
+            " of " + str(stats['size']) + " operations; producers were blocked " + \
+            str(stats['blockedCount']) + " times for " + \
+            "{0:.2f}".format(stats['blockedTime']) + " seconds.")
+        self.dbWriter = None
+        dbWriter.close()
+
         self.moduleInstances = None
         dbh.close()
         self.sf.setDbh(None)
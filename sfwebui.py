@@ -9,7 +9,6 @@
 # License:      GPL
 #-----------------------------------------------------------------
 import json
-import threading
 import cherrypy
 import cgi
 import csv
@@ -22,14 +21,14 @@ from mako.lookup import TemplateLookup
 from mako.template import Template
 from sfdb import SpiderFootDb
 from sflib import SpiderFoot
-from sfscan import SpiderFootScanner
+from sfscan import SpiderFootScanManager
 from StringIO import StringIO
 
 class SpiderFootWebUi:
     lookup = TemplateLookup(directories=[''])
     defaultConfig = dict()
     config = dict()
-    scanner = None
+    scanManager = None
     token = None
 
     def __init__(self, config):
@@ -40,6 +39,13 @@ class SpiderFootWebUi:
         # saved.
         sf = SpiderFoot(config)
         self.config = sf.configUnserialize(dbh.configGet(), config)
+        # Worker processes for the modules run out of process are forked
+        # now, before the web server starts any threads, enough for every
+        # scan that can run at once.
+        processModules = [ m for m in self.config['_processmodules'].split(',') \
+            if m.strip() != '' ]
+        self.scanManager = SpiderFootScanManager(self.config['_maxscans'],
+            len(processModules) * self.config['_maxscans'])
 
         if self.config['__webaddr'] == "0.0.0.0":
             addr = "<IP of this host>"
@@ -170,6 +176,10 @@ class SpiderFootWebUi:
         if res == None:
             return self.error("Scan ID not found.")
 
+        if self.scanManager.scanStatus(id) != "UNKNOWN":
+            return self.error("This scan is still running or queued, please " + \
+                "stop it before deleting it.")
+
         if confirm != None:
             dbh.scanInstanceDelete(id)
             raise cherrypy.HTTPRedirect("/")
@@ -206,6 +216,8 @@ class SpiderFootWebUi:
         except Exception as e:
             return self.error("Processing one or more of your inputs failed: " + str(e))
 
+        self.scanManager.setMaxScans(self.config['_maxscans'])
+
         templ = Template(filename='dyn/opts.tmpl', lookup=self.lookup)
         self.token = random.randint(0, 99999999)
         return templ.render(opts=self.config, pageid='SETTINGS', updated=True, 
@@ -217,8 +229,6 @@ class SpiderFootWebUi:
         modopts = dict() # Not used yet as module options are set globally
         modlist = list()
         sf = SpiderFoot(self.config)
-        dbh = SpiderFootDb(self.config)
-        types = dbh.eventTypes()
 
         [scanname, scantarget] = self.cleanUserInput([scanname, scantarget])
 
@@ -252,47 +262,32 @@ class SpiderFootWebUi:
             modlist.append("sfp__stor_db")
         modlist.sort()
 
-        # For now we don't permit multiple simultaneous scans
-        for thread in threading.enumerate():
-            if thread.name.startswith("SF_"):
-                templ = Template(filename='dyn/newscan.tmpl', lookup=self.lookup)
-                return templ.render(modules=self.config['__modules__'], 
-                    alreadyRunning=True, runningScan=thread.name[3:], 
-                    types=types, pageid="NEWSCAN")
-
-        # Start running a new scan
-        self.scanner = SpiderFootScanner(scanname, scantarget.lower(), modlist, 
+        # Start running a new scan, or queue it if too many are running
+        scanId = self.scanManager.startScan(scanname, scantarget.lower(), modlist, 
             self.config, modopts)
-        t = threading.Thread(name="SF_" + scanname, target=self.scanner.startScan)
-        t.start()
-
-        # Spin cycles waiting for the scan ID to be set
-        while self.scanner.myId == None:
-            time.sleep(1)
-            continue
 
         templ = Template(filename='dyn/scaninfo.tmpl', lookup=self.lookup)
-        return templ.render(id=self.scanner.myId, name=scanname, 
-            status=self.scanner.status, pageid="SCANLIST")
+        return templ.render(id=scanId, name=scanname, 
+            status=self.scanManager.scanStatus(scanId), pageid="SCANLIST")
     startscan.exposed = True
 
-    # Stop a scan (id variable is unnecessary for now given that only one simultaneous
-    # scan is permitted.)
+    # Stop a running scan, or remove a queued one
     def stopscan(self, id):
-        if self.scanner == None:
-            return self.error("There are no scans running. A data consistency " + \
+        status = self.scanManager.scanStatus(id)
+        if status == "UNKNOWN":
+            return self.error("This scan is not running. A data consistency " + \
                 "error for this scan probably exists. <a href='/scandelete?id=" + \
                 id + "&confirm=1'>Click here to delete it.</a>")
 
-        if self.scanner.scanStatus(id) == "ABORTED":
+        if status == "ABORTED":
             return self.error("The scan is already aborted.")
 
-        if not self.scanner.scanStatus(id) == "RUNNING":
+        if status != "RUNNING" and status != "CREATED":
             return self.error("The running scan is currently in the state '" + \
-                self.scanner.scanStatus(id) + "', please try again later or restart " + \
+                status + "', please try again later or restart " + \
                 " SpiderFoot.")
 
-        self.scanner.stopScan(id)
+        self.scanManager.stopScan(id)
         templ = Template(filename='dyn/scanlist.tmpl', lookup=self.lookup)
         return templ.render(pageid='SCANLIST',stoppedscan=True)
     stopscan.exposed = True
@@ -303,8 +298,11 @@ class SpiderFootWebUi:
 
     # Scan log data
     def scanlog(self, id, limit=None):
-        dbh = SpiderFootDb(self.config)
-        data = dbh.scanLogs(id, limit)
+        # Running scans keep their newest log entries in memory
+        data = self.scanManager.scanLogs(id, limit)
+        if data == None:
+            dbh = SpiderFootDb(self.config)
+            data = dbh.scanLogs(id, limit)
         retdata = []
         for row in data:
             generated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[0]/1000))